@@ -1,26 +1,228 @@
 """
 AGENT 1: Data Collector Agent
 Fetches news and stock data, analyzes sentiment, and stores in database
+
+Heavy dependencies (NLTK/VADER, serpapi, requests, the databases and caches)
+load on first use, so importing this module is cheap; call warm_up() to load
+them ahead of the first collection.
 """
 
-from serpapi import GoogleSearch
-import nltk
-from nltk.sentiment.vader import SentimentIntensityAnalyzer
 import os
-import requests
-from database import NewsDatabase
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, as_completed
+from database import get_database
+from events import collection_events
+from rate_limit import TokenBucket
+from sentiment_cache import SentimentCache, text_hash
+from singleflight import SingleFlight
+from source_filter import load_source_matcher
+from symbols import load_symbol_resolver, name_similarity
+from response_cache import ResponseCache
+from instrumentation import (COLLECTIONS, NEWS_ARTICLES, UPSTREAM_ERRORS, UPSTREAM_REQUESTS,
+                             configure_logging, get_logger, stage)
+import hashlib
+import json
+
+log = get_logger('collector')
+
+# Guards one-time initialization of the lazily loaded dependencies below
+_init_lock = threading.RLock()
+_sia = None
+_sentiment_cache = None
+_source_matcher = None
+_symbol_resolver = None
+_single_flight = None
+_response_cache = None
+_search_class = None
+
+def get_db():
+    """Get the shared database (same instance as the web server's)"""
+    return get_database()
+
+def get_sia():
+    """Get the VADER analyzer, downloading the lexicon on first use if missing"""
+    global _sia
+    if _sia is None:
+        with _init_lock:
+            if _sia is None:
+                import nltk
+                from nltk.sentiment.vader import SentimentIntensityAnalyzer
+                try:
+                    nltk.data.find('sentiment/vader_lexicon.zip')
+                except LookupError:
+                    nltk.download('vader_lexicon')
+                _sia = SentimentIntensityAnalyzer()
+    return _sia
+
+def get_sentiment_version():
+    """Identify the analyzer and lexicon so a model change invalidates cached scores"""
+    import nltk
+    lexicon_digest = hashlib.sha1(get_sia().lexicon_file.encode('utf-8')).hexdigest()[:12]
+    return f"vader-nltk{nltk.__version__}-{lexicon_digest}"
+
+def get_sentiment_cache():
+    """Get the sentiment score cache (memory LRU + SQLite), keyed by content hash"""
+    global _sentiment_cache
+    if _sentiment_cache is None:
+        with _init_lock:
+            if _sentiment_cache is None:
+                _sentiment_cache = SentimentCache(get_db(), get_sentiment_version())
+    return _sentiment_cache
+
+def get_source_matcher():
+    """Get the trusted-source matcher (defaults + TRUSTED_SOURCES_FILE + news_sources table)"""
+    global _source_matcher
+    if _source_matcher is None:
+        with _init_lock:
+            if _source_matcher is None:
+                _source_matcher = load_source_matcher(get_db())
+    return _source_matcher
+
+def reload_sources():
+    """Rebuild the trusted-source matcher after the config or table changes"""
+    global _source_matcher
+    with _init_lock:
+        _source_matcher = load_source_matcher(get_db())
+    return _source_matcher
 
-# Download VADER lexicon (run once)
-try:
-    nltk.data.find('sentiment/vader_lexicon.zip')
-except LookupError:
-    nltk.download('vader_lexicon')
+def get_symbol_resolver():
+    """Get the company name -> ticker index (defaults + symbols table)"""
+    global _symbol_resolver
+    if _symbol_resolver is None:
+        with _init_lock:
+            if _symbol_resolver is None:
+                _symbol_resolver = load_symbol_resolver(get_db())
+    return _symbol_resolver
 
-# Initialize sentiment analyzer
-sia = SentimentIntensityAnalyzer()
+def get_single_flight():
+    """Get the per-company collection coordinator (COLLECTION_COOLDOWN, COLLECTION_LEASE)"""
+    global _single_flight
+    if _single_flight is None:
+        with _init_lock:
+            if _single_flight is None:
+                _single_flight = SingleFlight(get_db())
+    return _single_flight
 
-# Initialize database
-db = NewsDatabase()
+# Per-upstream HTTP settings: base URL, max keep-alive connections,
+# (connect, read) timeouts and token-bucket rate limits
+HTTP_HOSTS = {
+    'finnhub': {
+        'base_url': os.environ.get('FINNHUB_BASE_URL', 'https://finnhub.io/api/v1'),
+        'pool_size': 10,
+        'timeout': (3.05, 10),
+        'rate_per_minute': int(os.environ.get('FINNHUB_RATE_PER_MIN', 60)),
+        'burst': 10
+    },
+    'serpapi': {
+        'base_url': os.environ.get('SERPAPI_BASE_URL', 'https://serpapi.com'),
+        'pool_size': 4,
+        'timeout': (3.05, 30),
+        'rate_per_minute': int(os.environ.get('SERPAPI_RATE_PER_MIN', 30)),
+        'burst': 5
+    }
+}
+
+# Upstream responses worth retrying, and how many times
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+MAX_RETRIES = 3
+
+_sessions = {}
+_sessions_lock = threading.Lock()
+
+rate_limiters = {
+    host: TokenBucket(config['rate_per_minute'], config['burst'])
+    for host, config in HTTP_HOSTS.items()
+}
+
+# Shared pool for issuing upstream calls concurrently
+fetch_pool = ThreadPoolExecutor(max_workers=16, thread_name_prefix='fetch')
+
+def get_response_cache():
+    """Get the disk-backed cache of upstream responses (TTLs per source in response_cache.py)"""
+    global _response_cache
+    if _response_cache is None:
+        with _init_lock:
+            if _response_cache is None:
+                _response_cache = ResponseCache(
+                    path=os.environ.get('RESPONSE_CACHE_PATH', 'upstream_cache.db'),
+                    max_bytes=int(os.environ.get('RESPONSE_CACHE_MAX_MB', 64)) * 1024 * 1024,
+                    executor=fetch_pool
+                )
+    return _response_cache
+
+def get_http_session(host):
+    """Get the shared keep-alive session for an upstream host"""
+    session = _sessions.get(host)
+    if session is None:
+        with _sessions_lock:
+            session = _sessions.get(host)
+            if session is None:
+                import requests
+                from requests.adapters import HTTPAdapter
+                pool_size = HTTP_HOSTS[host]['pool_size']
+                # pool_block caps concurrent connections to the host at pool_size
+                adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, pool_block=True)
+                session = requests.Session()
+                session.mount('https://', adapter)
+                session.mount('http://', adapter)
+                _sessions[host] = session
+    return session
+
+def retry_delay(attempt, response=None):
+    """Seconds to wait before retry `attempt`, honouring Retry-After"""
+    if response is not None:
+        retry_after = response.headers.get('Retry-After', '')
+        if retry_after.isdigit():
+            return float(retry_after)
+    return 0.5 * (2 ** attempt) + random.uniform(0, 0.25)
+
+def upstream_get(host, url, params):
+    """Rate-limited GET against an upstream, retrying 429/5xx with backoff"""
+    import requests
+    session = get_http_session(host)
+    timeout = HTTP_HOSTS[host]['timeout']
+    
+    for attempt in range(MAX_RETRIES + 1):
+        rate_limiters[host].acquire()
+        try:
+            response = session.get(url, params=params, timeout=timeout)
+        except (requests.ConnectionError, requests.Timeout) as e:
+            UPSTREAM_ERRORS.inc(host=host, reason=type(e).__name__)
+            if attempt == MAX_RETRIES:
+                raise
+            delay = retry_delay(attempt)
+            log.warning(f"⚠️ {host} request failed ({e}), retrying in {delay:.1f}s",
+                        extra={'host': host, 'attempt': attempt + 1})
+        else:
+            UPSTREAM_REQUESTS.inc(host=host, status=response.status_code)
+            if response.status_code >= 400:
+                UPSTREAM_ERRORS.inc(host=host, reason=f'http_{response.status_code}')
+            if response.status_code not in RETRY_STATUSES or attempt == MAX_RETRIES:
+                return response
+            delay = retry_delay(attempt, response)
+            log.warning(f"⚠️ {host} returned {response.status_code}, retrying in {delay:.1f}s",
+                        extra={'host': host, 'status': response.status_code, 'attempt': attempt + 1})
+        time.sleep(delay)
+
+def get_search_class():
+    """GoogleSearch subclass that reuses the shared SerpAPI session and rate limiter"""
+    global _search_class
+    if _search_class is None:
+        with _init_lock:
+            if _search_class is None:
+                from serpapi import GoogleSearch
+                
+                class PooledGoogleSearch(GoogleSearch):
+                    BACKEND = HTTP_HOSTS['serpapi']['base_url']
+                    
+                    def get_response(self, path='/search'):
+                        url, parameter = self.construct_url(path)
+                        return upstream_get('serpapi', url, parameter)
+                
+                _search_class = PooledGoogleSearch
+    return _search_class
 
 def get_news(company_name):
     """Fetch news articles from trusted sources only"""
@@ -29,17 +231,6 @@ def get_news(company_name):
     if not api_key:
         raise ValueError("SERPAPI_KEY environment variable not set")
     
-    # List of trusted, high-quality news sources
-    trusted_sources = [
-        'bloomberg.com', 'reuters.com', 'wsj.com', 'ft.com',
-        'cnbc.com', 'forbes.com', 'businessinsider.com',
-        'marketwatch.com', 'theverge.com', 'techcrunch.com',
-        'cnn.com', 'bbc.com', 'theguardian.com', 'nytimes.com',
-        'washingtonpost.com', 'apnews.com', 'fortune.com',
-        'barrons.com', 'economist.com', 'seekingalpha.com',
-        'investopedia.com', 'morningstar.com', 'yahoo.com/finance'
-    ]
-    
     params = {
         "engine": "google",
         "q": company_name,
@@ -50,25 +241,25 @@ def get_news(company_name):
         "hl": "en"
     }
     
-    print(f"🔍 Fetching top 50 news articles for '{company_name}'...")
+    log.info(f"🔍 Fetching top 50 news articles for '{company_name}'...", extra={'company': company_name})
     
-    search = GoogleSearch(params)
-    results = search.get_dict()
+    # Cache key leaves out the API key
+    cache_params = {k: v for k, v in params.items() if k != 'api_key'}
+    with stage('news_fetch'):
+        results = get_response_cache().get_or_fetch(
+            'serpapi:news', cache_params, lambda: get_search_class()(dict(params)).get_dict()
+        )
     
+    source_matcher = get_source_matcher()
     news_articles = []
     trusted_count = 0
     
     if "news_results" in results:
         for article in results["news_results"]:
             link = article.get("link", "")
-            source = article.get("source", "").lower()
             
             # Check if from trusted source
-            is_trusted = any(trusted in link.lower() for trusted in trusted_sources)
-            if not is_trusted:
-                is_trusted = any(trusted.replace('.com', '') in source for trusted in trusted_sources)
-            
-            if is_trusted:
+            if source_matcher.is_trusted(link, article.get("source", "")):
                 news_articles.append({
                     "title": article.get("title", ""),
                     "link": link,
@@ -77,89 +268,239 @@ def get_news(company_name):
                     "date": article.get("date", "")
                 })
                 trusted_count += 1
+        
+        NEWS_ARTICLES.inc(trusted_count, trust='trusted')
+        NEWS_ARTICLES.inc(len(results["news_results"]) - trusted_count, trust='untrusted')
     
-    print(f"✅ Found {trusted_count} articles from trusted sources")
+    log.info(f"✅ Found {trusted_count} articles from trusted sources",
+             extra={'company': company_name, 'trusted': trusted_count,
+                    'results': len(results.get("news_results", []))})
     return news_articles
 
-def get_stock_price(company_name):
-    """Get stock price from Finnhub API"""
+# Finnhub symbol search results accepted as a company's listing
+LISTING_TYPES = ('Common Stock', 'ADR')
+# Minimum name similarity between the searched name and a search result
+SEARCH_MATCH = 0.5
+
+def search_symbol(company_name):
+    """Ask Finnhub's symbol search for a company's ticker
+    
+    Returns (symbol, listed name), (None, None) when nothing matches, or None
+    when the search itself failed.
+    """
+    with stage('symbol_search'):
+        payload = finnhub_fetch('search', {'q': company_name})
+    if payload is None:
+        return None
+    
+    for result in payload.get('result') or []:
+        symbol = result.get('symbol') or ''
+        description = result.get('description') or ''
+        if result.get('type') not in LISTING_TYPES or '.' in symbol:
+            continue
+        if symbol == company_name.strip().upper() or name_similarity(company_name, description) >= SEARCH_MATCH:
+            return symbol, description
+    return None, None
+
+def get_symbol(company_name):
+    """Map a company name to its ticker symbol, or None if it has none
+    
+    Answered from the in-memory symbol index. A name it has never seen is
+    looked up once with Finnhub's symbol search, and the answer (including
+    "no ticker") is saved to the symbols table.
+    """
+    resolver = get_symbol_resolver()
+    symbol, match = resolver.resolve(company_name)
+    if match != 'unknown':
+        return symbol
+    
     try:
-        api_key = os.environ.get('FINNHUB_KEY', 'ct76kspr01qnhnd37magct76kspr01qnhnd37mb0')
-        
-        symbol_map = {
-            'apple': 'AAPL', 'microsoft': 'MSFT', 'google': 'GOOGL',
-            'alphabet': 'GOOGL', 'amazon': 'AMZN', 'tesla': 'TSLA',
-            'meta': 'META', 'facebook': 'META', 'nvidia': 'NVDA',
-            'netflix': 'NFLX', 'intel': 'INTC', 'amd': 'AMD',
-            'ibm': 'IBM', 'oracle': 'ORCL', 'salesforce': 'CRM',
-            'adobe': 'ADBE', 'cisco': 'CSCO', 'paypal': 'PYPL',
-            'uber': 'UBER', 'lyft': 'LYFT', 'airbnb': 'ABNB',
-            'spotify': 'SPOT', 'snapchat': 'SNAP', 'snap': 'SNAP',
-            'zoom': 'ZM', 'disney': 'DIS', 'walmart': 'WMT',
-            'starbucks': 'SBUX', 'nike': 'NKE', 'twitter': 'TWTR',
-            'coca cola': 'KO', 'cocacola': 'KO', 'pepsi': 'PEP',
-            'mcdonalds': 'MCD', 'boeing': 'BA', 'ford': 'F',
-            'gm': 'GM', 'general motors': 'GM', 'jp morgan': 'JPM',
-            'bank of america': 'BAC', 'visa': 'V', 'mastercard': 'MA',
-            'costco': 'COST', 'target': 'TGT', 'pfizer': 'PFE'
-        }
-        
-        symbol = symbol_map.get(company_name.lower().strip(), company_name.upper().strip())
-        
-        print(f"📈 Fetching stock data for {symbol}...")
-        
-        quote_url = f"https://finnhub.io/api/v1/quote?symbol={symbol}&token={api_key}"
-        response = requests.get(quote_url, timeout=10)
-        
-        if response.status_code != 200:
-            print(f"⚠️ Stock API error: {response.status_code}")
-            return None
-        
-        data = response.json()
-        current_price = data.get('c', 0)
-        
-        if not current_price or current_price == 0:
-            print(f"⚠️ No stock data for {symbol}")
-            return None
-        
-        previous_close = data.get('pc', current_price)
-        change = current_price - previous_close
-        change_percent = (change / previous_close * 100) if previous_close else 0
-        
-        # Get company profile
-        profile_url = f"https://finnhub.io/api/v1/stock/profile2?symbol={symbol}&token={api_key}"
-        profile_response = requests.get(profile_url, timeout=10)
-        company_name_full = company_name
-        market_cap = 'N/A'
-        
-        if profile_response.status_code == 200:
-            profile = profile_response.json()
-            if profile:
-                company_name_full = profile.get('name', company_name)
-                market_cap = profile.get('marketCapitalization', 'N/A')
-                if market_cap != 'N/A' and market_cap:
-                    market_cap = market_cap * 1000000
-        
-        print(f"✅ Stock data retrieved: ${current_price}")
-        return {
-            'symbol': symbol,
-            'name': company_name_full,
-            'price': float(current_price),
-            'change': float(change),
-            'change_percent': float(change_percent),
-            'day_high': float(data.get('h', 0)),
-            'day_low': float(data.get('l', 0)),
-            'market_cap': market_cap
-        }
-        
+        found = search_symbol(company_name)
     except Exception as e:
-        print(f"❌ Error fetching stock: {e}")
+        log.warning(f"⚠️ Symbol search failed: {e}", exc_info=True, extra={'company': company_name})
         return None
+    if found is None:
+        return None
+    symbol, listed_name = found
+    if symbol:
+        resolver.add(company_name, symbol)
+        resolver.add(listed_name, symbol)
+    else:
+        resolver.add_miss(company_name)
+    get_db().save_symbols([(company_name, symbol), (listed_name, symbol)], 'finnhub')
+    log.info(f"🔎 Resolved '{company_name}' to {symbol or 'no ticker'}",
+             extra={'company': company_name, 'symbol': symbol})
+    return symbol
+
+def finnhub_get(endpoint, symbol):
+    """GET a Finnhub endpoint for a symbol (cached per endpoint TTL); returns JSON or None"""
+    return get_response_cache().get_or_fetch(
+        f'finnhub:{endpoint}', {'symbol': symbol}, lambda: finnhub_fetch(endpoint, {'symbol': symbol})
+    )
+
+def finnhub_fetch(endpoint, params):
+    """GET a Finnhub endpoint over the shared session; returns JSON or None"""
+    api_key = os.environ.get('FINNHUB_KEY', 'ct76kspr01qnhnd37magct76kspr01qnhnd37mb0')
+    response = upstream_get(
+        'finnhub',
+        f"{HTTP_HOSTS['finnhub']['base_url']}/{endpoint}",
+        dict(params, token=api_key)
+    )
+    
+    if response.status_code != 200:
+        log.warning(f"⚠️ Stock API error ({endpoint}): {response.status_code}",
+                    extra=dict(params, endpoint=endpoint, status=response.status_code))
+        return None
+    return response.json()
+
+def fetch_quote(symbol):
+    """Fetch a Finnhub quote"""
+    log.info(f"📈 Fetching stock data for {symbol}...", extra={'symbol': symbol})
+    with stage('quote_fetch'):
+        return finnhub_get('quote', symbol)
+
+def fetch_profile(symbol):
+    """Fetch a Finnhub company profile"""
+    with stage('profile_fetch'):
+        return finnhub_get('stock/profile2', symbol)
+
+def build_stock_data(company_name, symbol, data, profile):
+    """Combine quote and profile payloads into a stock data record"""
+    if not data:
+        return None
+    
+    current_price = data.get('c', 0)
+    
+    if not current_price or current_price == 0:
+        log.warning(f"⚠️ No stock data for {symbol}", extra={'symbol': symbol})
+        return None
+    
+    previous_close = data.get('pc', current_price)
+    change = current_price - previous_close
+    change_percent = (change / previous_close * 100) if previous_close else 0
+    
+    company_name_full = company_name
+    market_cap = 'N/A'
+    
+    if profile:
+        company_name_full = profile.get('name', company_name)
+        market_cap = profile.get('marketCapitalization', 'N/A')
+        if market_cap != 'N/A' and market_cap:
+            market_cap = market_cap * 1000000
+    
+    log.info(f"✅ Stock data retrieved: ${current_price}", extra={'symbol': symbol, 'price': current_price})
+    return {
+        'symbol': symbol,
+        'name': company_name_full,
+        'price': float(current_price),
+        'change': float(change),
+        'change_percent': float(change_percent),
+        'day_high': float(data.get('h', 0)),
+        'day_low': float(data.get('l', 0)),
+        'market_cap': market_cap
+    }
+
+def submit_stock_fetch(company_name):
+    """Start the quote and profile requests concurrently; returns (symbol, futures)
+    
+    Both are None for a company without a ticker, which costs no Finnhub calls.
+    """
+    symbol = get_symbol(company_name)
+    if symbol is None:
+        return None, None
+    return symbol, (fetch_pool.submit(fetch_quote, symbol), fetch_pool.submit(fetch_profile, symbol))
+
+def resolve_stock_fetch(company_name, symbol, futures):
+    """Wait for a submit_stock_fetch() pair and build the stock data record"""
+    if futures is None:
+        log.info(f"💤 No ticker known for '{company_name}', skipping stock data",
+                 extra={'company': company_name})
+        return None
+    try:
+        quote_future, profile_future = futures
+        data = quote_future.result()
+        try:
+            profile = profile_future.result()
+        except Exception as e:
+            log.warning(f"⚠️ Profile fetch failed: {e}", exc_info=True, extra={'symbol': symbol})
+            profile = None
+        return build_stock_data(company_name, symbol, data, profile)
+    except Exception as e:
+        log.error(f"❌ Error fetching stock: {e}", exc_info=True, extra={'symbol': symbol})
+        return None
+
+def get_stock_price(company_name):
+    """Get stock price from Finnhub API"""
+    symbol, futures = submit_stock_fetch(company_name)
+    return resolve_stock_fetch(company_name, symbol, futures)
 
 def analyze_sentiment(text):
-    """Analyze sentiment using VADER"""
-    scores = sia.polarity_scores(text)
-    return scores['compound']
+    """Analyze sentiment using VADER (cached by content hash)"""
+    return analyze_sentiment_batch([text])[0]
+
+# Uncached batches at least this large are sharded across worker processes
+PROCESS_POOL_THRESHOLD = 2000
+
+_process_pool = None
+_process_pool_lock = threading.Lock()
+_worker_sia = None
+
+def _init_sentiment_worker():
+    """Process-pool initializer: load the VADER lexicon once per worker"""
+    global _worker_sia
+    from nltk.sentiment.vader import SentimentIntensityAnalyzer
+    _worker_sia = SentimentIntensityAnalyzer()
+
+def _score_shard(texts):
+    """Score a shard of texts inside a worker process"""
+    return [_worker_sia.polarity_scores(text)['compound'] for text in texts]
+
+def get_process_pool():
+    """Get the shared sentiment process pool, starting it on first use"""
+    global _process_pool
+    with _process_pool_lock:
+        if _process_pool is None:
+            _process_pool = ProcessPoolExecutor(max_workers=os.cpu_count() or 1,
+                                                initializer=_init_sentiment_worker)
+        return _process_pool
+
+def analyze_sentiment_batch(texts, use_processes=None):
+    """Score many texts with VADER, returning compound scores in input order
+    
+    Cached texts are not rescored, duplicates are scored once, and uncached
+    batches of PROCESS_POOL_THRESHOLD or more are split across all cores
+    (force either way with use_processes=True/False).
+    """
+    sentiment_cache = get_sentiment_cache()
+    keys = [text_hash(text) for text in texts]
+    scores = sentiment_cache.get_many(texts)
+    
+    # Unique texts still needing a score
+    pending = {}
+    for key, text in zip(keys, texts):
+        if key not in scores and key not in pending:
+            pending[key] = text
+    
+    if pending:
+        if use_processes is None:
+            use_processes = len(pending) >= PROCESS_POOL_THRESHOLD
+        pending_keys = list(pending)
+        pending_texts = list(pending.values())
+        
+        if use_processes:
+            workers = os.cpu_count() or 1
+            shard_size = -(-len(pending_texts) // workers)
+            shards = [pending_texts[i:i + shard_size] for i in range(0, len(pending_texts), shard_size)]
+            new_scores = [score for shard in get_process_pool().map(_score_shard, shards) for score in shard]
+        else:
+            sia = get_sia()
+            new_scores = [sia.polarity_scores(text)['compound'] for text in pending_texts]
+        
+        computed = dict(zip(pending_keys, new_scores))
+        sentiment_cache.put_many(computed)
+        scores.update(computed)
+    
+    return [scores[key] for key in keys]
 
 def categorize_sentiment(score):
     """Categorize sentiment score"""
@@ -170,70 +511,294 @@ def categorize_sentiment(score):
     else:
         return 'neutral'
 
-def collect_and_store_data(company_name):
-    """Main collection function"""
-    print(f"\n🤖 AGENT 1: Collecting data for '{company_name}'...")
+def score_articles(articles):
+    """Score articles in place and return the analysis summary
     
-    try:
-        # Register company
-        company_id = db.insert_company(company_name)
+    Articles that already carry a sentiment_score (e.g. reused from the
+    database) keep it and are not sent to the model again.
+    """
+    positive_count = 0
+    negative_count = 0
+    neutral_count = 0
+    total_sentiment = 0
+    
+    pending = [article for article in articles if article.get('sentiment_score') is None]
+    if pending:
+        texts = [f"{article['title']} {article['snippet']}" for article in pending]
+        with stage('sentiment'):
+            scores = analyze_sentiment_batch(texts)
+        for article, score in zip(pending, scores):
+            article['sentiment_score'] = score
+            article['sentiment_category'] = categorize_sentiment(score)
+    
+    for article in articles:
+        score = article['sentiment_score']
+        category = article['sentiment_category']
         
-        # Fetch stock data
-        stock_data = get_stock_price(company_name)
-        if stock_data:
-            db.insert_stock_data(company_id, stock_data)
+        total_sentiment += score
+        if category == 'positive':
+            positive_count += 1
+        elif category == 'negative':
+            negative_count += 1
+        else:
+            neutral_count += 1
+    
+    avg_sentiment = total_sentiment / len(articles)
+    
+    return {
+        'total_articles': len(articles),
+        'positive_count': positive_count,
+        'negative_count': negative_count,
+        'neutral_count': neutral_count,
+        'avg_sentiment': avg_sentiment
+    }
+
+def reuse_known_sentiments(company_name, articles):
+    """Copy stored scores onto articles we already have; returns how many were reused"""
+    reused = 0
+    with stage('db_known_articles'):
+        known = get_db().get_known_sentiments(company_name, articles)
+    for article, stored in zip(articles, known):
+        if stored is not None and stored[0] is not None:
+            article['sentiment_score'] = stored[0]
+            article['sentiment_category'] = stored[1] or categorize_sentiment(stored[0])
+            reused += 1
+    return reused
+
+def collect_company(company_name):
+    """Fetch and score data for one company without writing to the database"""
+    # Fan out: quote, profile and news requests run concurrently (news first,
+    # since resolving a new name's ticker may take a symbol search)
+    news_future = fetch_pool.submit(get_news, company_name)
+    symbol, stock_futures = submit_stock_fetch(company_name)
+    
+    # Score sentiment as soon as the news arrives, while Finnhub may still be in flight
+    articles = news_future.result()
+    if articles:
+        reused = reuse_known_sentiments(company_name, articles)
+        log.info(f"🧠 Analyzing sentiment for {len(articles) - reused} articles "
+                 f"({reused} already stored)...",
+                 extra={'company': company_name, 'articles': len(articles), 'reused': reused})
+        score_articles(articles)
+        for index, article in enumerate(articles):
+            collection_events.publish(company_name, 'article', dict(article, index=index, total=len(articles)))
+    
+    stock_data = resolve_stock_fetch(company_name, symbol, stock_futures)
+    if stock_data:
+        collection_events.publish(company_name, 'stock', stock_data)
+    
+    return {
+        'company_name': company_name,
+        'stock_data': stock_data,
+        'articles': articles
+    }
+
+def store_collection(collection):
+    """Store one collect_company() result and return its stories; joins an enclosing transaction"""
+    db = get_db()
+    with stage('db_store'), db.transaction():
+        with stage('db_insert_company'):
+            company_id = db.insert_company(collection['company_name'])
+        stories = []
+        if collection['stock_data']:
+            with stage('db_insert_stock_data'):
+                db.insert_stock_data(company_id, collection['stock_data'])
+        if collection['articles']:
+            with stage('db_insert_news_articles'):
+                story_ids = db.insert_news_articles(company_id, collection['articles'])
+            # Repeats and syndicated copies count once, with their story's stored score
+            stories = db.get_articles_by_ids(list(dict.fromkeys(story_ids)))
+            with stage('db_insert_analysis_summary'):
+                db.insert_analysis_summary(
+                    company_id, db.summarize_articles(stories, [story['id'] for story in stories]))
         
-        # Fetch news
-        articles = get_news(company_name)
+        # Keep the materialized snapshot in step with the rows just written
+        with stage('db_update_snapshot'):
+            db.update_company_snapshot(company_id, collection['stock_data'],
+                                       stories, [story['id'] for story in stories])
+    return stories
+
+def publish_summary(company_name, stories):
+    """Send stored stories and their sentiment counts to live subscribers"""
+    summary = get_db().summarize_articles(stories, [story['id'] for story in stories])
+    collection_events.publish(company_name, 'summary', {
+        'total_articles': summary['total_articles'],
+        'positive_count': summary['positive_count'],
+        'negative_count': summary['negative_count'],
+        'neutral_count': summary['neutral_count'],
+        'avg_sentiment': summary['avg_sentiment'],
+        'top_positive_ids': json.loads(summary['top_positive_ids']),
+        'top_negative_ids': json.loads(summary['top_negative_ids']),
+        'articles': stories
+    })
+
+def collect_and_store_data(company_name):
+    """Main collection function
+    
+    Concurrent calls for the same company (from any process) share one run
+    and its result, and a company collected successfully within
+    COLLECTION_COOLDOWN seconds isn't collected again.
+    """
+    return get_single_flight().run(company_name, collect_and_store_now)
+
+def collect_and_store_now(company_name):
+    """Collect and store one company unconditionally
+    
+    Progress (stock quote, each scored article, the stored summary) is
+    published to collection_events as it is produced.
+    """
+    collection_events.begin(company_name)
+    success, message = False, "Collection failed"
+    try:
+        success, message = _collect_and_store(company_name)
+        return success, message
+    finally:
+        collection_events.end(company_name, success, message)
+
+def _collect_and_store(company_name):
+    log.info(f"🤖 AGENT 1: Collecting data for '{company_name}'...", extra={'company': company_name})
+    started = time.monotonic()
+    
+    try:
+        with stage('collect'):
+            collection = collect_company(company_name)
+            
+            # Store company, stock, articles and summary in a single transaction
+            stories = store_collection(collection)
         
+        articles = collection['articles']
         if not articles:
+            COLLECTIONS.inc(outcome='no_news')
+            log.warning(f"⚠️ AGENT 1: No news found for '{company_name}'", extra={'company': company_name})
             return False, "No news found"
         
-        # Analyze sentiment
-        print(f"🧠 Analyzing sentiment for {len(articles)} articles...")
-        positive_count = 0
-        negative_count = 0
-        neutral_count = 0
-        total_sentiment = 0
-        
-        for article in articles:
-            text = f"{article['title']} {article['snippet']}"
-            score = analyze_sentiment(text)
-            category = categorize_sentiment(score)
-            
-            article['sentiment_score'] = score
-            article['sentiment_category'] = category
-            
-            total_sentiment += score
-            if category == 'positive':
-                positive_count += 1
-            elif category == 'negative':
-                negative_count += 1
-            else:
-                neutral_count += 1
-        
-        avg_sentiment = total_sentiment / len(articles)
-        
-        # Store in database
-        db.insert_news_articles(company_id, articles)
-        
-        summary = {
-            'total_articles': len(articles),
-            'positive_count': positive_count,
-            'negative_count': negative_count,
-            'neutral_count': neutral_count,
-            'avg_sentiment': avg_sentiment
-        }
-        db.insert_analysis_summary(company_id, summary)
-        
-        print(f"✅ AGENT 1: Complete! Analyzed {len(articles)} articles\n")
+        publish_summary(company_name, stories)
+        COLLECTIONS.inc(outcome='succeeded')
+        log.info(f"✅ AGENT 1: Complete! Analyzed {len(articles)} articles",
+                 extra={'company': company_name, 'articles': len(articles),
+                        'seconds': round(time.monotonic() - started, 3)})
         return True, "Success"
-        
+    
     except Exception as e:
-        print(f"❌ AGENT 1: Error - {e}\n")
+        COLLECTIONS.inc(outcome='failed')
+        log.exception(f"❌ AGENT 1: Error - {e}", extra={'company': company_name})
         return False, str(e)
 
+def collect_batch(company_names, max_workers=4):
+    """Collect and store many companies on a bounded worker pool
+    
+    Each company goes through collect_and_store_data(), so it shares the
+    single-flight lock with /analyze and the scheduler, is stored in its own
+    transaction, and a failure only counts against that company. Upstream
+    calls share the per-API rate limiters, so max_workers only bounds
+    concurrency; throughput is ultimately set by the rate limits.
+    """
+    # Drop blanks and duplicates, keeping order
+    company_names = list(dict.fromkeys(name.strip() for name in company_names if name.strip()))
+    log.info(f"🤖 AGENT 1: Batch collecting {len(company_names)} companies with {max_workers} workers...",
+             extra={'companies': len(company_names), 'workers': max_workers})
+    
+    started = time.monotonic()
+    succeeded = 0
+    errors = {}
+    
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='batch') as pool:
+        futures = {pool.submit(collect_and_store_data, name): name for name in company_names}
+        for future in as_completed(futures):
+            name = futures[future]
+            try:
+                success, message = future.result()
+            except Exception as e:
+                log.error(f"❌ {name}: {e}", exc_info=e, extra={'company': name})
+                success, message = False, str(e)
+            if success:
+                succeeded += 1
+            else:
+                errors[name] = message
+    
+    elapsed = time.monotonic() - started
+    stats = {
+        'total': len(company_names),
+        'succeeded': succeeded,
+        'failed': len(errors),
+        'elapsed_seconds': round(elapsed, 2),
+        'companies_per_minute': round(len(company_names) / elapsed * 60, 2) if elapsed else 0.0,
+        'errors': errors
+    }
+    log.info(f"✅ AGENT 1: Batch complete! {succeeded}/{len(company_names)} companies "
+             f"in {elapsed:.1f}s ({stats['companies_per_minute']} companies/min)",
+             extra={'succeeded': succeeded, 'failed': len(errors), 'seconds': round(elapsed, 2)})
+    return stats
+
+def rescore_articles(chunk_size=5000):
+    """Re-run sentiment over every stored article, streaming the table in id-ordered chunks"""
+    db = get_db()
+    log.info(f"🧠 AGENT 1: Rescoring stored articles ({get_sentiment_cache().version})...")
+    started = time.monotonic()
+    last_id = 0
+    total = 0
+    
+    while True:
+        rows = db.get_article_texts(after_id=last_id, limit=chunk_size)
+        if not rows:
+            break
+        
+        texts = [f"{title} {snippet or ''}" for _, title, snippet in rows]
+        scores = analyze_sentiment_batch(texts)
+        db.update_article_sentiments([
+            (row[0], score, categorize_sentiment(score))
+            for row, score in zip(rows, scores)
+        ])
+        
+        last_id = rows[-1][0]
+        total += len(rows)
+        log.info(f"   ...{total} articles rescored", extra={'rescored': total})
+    
+    elapsed = time.monotonic() - started
+    log.info(f"✅ AGENT 1: Rescored {total} articles in {elapsed:.1f}s",
+             extra={'rescored': total, 'seconds': round(elapsed, 2)})
+    return total
+
+def loaded_caches():
+    """Caches initialized so far by name, for reporting without forcing a load"""
+    caches = {'upstream': _response_cache, 'sentiment': _sentiment_cache}
+    return {name: cache for name, cache in caches.items() if cache is not None}
+
+def warm_up():
+    """Load every lazily initialized dependency now instead of on the first collection"""
+    started = time.monotonic()
+    get_db()
+    get_sentiment_cache()
+    get_source_matcher()
+    get_symbol_resolver()
+    get_response_cache()
+    get_search_class()
+    get_http_session('serpapi')
+    get_http_session('finnhub')
+    return time.monotonic() - started
+
+def read_companies_file(path):
+    """Read company names from a file, one per line ('#' starts a comment)"""
+    with open(path) as f:
+        return [line.split('#', 1)[0].strip() for line in f if line.split('#', 1)[0].strip()]
+
 if __name__ == "__main__":
-    import sys
-    company = sys.argv[1] if len(sys.argv) > 1 else input("Company name: ")
-    collect_and_store_data(company)
\ No newline at end of file
+    import argparse
+    
+    parser = argparse.ArgumentParser(description="AGENT 1: collect news and stock data")
+    parser.add_argument('company', nargs='?', help="company to collect")
+    parser.add_argument('--companies-file', help="file with one company name per line")
+    parser.add_argument('--workers', type=int, default=4, help="concurrent companies in batch mode")
+    parser.add_argument('--rescore', action='store_true', help="rescore sentiment for all stored articles")
+    parser.add_argument('--chunk-size', type=int, default=5000, help="articles per rescore chunk")
+    args = parser.parse_args()
+    configure_logging()
+    
+    if args.rescore:
+        rescore_articles(chunk_size=args.chunk_size)
+    elif args.companies_file:
+        stats = collect_batch(read_companies_file(args.companies_file), max_workers=args.workers)
+        print(json.dumps(stats, indent=2))
+    else:
+        company = args.company or input("Company name: ")
+        collect_and_store_data(company)
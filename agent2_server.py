@@ -3,14 +3,208 @@ AGENT 2: Data Server Agent
 Serves data from database to web UI
 """
 
-from flask import Flask, render_template, request, jsonify
-from database import NewsDatabase
-from agent1_collector import collect_and_store_data
-import threading
+from flask import Flask, render_template, request, jsonify, redirect, url_for, Response, stream_with_context, g
+from database import get_database, on_company_write, release_connections
+from agent1_collector import (collect_and_store_data, collect_batch, get_response_cache,
+                              get_sentiment_cache, get_sentiment_version, loaded_caches, warm_up)
+from jobs import JobQueue, QueueFullError
+from events import TooManySubscribersError, collection_events, format_event
+from http_responses import (FastJSONProvider, compress_response, is_fresh, last_modified_header,
+                            make_etag, parse_timestamp)
+from results_cache import ResultsCache
+from timeseries import resolve_range, downsample_lttb
+from export import FORMATS, available_formats, export_chunks
+from search import SENTIMENTS, search
+from scheduler import ViewCounter, scheduler_from_env
+from retention import retention_from_env
+from singleflight import COOLDOWN as COLLECTION_COOLDOWN, LEASE as COLLECTION_LEASE
+from instrumentation import (CONTENT_TYPE, HTTP_REQUEST_SECONDS, configure_logging, get_logger,
+                             register_callback, render_metrics)
+import json
 import os
+import threading
+import time
+
+configure_logging()
+log = get_logger('server')
 
 app = Flask(__name__)
-db = NewsDatabase()
+app.json = FastJSONProvider(app)
+db = get_database()
+
+# Collector dependencies load lazily; WARMUP=0 skips loading them in the background
+warmup = {'done': False, 'error': None, 'seconds': None}
+
+def run_warm_up():
+    """Load the collector's dependencies so the first collection doesn't pay for them"""
+    try:
+        warmup['seconds'] = round(warm_up(), 3)
+        log.info(f"🔥 Collector warmed up in {warmup['seconds']}s", extra={'seconds': warmup['seconds']})
+    except Exception as e:
+        warmup['error'] = f'{type(e).__name__}: {e}'
+        log.exception(f"⚠️ Warm-up failed: {warmup['error']}")
+    finally:
+        warmup['done'] = True
+
+WARMUP_ENABLED = os.environ.get('WARMUP', '1') != '0'
+if WARMUP_ENABLED:
+    threading.Thread(target=run_warm_up, name='warm-up', daemon=True).start()
+
+# Background collection jobs run on a bounded worker pool
+jobs = JobQueue(
+    db,
+    max_workers=int(os.environ.get('JOB_WORKERS', 4)),
+    max_pending=int(os.environ.get('JOB_QUEUE_SIZE', 100))
+)
+
+# Jobs that collect one company; concurrent requests for a company share one
+COLLECTION_JOB_KINDS = ('analyze', 'refresh')
+
+# Computed results pages, dropped whenever a company's data is written
+results_cache = ResultsCache(
+    max_bytes=int(os.environ.get('RESULTS_CACHE_MAX_MB', 32)) * 1024 * 1024
+)
+CACHE_RESULTS_HTML = os.environ.get('RESULTS_CACHE_HTML', '1') != '0'
+on_company_write(results_cache.invalidate_company)
+
+# Page views steer the background refresh scheduler towards popular companies
+page_views = ViewCounter(db, half_life=float(os.environ.get('REFRESH_VIEW_HALF_LIFE', 3600)))
+scheduler = scheduler_from_env(db, collect_and_store_data, views=page_views)
+# The Procfile worker runs the scheduler; REFRESH_SCHEDULER=on runs it in this process instead
+if os.environ.get('REFRESH_SCHEDULER', 'off') == 'on':
+    scheduler.start()
+
+# Retention runs alongside the scheduler (here or in the worker); RETENTION=off disables it
+retention = retention_from_env(db, get_sentiment_version)
+if os.environ.get('REFRESH_SCHEDULER', 'off') == 'on' and os.environ.get('RETENTION', 'on') != 'off':
+    retention.start()
+
+def cache_events():
+    """Hit/miss counters of every loaded cache, keyed by (cache, event)"""
+    events = {}
+    for name, cache in loaded_caches().items():
+        stats = cache.stats()
+        for event in ('hits', 'stale_hits', 'memory_hits', 'db_hits', 'misses', 'revalidations', 'errors'):
+            if event in stats:
+                events[(name, event)] = stats[event]
+    results = results_cache.stats()
+    for event in ('hits', 'misses', 'invalidations'):
+        events[('results', event)] = results[event]
+    return events
+
+def cache_sizes():
+    """Entries and bytes held by each loaded cache, keyed by (cache, unit)"""
+    sizes = {}
+    caches = dict(loaded_caches(), results=results_cache)
+    for name, cache in caches.items():
+        stats = cache.stats()
+        sizes[(name, 'entries')] = stats['entries'] if 'entries' in stats else stats.get('size', 0)
+        if 'bytes' in stats:
+            sizes[(name, 'bytes')] = stats['bytes']
+    return sizes
+
+register_callback('news_analyzer_cache_events_total', 'Cache lookups and maintenance events',
+                  'counter', ['cache', 'event'], cache_events)
+register_callback('news_analyzer_cache_size', 'Cache size in entries or bytes',
+                  'gauge', ['cache', 'unit'], cache_sizes)
+register_callback('news_analyzer_jobs_pending', 'Collection jobs waiting for a worker',
+                  'gauge', [], lambda: {(): jobs.pending()})
+register_callback('news_analyzer_stream_subscribers', 'Open live collection streams',
+                  'gauge', [], lambda: {(): collection_events.subscriber_count()})
+register_callback('news_analyzer_scheduler_refreshes_total', 'Background refreshes by outcome',
+                  'counter', ['outcome'], lambda: {(outcome,): count for outcome, count in scheduler.stats.items()})
+
+@app.before_request
+def start_request_timer():
+    g.request_started = time.perf_counter()
+
+@app.after_request
+def record_request_metrics(response):
+    """Observe request latency per route template (not per URL, to bound cardinality)"""
+    started = g.pop('request_started', None)
+    if started is not None:
+        route = request.url_rule.rule if request.url_rule else 'unmatched'
+        HTTP_REQUEST_SECONDS.observe(time.perf_counter() - started, route=route,
+                                     method=request.method, status=response.status_code)
+    return response
+
+@app.after_request
+def compress(response):
+    """gzip/brotli-encode large JSON responses for clients that accept it"""
+    return compress_response(response, request.accept_encodings)
+
+@app.teardown_request
+def release_database(exc):
+    """Hand the request thread's SQLite connections back for the next request"""
+    release_connections()
+
+def conditional_json(version, last_modified, build):
+    """JSON response from build(), or an empty 304 when the client's copy is current
+    
+    `version` must change whenever build()'s output would (it is hashed with
+    the URL, query string included, into a weak ETag), so a matching
+    If-None-Match or If-Modified-Since is answered without calling build().
+    """
+    etag = make_etag(request.full_path, version)
+    modified = last_modified_header(parse_timestamp(last_modified))
+    if is_fresh(request, etag, modified):
+        response = Response(status=304)
+    else:
+        response = build()
+        if response.status_code != 200:
+            return response
+    response.set_etag(etag, weak=True)
+    if modified is not None:
+        response.last_modified = modified
+    # Caches may keep the response but must revalidate it on every use
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+
+@app.route('/metrics')
+def metrics():
+    """Prometheus metrics"""
+    return Response(render_metrics(), content_type=CONTENT_TYPE)
+
+# Largest page the paginated API endpoints will return
+MAX_PAGE_SIZE = 500
+
+# Companies allowed in one /api/timeseries call
+MAX_TIMESERIES_COMPANIES = 50
+
+# Deepest /api/search page; ranking every match again gets slow past this
+MAX_SEARCH_OFFSET = 1000
+
+# Seconds between keep-alive comments (and job checks) on an idle live stream
+STREAM_HEARTBEAT = float(os.environ.get('STREAM_HEARTBEAT', 10))
+# Live streams are closed after this long; EventSource reconnects with Last-Event-ID
+STREAM_MAX_SECONDS = float(os.environ.get('STREAM_MAX_SECONDS', 600))
+
+# Batch collection limits
+MAX_BATCH_COMPANIES = 1000
+BATCH_WORKERS = int(os.environ.get('BATCH_WORKERS', 4))
+
+@app.route('/healthz')
+def healthz():
+    """Liveness: the process is up and serving requests"""
+    return jsonify({'status': 'ok'})
+
+@app.route('/readyz')
+def readyz():
+    """Readiness: the database answers and the collector has warmed up"""
+    checks = {}
+    try:
+        db.get_connection().execute('SELECT 1').fetchone()
+        checks['database'] = 'ok'
+    except Exception as e:
+        checks['database'] = f'{type(e).__name__}: {e}'
+    if WARMUP_ENABLED:
+        if warmup['error']:
+            checks['warmup'] = warmup['error']
+        else:
+            checks['warmup'] = 'ok' if warmup['done'] else 'pending'
+    
+    ready = all(value == 'ok' for value in checks.values())
+    return jsonify({'status': 'ready' if ready else 'not ready', 'checks': checks}), 200 if ready else 503
 
 @app.route('/')
 def index():
@@ -18,69 +212,197 @@ def index():
     companies = db.get_all_companies()
     return render_template('index.html', companies=companies)
 
+def wants_json():
+    """True when the client asked for a JSON response"""
+    return request.is_json or request.accept_mimetypes.best == 'application/json'
+
+def start_collection(kind, company_name):
+    """Queue a collection job and respond with its ID (JSON) or the results page
+    
+    Requests for a company that is already queued, running or was just
+    collected share that job instead of starting another collection.
+    """
+    company_name = ' '.join(company_name.split())
+    company_name = db.find_company_name(company_name) or company_name
+    try:
+        job_id, _ = jobs.submit_shared(kind, company_name, collect_and_store_data, company_name,
+                                       kinds=COLLECTION_JOB_KINDS, window=COLLECTION_COOLDOWN,
+                                       stale_after=COLLECTION_LEASE)
+    except QueueFullError as e:
+        if wants_json():
+            return jsonify({'error': str(e)}), 503
+        return render_template('index.html', error=str(e)), 503
+    
+    if wants_json():
+        return jsonify({
+            'job_id': job_id,
+            'status_url': url_for('api_job', job_id=job_id),
+            'results_url': url_for('results', company_name=company_name)
+        }), 202
+    return redirect(url_for('results', company_name=company_name, job=job_id))
+
+@app.route('/dashboard')
+def dashboard():
+    """Dashboard of every tracked company's latest snapshot"""
+    companies = db.get_all_companies()
+    return render_template('dashboard.html', companies=companies)
+
 @app.route('/analyze', methods=['POST'])
 def analyze():
     """Trigger analysis"""
-    company_name = request.form.get('company_name', '').strip()
+    if request.is_json:
+        company_name = (request.get_json(silent=True) or {}).get('company_name', '').strip()
+    else:
+        company_name = request.form.get('company_name', '').strip()
     
     if not company_name:
+        if wants_json():
+            return jsonify({'error': 'Please enter a company name'}), 400
         return render_template('index.html', error="Please enter a company name")
     
-    # Run Agent 1 to collect data
-    def collect_in_background():
-        collect_and_store_data(company_name)
+    # Run Agent 1 in the background; the results page polls the job
+    return start_collection('analyze', company_name)
+
+def run_batch(company_names):
+    """Job body for batch collection; the job message holds the JSON stats"""
+    stats = collect_batch(company_names, max_workers=BATCH_WORKERS)
+    return True, json.dumps(stats)
+
+@app.route('/api/analyze/batch', methods=['POST'])
+def api_analyze_batch():
+    """API: Queue a batch collection for many companies"""
+    payload = request.get_json(silent=True) or {}
+    companies = payload.get('companies')
+    
+    if not isinstance(companies, list) or not companies:
+        return jsonify({'error': 'Expected a JSON body like {"companies": ["Apple", "Tesla"]}'}), 400
+    if len(companies) > MAX_BATCH_COMPANIES:
+        return jsonify({'error': f'At most {MAX_BATCH_COMPANIES} companies per batch'}), 400
     
-    thread = threading.Thread(target=collect_in_background)
-    thread.start()
-    thread.join(timeout=30)
+    company_names = [str(name) for name in companies]
+    try:
+        job_id = jobs.submit('batch', f'{len(company_names)} companies', run_batch, company_names)
+    except QueueFullError as e:
+        return jsonify({'error': str(e)}), 503
     
-    return get_results(company_name)
+    return jsonify({
+        'job_id': job_id,
+        'status_url': url_for('api_job', job_id=job_id)
+    }), 202
 
 @app.route('/results/<company_name>')
 def results(company_name):
     """Show results"""
-    return get_results(company_name)
+    job = None
+    job_id = request.args.get('job')
+    if job_id:
+        job = db.get_job(job_id)
+    return get_results(company_name, job=job)
+
+def build_results_view(company_name):
+    """Compute the results page view model from the company snapshot"""
+    snapshot = db.get_company_snapshot(company_name)
+    if snapshot is None:
+        return build_results_view_from_rows(company_name)
+    
+    stock_data = None
+    if snapshot['price'] is not None:
+        stock_data = {field: snapshot[field] for field in (
+            'symbol', 'name', 'price', 'change', 'change_percent', 'day_high', 'day_low', 'market_cap'
+        )}
+        stock_data['fetched_at'] = snapshot['stock_fetched_at']
+    
+    # Articles from the latest collection, fetched by primary key
+    all_articles = db.get_articles_by_ids(snapshot['article_ids'])
+    if not all_articles:
+        return {
+            'company_name': company_name,
+            'stock_data': stock_data,
+            'no_results': True
+        }
+    
+    by_id = {article['id']: article for article in all_articles}
+    
+    return {
+        'company_id': snapshot['company_id'],
+        'company_name': company_name,
+        'stock_data': stock_data,
+        'positive_news': [by_id[i] for i in snapshot['top_positive_ids'] if i in by_id],
+        'negative_news': [by_id[i] for i in snapshot['top_negative_ids'] if i in by_id],
+        'all_articles': all_articles,
+        'total_articles': len(all_articles),
+        'positive_count': snapshot['positive_count'],
+        'negative_count': snapshot['negative_count'],
+        'neutral_count': snapshot['neutral_count'],
+        'no_results': False
+    }
 
-def get_results(company_name):
-    """Fetch and display results from database"""
+def build_results_view_from_rows(company_name):
+    """Compute the results page view model from raw rows (no snapshot yet)"""
+    # Get stock data
+    stock_data = db.get_latest_stock_data(company_name)
+    
+    # Get news articles
+    all_articles = db.get_latest_news(company_name, limit=50)
+    
+    if not all_articles:
+        return {
+            'company_name': company_name,
+            'stock_data': stock_data,
+            'no_results': True
+        }
+    
+    # Filter by sentiment (strict thresholds)
+    positive_articles = [a for a in all_articles if a['sentiment_score'] > 0.05]
+    negative_articles = [a for a in all_articles if a['sentiment_score'] < -0.05]
+    neutral_articles = [a for a in all_articles if -0.05 <= a['sentiment_score'] <= 0.05]
+    
+    # Top 3 of each
+    positive_news = sorted(positive_articles, key=lambda x: x['sentiment_score'], reverse=True)[:3]
+    negative_news = sorted(negative_articles, key=lambda x: x['sentiment_score'])[:3]
+    
+    return {
+        'company_name': company_name,
+        'stock_data': stock_data,
+        'positive_news': positive_news,
+        'negative_news': negative_news,
+        'all_articles': all_articles,
+        'total_articles': len(all_articles),
+        'positive_count': len(positive_articles),
+        'negative_count': len(negative_articles),
+        'neutral_count': len(neutral_articles),
+        'no_results': False
+    }
+
+def get_results(company_name, job=None):
+    """Fetch and display results from database (served from the results cache when warm)"""
     try:
-        # Get stock data
-        stock_data = db.get_latest_stock_data(company_name)
-        
-        # Get news articles
-        all_articles = db.get_latest_news(company_name, limit=50)
-        
-        if not all_articles:
-            return render_template('results.html',
-                                 company_name=company_name,
-                                 stock_data=stock_data,
-                                 no_results=True)
-        
-        # Filter by sentiment (strict thresholds)
-        positive_articles = [a for a in all_articles if a['sentiment_score'] > 0.05]
-        negative_articles = [a for a in all_articles if a['sentiment_score'] < -0.05]
-        neutral_articles = [a for a in all_articles if -0.05 <= a['sentiment_score'] <= 0.05]
-        
-        # Top 3 of each
-        positive_news = sorted(positive_articles, key=lambda x: x['sentiment_score'], reverse=True)[:3]
-        negative_news = sorted(negative_articles, key=lambda x: x['sentiment_score'])[:3]
+        token = None
+        # One-row read that catches writes by the refresh worker and other processes
+        version = db.get_data_version(company_name)
+        data_version = version['version'] if version else None
+        entry = results_cache.get(company_name, data_version)
+        if entry:
+            page_views.record(entry['company_id'])
+            if job is None and entry['html'] is not None:
+                return entry['html']
+            view = entry['view']
+            token = entry['token']
+        else:
+            generation = results_cache.generation
+            view = build_results_view(company_name)
+            if not view['no_results']:
+                company_id = view.get('company_id') or db.get_company_id(company_name)
+                page_views.record(company_id)
+                token = results_cache.put(company_name, company_id, view, generation=generation,
+                                          data_version=data_version)
         
-        # Statistics
-        positive_count = len(positive_articles)
-        negative_count = len(negative_articles)
-        neutral_count = len(neutral_articles)
+        html = render_template('results.html', job=job, **view)
         
-        return render_template('results.html',
-                             company_name=company_name,
-                             stock_data=stock_data,
-                             positive_news=positive_news,
-                             negative_news=negative_news,
-                             all_articles=all_articles,
-                             total_articles=len(all_articles),
-                             positive_count=positive_count,
-                             negative_count=negative_count,
-                             neutral_count=neutral_count,
-                             no_results=False)
+        # Pages with a job banner are per-request; only cache the plain page
+        if job is None and CACHE_RESULTS_HTML and token is not None:
+            results_cache.set_html(company_name, html, token)
+        return html
     
     except Exception as e:
         return render_template('index.html',
@@ -89,34 +411,243 @@ def get_results(company_name):
 @app.route('/refresh/<company_name>')
 def refresh(company_name):
     """Refresh data"""
-    success, message = collect_and_store_data(company_name)
-    if success:
-        return get_results(company_name)
-    else:
-        return render_template('index.html', error=message)
+    return start_collection('refresh', company_name)
+
+@app.route('/api/jobs/<job_id>')
+def api_job(job_id):
+    """API: Get background job status"""
+    job = db.get_job(job_id)
+    if job:
+        return jsonify(job)
+    return jsonify({'error': 'Not found'}), 404
+
+def job_outcome(job_id):
+    """'done' event data for a finished job, or None while it is queued or running"""
+    job = db.get_job(job_id)
+    if job is None or job['state'] not in ('succeeded', 'failed'):
+        return None
+    succeeded = job['state'] == 'succeeded'
+    return {'success': succeeded, 'message': job['message'] if succeeded else job['error'], 'job_id': job_id}
+
+@app.route('/api/stream/<company_name>')
+def api_stream(company_name):
+    """API: Server-Sent Events of a company's collections as they happen
+    
+    Events: started, stock (the quote), article (each scored article),
+    summary (stored stories and counts), done ({success, message}) and
+    lagged (this client fell behind and missed `dropped` events). With
+    ?job=<id> the stream ends once that job finishes, even when another
+    process ran the collection.
+    """
+    company_name = ' '.join(company_name.split())
+    company_name = db.find_company_name(company_name) or company_name
+    job_id = request.args.get('job')
+    try:
+        subscription = collection_events.subscribe(
+            company_name, after=request.headers.get('Last-Event-ID', type=int))
+    except TooManySubscribersError as e:
+        return jsonify({'error': str(e)}), 503
+    
+    def generate():
+        yield 'retry: 3000\n\n'
+        deadline = time.monotonic() + STREAM_MAX_SECONDS
+        reported = 0
+        # Subscribed first, so a job finishing now is seen here or as an event
+        outcome = job_outcome(job_id) if job_id else None
+        while outcome is None and time.monotonic() < deadline:
+            events = subscription.get(timeout=STREAM_HEARTBEAT)
+            if subscription.dropped > reported:
+                yield format_event(None, 'lagged', {'dropped': subscription.dropped - reported})
+                reported = subscription.dropped
+            for event_id, event, data in events:
+                yield format_event(event_id, event, data)
+                if event == 'done' and job_id:
+                    return
+            if not events:
+                outcome = job_outcome(job_id) if job_id else None
+                yield ': keep-alive\n\n'
+        if outcome is not None:
+            yield format_event(None, 'done', outcome)
+    
+    response = Response(stream_with_context(generate()), mimetype='text/event-stream',
+                        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+    response.call_on_close(subscription.close)
+    return response
 
 @app.route('/api/companies')
 def api_companies():
-    """API: Get all companies"""
-    companies = db.get_all_companies()
-    return jsonify(companies)
+    """API: Get all companies (conditional GET: ETag/Last-Modified)"""
+    version, last_modified = db.get_companies_version()
+    return conditional_json(version, last_modified, lambda: jsonify(db.get_all_companies()))
+
+def not_found():
+    response = jsonify({'error': 'Not found'})
+    response.status_code = 404
+    return response
 
 @app.route('/api/stock/<company_name>')
 def api_stock(company_name):
-    """API: Get stock data"""
-    stock_data = db.get_latest_stock_data(company_name)
-    if stock_data:
-        return jsonify(stock_data)
-    return jsonify({'error': 'Not found'}), 404
+    """API: Get stock data (conditional GET: ETag/Last-Modified)"""
+    version = db.get_data_version(company_name)
+    if version is None:
+        return not_found()
+    
+    def build():
+        stock_data = db.get_latest_stock_data(company_name)
+        return jsonify(stock_data) if stock_data else not_found()
+    return conditional_json((version['company_id'], version['version']), version['modified'], build)
+
+def get_page_args():
+    """Read keyset pagination args (?before=<id>&limit=<n>) from the query string"""
+    before = request.args.get('before', type=int)
+    limit = request.args.get('limit', 50, type=int)
+    return before, max(1, min(limit, MAX_PAGE_SIZE))
+
+def paginated_response(rows, limit):
+    """JSON list response with an X-Next-Before cursor when more rows may follow"""
+    response = jsonify(rows)
+    if len(rows) == limit:
+        response.headers['X-Next-Before'] = str(rows[-1]['id'])
+    return response
+
+@app.route('/api/stock/<company_name>/history')
+def api_stock_history(company_name):
+    """API: Get stock data history (paginated)"""
+    before, limit = get_page_args()
+    history = db.get_stock_history(company_name, limit=limit, before=before)
+    return paginated_response(history, limit)
+
+@app.route('/api/timeseries/<company_name>')
+def api_timeseries(company_name):
+    """API: Bucketed price and sentiment series for one or more companies
+    
+    Comma-separate several companies in the path. Query params: bucket
+    (minute|hour|day), start/end (ISO dates, UTC; default last 30 days) and
+    max_points (LTTB downsampling per series).
+    """
+    company_names = list(dict.fromkeys(name.strip() for name in company_name.split(',') if name.strip()))
+    bucket = request.args.get('bucket', 'hour')
+    max_points = request.args.get('max_points', type=int)
+    
+    if bucket not in db.TIMESERIES_BUCKETS:
+        return jsonify({'error': f"bucket must be one of {', '.join(db.TIMESERIES_BUCKETS)}"}), 400
+    if not company_names or len(company_names) > MAX_TIMESERIES_COMPANIES:
+        return jsonify({'error': f'Request between 1 and {MAX_TIMESERIES_COMPANIES} companies'}), 400
+    try:
+        start, end = resolve_range(request.args.get('start'), request.args.get('end'))
+    except ValueError as e:
+        return jsonify({'error': f'Invalid range: {e}'}), 400
+    
+    company_ids = db.get_company_ids(company_names)
+    ids = list(company_ids.values())
+    prices = db.get_price_series(ids, bucket, start, end) if ids else {}
+    sentiments = db.get_sentiment_series(ids, bucket, start, end) if ids else {}
+    
+    series = []
+    for name in company_names:
+        company_id = company_ids.get(name)
+        price = prices.get(company_id, [])
+        sentiment = sentiments.get(company_id, [])
+        if max_points:
+            price = downsample_lttb(price, max_points)
+            sentiment = downsample_lttb(sentiment, max_points)
+        series.append({
+            'company': name,
+            'found': company_id is not None,
+            'price': price,
+            'sentiment': sentiment
+        })
+    
+    return jsonify({'bucket': bucket, 'start': start, 'end': end, 'series': series})
+
+@app.route('/api/export/<dataset>')
+def api_export(dataset):
+    """API: Stream all articles or quotes as a download
+    
+    Query params: format (ndjson|csv|parquet), company (repeatable) and
+    start/end (ISO dates, UTC). Rows are read in chunks, so exports of any
+    size are served without building them in memory.
+    """
+    fmt = request.args.get('format', 'ndjson')
+    company_names = [name.strip() for name in request.args.getlist('company') if name.strip()]
+    
+    if dataset not in db.EXPORTS:
+        return jsonify({'error': f"dataset must be one of {', '.join(db.EXPORTS)}"}), 400
+    if fmt not in available_formats():
+        return jsonify({'error': f"format must be one of {', '.join(available_formats())}"}), 400
+    start = end = None
+    if request.args.get('start') or request.args.get('end'):
+        try:
+            start, end = resolve_range(request.args.get('start'), request.args.get('end'), default_days=36500)
+        except ValueError as e:
+            return jsonify({'error': f'Invalid range: {e}'}), 400
+    
+    chunks = export_chunks(db, dataset, fmt, company_names or None, start, end)
+    filename = f"{dataset}.{FORMATS[fmt]['extension']}"
+    return Response(stream_with_context(chunks), mimetype=FORMATS[fmt]['mimetype'],
+                    headers={'Content-Disposition': f'attachment; filename="{filename}"'})
+
+@app.route('/api/search')
+def api_search():
+    """API: Full-text search over every collected article, best match first
+    
+    Query params: q (words, "phrases", prefix*, OR, -excluded), company
+    (repeatable), sentiment (positive|negative|neutral), start/end (ISO dates,
+    UTC), limit and offset. Matches are wrapped in <mark> in title_highlight
+    and snippet_highlight; X-Next-Offset is set when more results may follow.
+    """
+    query = request.args.get('q', '')
+    company_names = [name.strip() for name in request.args.getlist('company') if name.strip()]
+    sentiment = request.args.get('sentiment') or None
+    limit = max(1, min(request.args.get('limit', 20, type=int), MAX_PAGE_SIZE))
+    offset = max(0, request.args.get('offset', 0, type=int))
+    
+    if not db.search_available():
+        return jsonify({'error': 'Search is unavailable (SQLite without FTS5)'}), 503
+    if sentiment and sentiment not in SENTIMENTS:
+        return jsonify({'error': f"sentiment must be one of {', '.join(SENTIMENTS)}"}), 400
+    if offset > MAX_SEARCH_OFFSET:
+        return jsonify({'error': f'offset must be at most {MAX_SEARCH_OFFSET}; narrow the search instead'}), 400
+    start = end = None
+    if request.args.get('start') or request.args.get('end'):
+        try:
+            start, end = resolve_range(request.args.get('start'), request.args.get('end'), default_days=36500)
+        except ValueError as e:
+            return jsonify({'error': f'Invalid range: {e}'}), 400
+    
+    try:
+        results = search(db, query, company_names or None, sentiment, start, end, limit, offset)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    response = jsonify(results)
+    if len(results) == limit:
+        response.headers['X-Next-Offset'] = str(offset + limit)
+    return response
+
+@app.route('/api/stats/cache')
+def api_cache_stats():
+    """API: Upstream response and sentiment cache statistics"""
+    return jsonify({
+        'upstream': get_response_cache().stats(),
+        'sentiment': get_sentiment_cache().stats(),
+        'results': results_cache.stats()
+    })
 
 @app.route('/api/news/<company_name>')
 def api_news(company_name):
-    """API: Get news articles"""
-    articles = db.get_latest_news(company_name)
-    return jsonify(articles)
+    """API: Get news articles (paginated; conditional GET: ETag/Last-Modified)"""
+    before, limit = get_page_args()
+    version = db.get_data_version(company_name)
+    if version is None:
+        return jsonify([])
+    
+    def build():
+        articles = db.get_latest_news(company_name, limit=limit, before=before)
+        return paginated_response(articles, limit)
+    return conditional_json((version['company_id'], version['version']), version['modified'], build)
 
 if __name__ == '__main__':
-    print("\n🤖 AGENT 2: Starting web server...")
-    print("🌐 Server running...")
     port = int(os.environ.get('PORT', 5000))
+    log.info("🤖 AGENT 2: Starting web server...", extra={'port': port})
     app.run(host='0.0.0.0', port=port, debug=False)
\ No newline at end of file
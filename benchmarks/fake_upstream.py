@@ -0,0 +1,226 @@
+"""
+Local SerpAPI and Finnhub Stand-ins
+Serves deterministic Google News, quote, profile2 and symbol search payloads with configurable
+latency and errors
+
+Run standalone with: python benchmarks/fake_upstream.py --port 8900 --latency-ms 50
+then point the collector at it with SERPAPI_BASE_URL=http://127.0.0.1:8900 and
+FINNHUB_BASE_URL=http://127.0.0.1:8900/api/v1.
+"""
+
+import hashlib
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+SOURCES = [
+    ('Reuters', 'https://www.reuters.com'),
+    ('Bloomberg', 'https://www.bloomberg.com'),
+    ('CNBC', 'https://www.cnbc.com'),
+    ('The Wall Street Journal', 'https://www.wsj.com'),
+    ('Financial Times', 'https://www.ft.com'),
+    ('Yahoo Finance', 'https://finance.yahoo.com'),
+    # Untrusted, dropped by the source filter
+    ('Random Blog', 'https://random-blog.example'),
+    ('Content Farm', 'https://content-farm.example')
+]
+
+HEADLINES = [
+    '{q} shares surge after record quarterly earnings',
+    '{q} stock falls as regulators open investigation',
+    '{q} announces new product line at annual event',
+    'Analysts upgrade {q} citing strong growth outlook',
+    '{q} faces lawsuit over alleged patent infringement',
+    '{q} beats expectations but warns on supply chain',
+    'Investors cautious ahead of {q} earnings report',
+    '{q} expands into new markets with major acquisition',
+    '{q} cuts jobs amid slowing demand',
+    '{q} partners with rivals on industry standard'
+]
+
+SNIPPETS = [
+    'The company reported revenue well above analyst estimates.',
+    'Shares were volatile in early trading on the news.',
+    'Executives said the outlook remains uncertain.',
+    'The move is expected to boost margins next year.',
+    'Critics warned the deal could face regulatory hurdles.'
+]
+
+def _rng(*parts):
+    """Random generator seeded by the request, so payloads are reproducible"""
+    seed = hashlib.sha1('|'.join(str(part) for part in parts).encode('utf-8')).hexdigest()
+    return random.Random(int(seed[:16], 16))
+
+def news_payload(query, num=50):
+    """Google News results for a query, as SerpAPI returns them"""
+    rng = _rng('news', query)
+    results = []
+    for i in range(num):
+        source, site = rng.choice(SOURCES)
+        results.append({
+            'position': i + 1,
+            'title': rng.choice(HEADLINES).format(q=query),
+            'link': f'{site}/markets/{query.lower().replace(" ", "-")}-{i}',
+            'snippet': ' '.join(rng.sample(SNIPPETS, 2)),
+            'source': source,
+            'date': f'{rng.randint(1, 23)} hours ago'
+        })
+    return {'search_metadata': {'status': 'Success'}, 'news_results': results}
+
+def quote_payload(symbol):
+    """Finnhub /quote payload"""
+    rng = _rng('quote', symbol)
+    previous_close = round(rng.uniform(10, 900), 2)
+    price = round(previous_close * rng.uniform(0.95, 1.05), 2)
+    return {
+        'c': price,
+        'pc': previous_close,
+        'h': round(max(price, previous_close) * 1.01, 2),
+        'l': round(min(price, previous_close) * 0.99, 2),
+        'o': previous_close,
+        't': int(time.time())
+    }
+
+def profile_payload(symbol):
+    """Finnhub /stock/profile2 payload"""
+    rng = _rng('profile', symbol)
+    return {
+        'name': f'{symbol.title()} Inc',
+        'ticker': symbol,
+        'marketCapitalization': round(rng.uniform(1000, 3000000), 2)
+    }
+
+def symbol_search_payload(query):
+    """Finnhub /search payload: one common stock named after the query"""
+    words = query.split()
+    symbol = ''.join(word[0] for word in words if word[0].isalpha()).upper()[:3] + \
+        ''.join(word for word in words if word.isdigit())
+    return {
+        'count': 1,
+        'result': [{
+            'description': f'{query.upper()} INC',
+            'displaySymbol': symbol,
+            'symbol': symbol,
+            'type': 'Common Stock'
+        }]
+    }
+
+class FakeUpstream:
+    """Threaded HTTP server standing in for SerpAPI and Finnhub
+    
+    latency_ms (+/- jitter_ms) is added to every response; error_rate is the
+    fraction of requests answered with error_status instead.
+    """
+    
+    def __init__(self, host='127.0.0.1', port=0, latency_ms=0, jitter_ms=0,
+                 error_rate=0.0, error_status=500, seed=0):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self.requests = {'news': 0, 'quote': 0, 'profile': 0, 'symbol': 0, 'errors': 0}
+        self.server = ThreadingHTTPServer((host, port), self._handler_class())
+        self.server.daemon_threads = True
+        self._thread = None
+    
+    @property
+    def url(self):
+        host, port = self.server.server_address[:2]
+        return f'http://{host}:{port}'
+    
+    def env(self):
+        """Environment variables that point the collector at this server"""
+        return {
+            'SERPAPI_BASE_URL': self.url,
+            'FINNHUB_BASE_URL': f'{self.url}/api/v1',
+            'SERPAPI_KEY': 'benchmark',
+            'FINNHUB_KEY': 'benchmark'
+        }
+    
+    def _decide(self, kind):
+        """Pick this request's delay and whether it fails"""
+        with self._lock:
+            self.requests[kind] += 1
+            delay = max(0.0, self.latency_ms + self._random.uniform(-self.jitter_ms, self.jitter_ms)) / 1000
+            failed = self._random.random() < self.error_rate
+            if failed:
+                self.requests['errors'] += 1
+        return delay, failed
+    
+    def _handler_class(self):
+        upstream = self
+        
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+            
+            def do_GET(self):
+                url = urlparse(self.path)
+                params = {key: values[0] for key, values in parse_qs(url.query).items()}
+                if url.path == '/search':
+                    kind, payload = 'news', lambda: news_payload(params.get('q', ''), int(params.get('num', 50)))
+                elif url.path == '/api/v1/quote':
+                    kind, payload = 'quote', lambda: quote_payload(params.get('symbol', ''))
+                elif url.path == '/api/v1/stock/profile2':
+                    kind, payload = 'profile', lambda: profile_payload(params.get('symbol', ''))
+                elif url.path == '/api/v1/search':
+                    kind, payload = 'symbol', lambda: symbol_search_payload(params.get('q', ''))
+                else:
+                    self._send(404, {'error': 'Not found'})
+                    return
+                
+                delay, failed = upstream._decide(kind)
+                if delay:
+                    time.sleep(delay)
+                if failed:
+                    self._send(upstream.error_status, {'error': 'Injected failure'})
+                else:
+                    self._send(200, payload())
+            
+            def _send(self, status, payload):
+                body = json.dumps(payload).encode('utf-8')
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+            
+            def log_message(self, format, *args):
+                pass
+        
+        return Handler
+    
+    def start(self):
+        """Serve on a daemon thread; returns self"""
+        self._thread = threading.Thread(target=self.server.serve_forever, name='fake-upstream', daemon=True)
+        self._thread.start()
+        return self
+    
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+if __name__ == "__main__":
+    import argparse
+    
+    parser = argparse.ArgumentParser(description="Serve fake SerpAPI/Finnhub responses")
+    parser.add_argument('--port', type=int, default=8900)
+    parser.add_argument('--latency-ms', type=float, default=0)
+    parser.add_argument('--jitter-ms', type=float, default=0)
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    parser.add_argument('--error-status', type=int, default=500)
+    args = parser.parse_args()
+    
+    upstream = FakeUpstream(port=args.port, latency_ms=args.latency_ms, jitter_ms=args.jitter_ms,
+                            error_rate=args.error_rate, error_status=args.error_status)
+    print(f"🧪 Fake SerpAPI/Finnhub on {upstream.url}")
+    for key, value in upstream.env().items():
+        print(f"   {key}={value}")
+    try:
+        upstream.server.serve_forever()
+    except KeyboardInterrupt:
+        upstream.stop()
@@ -0,0 +1,276 @@
+"""
+Offline Benchmark Suite for News Analyzer
+Runs the collector and web server against local SerpAPI/Finnhub stand-ins and
+writes the measurements as JSON, so runs can be compared
+
+Usage:
+    python benchmarks/run.py --output before.json
+    python benchmarks/run.py --latency-ms 80 --error-rate 0.05 --compare before.json
+"""
+
+import argparse
+import json
+import logging
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, ROOT)
+
+from fake_upstream import FakeUpstream
+
+def percentile(samples, pct):
+    """Nearest-rank percentile of a non-empty list"""
+    ordered = sorted(samples)
+    index = max(0, min(len(ordered) - 1, int(round(pct / 100.0 * len(ordered) + 0.5)) - 1))
+    return ordered[index]
+
+def latency_summary(seconds):
+    """Count, mean and percentiles in milliseconds"""
+    if not seconds:
+        return {'count': 0}
+    return {
+        'count': len(seconds),
+        'mean_ms': round(sum(seconds) / len(seconds) * 1000, 3),
+        'p50_ms': round(percentile(seconds, 50) * 1000, 3),
+        'p90_ms': round(percentile(seconds, 90) * 1000, 3),
+        'p99_ms': round(percentile(seconds, 99) * 1000, 3),
+        'max_ms': round(max(seconds) * 1000, 3)
+    }
+
+def bench_collect(collector, company_names):
+    """Latency of collect_and_store_data, one company at a time"""
+    timings = []
+    succeeded = 0
+    for name in company_names:
+        started = time.perf_counter()
+        success, _ = collector.collect_and_store_data(name)
+        timings.append(time.perf_counter() - started)
+        succeeded += bool(success)
+    
+    result = latency_summary(timings)
+    result['succeeded'] = succeeded
+    return result
+
+def bench_inserts(db, batches, batch_size):
+    """Rows per second through insert_news_articles"""
+    company_id = db.insert_company('Benchmark Inserts')
+    timings = []
+    for batch in range(batches):
+        articles = [{
+            'title': f'Benchmark headline {batch}-{i}',
+            'link': f'https://www.reuters.com/bench/{batch}/{i}',
+            'snippet': 'Synthetic article body used to measure insert throughput.',
+            'source': 'Reuters',
+            'sentiment_score': 0.1,
+            'sentiment_category': 'positive'
+        } for i in range(batch_size)]
+        started = time.perf_counter()
+        db.insert_news_articles(company_id, articles)
+        timings.append(time.perf_counter() - started)
+    
+    total = sum(timings)
+    result = latency_summary(timings)
+    result['rows'] = batches * batch_size
+    result['rows_per_second'] = round(batches * batch_size / total, 1) if total else None
+    return result
+
+def bench_sentiment(collector, count, use_processes):
+    """Texts per second through analyze_sentiment_batch, uncached then cached"""
+    texts = [f'Benchmark {i}: shares {"surge" if i % 3 else "plunge"} after results {time.time()}'
+             for i in range(count)]
+    
+    started = time.perf_counter()
+    collector.analyze_sentiment_batch(texts, use_processes=use_processes)
+    uncached = time.perf_counter() - started
+    
+    started = time.perf_counter()
+    collector.analyze_sentiment_batch(texts, use_processes=use_processes)
+    cached = time.perf_counter() - started
+    
+    return {
+        'texts': count,
+        'processes': use_processes,
+        'uncached_texts_per_second': round(count / uncached, 1),
+        'cached_texts_per_second': round(count / cached, 1)
+    }
+
+def bench_http(app, company_names, total_requests, concurrency):
+    """p50/p99 of the results page and JSON API under concurrent load"""
+    from werkzeug.serving import make_server
+    
+    logging.getLogger('werkzeug').setLevel(logging.ERROR)
+    server = make_server('127.0.0.1', 0, app, threaded=True)
+    base_url = f'http://127.0.0.1:{server.server_port}'
+    threading.Thread(target=server.serve_forever, name='bench-server', daemon=True).start()
+    
+    endpoints = {
+        'results': '/results/{}',
+        'api_news': '/api/news/{}',
+        'api_stock': '/api/stock/{}',
+        'api_companies': '/api/companies'
+    }
+    plan = []
+    for i in range(total_requests):
+        endpoint = list(endpoints)[i % len(endpoints)]
+        name = company_names[i % len(company_names)]
+        plan.append((endpoint, endpoints[endpoint].format(urllib.request.quote(name))))
+    
+    def fetch(item):
+        endpoint, path = item
+        started = time.perf_counter()
+        try:
+            with urllib.request.urlopen(base_url + path, timeout=30) as response:
+                response.read()
+                status = response.status
+        except urllib.error.HTTPError as e:
+            status = e.code
+        return endpoint, time.perf_counter() - started, status
+    
+    try:
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            outcomes = list(pool.map(fetch, plan))
+        elapsed = time.perf_counter() - started
+    finally:
+        server.shutdown()
+    
+    result = {
+        'requests': total_requests,
+        'concurrency': concurrency,
+        'requests_per_second': round(total_requests / elapsed, 1),
+        'errors': sum(1 for _, _, status in outcomes if status >= 400),
+        'all': latency_summary([seconds for _, seconds, _ in outcomes])
+    }
+    for endpoint in endpoints:
+        result[endpoint] = latency_summary([seconds for name, seconds, _ in outcomes if name == endpoint])
+    return result
+
+def git_revision():
+    """Current commit, suffixed with -dirty for uncommitted changes"""
+    try:
+        revision = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT,
+                                  capture_output=True, text=True, check=True).stdout.strip()
+        dirty = subprocess.run(['git', 'status', '--porcelain', '--untracked-files=no'], cwd=ROOT,
+                               capture_output=True, text=True).stdout.strip()
+        return revision + ('-dirty' if dirty else '')
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def flatten(results, prefix=''):
+    """Numeric leaves as {'a.b.c': value}"""
+    flat = {}
+    for key, value in results.items():
+        path = f'{prefix}{key}'
+        if isinstance(value, dict):
+            flat.update(flatten(value, path + '.'))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            flat[path] = value
+    return flat
+
+def compare(baseline, current):
+    """Print each metric next to the baseline with the relative change"""
+    old = flatten(baseline['results'])
+    new = flatten(current['results'])
+    print(f"\n📊 Compared with {baseline['meta'].get('git_revision')} ({baseline['meta'].get('timestamp')})")
+    for key in sorted(new):
+        if key in old:
+            change = f"{(new[key] - old[key]) / old[key] * 100:+.1f}%" if old[key] else 'n/a'
+            print(f"   {key:55} {old[key]:>12} -> {new[key]:>12}  {change}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline benchmark suite (no network access needed)")
+    parser.add_argument('--companies', type=int, default=20, help="companies collected")
+    parser.add_argument('--latency-ms', type=float, default=20, help="fake upstream latency")
+    parser.add_argument('--jitter-ms', type=float, default=5)
+    parser.add_argument('--error-rate', type=float, default=0.0, help="fraction of upstream calls that fail")
+    parser.add_argument('--error-status', type=int, default=500)
+    parser.add_argument('--insert-batches', type=int, default=20)
+    parser.add_argument('--insert-batch-size', type=int, default=500)
+    parser.add_argument('--sentiment-texts', type=int, default=5000)
+    parser.add_argument('--processes', action='store_true', help="score sentiment on the process pool")
+    parser.add_argument('--requests', type=int, default=2000, help="HTTP requests in the load test")
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--output', help="write the JSON results here")
+    parser.add_argument('--compare', help="earlier JSON results to compare against")
+    args = parser.parse_args()
+    # The run happens in a scratch directory, so resolve paths first
+    output = os.path.abspath(args.output) if args.output else None
+    baseline = os.path.abspath(args.compare) if args.compare else None
+    
+    upstream = FakeUpstream(latency_ms=args.latency_ms, jitter_ms=args.jitter_ms,
+                            error_rate=args.error_rate, error_status=args.error_status).start()
+    workdir = tempfile.mkdtemp(prefix='news-bench-')
+    
+    # Configure before the app modules read their settings at import time
+    os.environ.update(upstream.env())
+    os.environ.update({
+        'RESPONSE_CACHE_PATH': os.path.join(workdir, 'upstream_cache.db'),
+        'FINNHUB_RATE_PER_MIN': '1000000',
+        'SERPAPI_RATE_PER_MIN': '1000000',
+        'REFRESH_SCHEDULER': 'off',
+        'WARMUP': '0'
+    })
+    os.chdir(workdir)
+    
+    try:
+        started = time.perf_counter()
+        import agent1_collector
+        import agent2_server
+        import_seconds = time.perf_counter() - started
+        warm_up_seconds = agent1_collector.warm_up()
+        
+        company_names = [f'Benchmark Company {i}' for i in range(args.companies)]
+        print(f"🧪 Benchmarking in {workdir} against {upstream.url}")
+        
+        results = {'startup': {'import_seconds': round(import_seconds, 4),
+                               'warm_up_seconds': round(warm_up_seconds, 4)}}
+        print("⏱️ collect_and_store_data...")
+        results['collect'] = bench_collect(agent1_collector, company_names)
+        print("⏱️ insert_news_articles...")
+        results['inserts'] = bench_inserts(agent2_server.db, args.insert_batches, args.insert_batch_size)
+        print("⏱️ sentiment...")
+        results['sentiment'] = bench_sentiment(agent1_collector, args.sentiment_texts, args.processes)
+        print("⏱️ HTTP load...")
+        results['http'] = bench_http(agent2_server.app, company_names, args.requests, args.concurrency)
+        results['upstream_requests'] = dict(upstream.requests)
+    finally:
+        upstream.stop()
+        os.chdir(ROOT)
+        shutil.rmtree(workdir, ignore_errors=True)
+    
+    from http_responses import json_backend
+    report = {
+        'meta': {
+            'timestamp': datetime.now(timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ'),
+            'git_revision': git_revision(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpus': os.cpu_count(),
+            'json': json_backend(),
+            'config': vars(args)
+        },
+        'results': results
+    }
+    
+    print(json.dumps(report, indent=2))
+    if output:
+        with open(output, 'w') as f:
+            json.dump(report, f, indent=2)
+    if baseline:
+        with open(baseline) as f:
+            compare(json.load(f), report)
+
+if __name__ == "__main__":
+    main()
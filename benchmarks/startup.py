@@ -0,0 +1,131 @@
+"""
+Startup Benchmark for News Analyzer
+Measures web server import time, time-to-first-response and time-to-ready
+in fresh processes
+
+Usage: python benchmarks/startup.py [--runs 5] [--path /healthz]
+"""
+
+import argparse
+import json
+import os
+import shutil
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.error
+import urllib.request
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+IMPORT_SNIPPET = (
+    "import time; started = time.perf_counter(); import agent2_server; "
+    "print(time.perf_counter() - started)"
+)
+
+def free_port():
+    """Ask the OS for an unused TCP port"""
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+def measure_import(workdir, env):
+    """Seconds to import agent2_server in a fresh interpreter"""
+    output = subprocess.run(
+        [sys.executable, '-c', IMPORT_SNIPPET],
+        cwd=workdir, env=env, capture_output=True, text=True, check=True
+    ).stdout
+    return float(output.strip().splitlines()[-1])
+
+def get_status(url):
+    """HTTP status for a GET, or None while the server is not listening"""
+    try:
+        with urllib.request.urlopen(url, timeout=1) as response:
+            return response.status
+    except urllib.error.HTTPError as e:
+        return e.code
+    except (urllib.error.URLError, ConnectionError, socket.timeout):
+        return None
+
+def measure_server(workdir, env, path, timeout=60):
+    """Start the server and time its first response on `path` (any HTTP status)
+    
+    Returns (first_response_seconds, status, ready_seconds); ready_seconds is the
+    time until /readyz returns 200, or None when the server has no /readyz.
+    """
+    port = free_port()
+    env = dict(env, PORT=str(port))
+    base_url = f'http://127.0.0.1:{port}'
+    started = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, os.path.join(ROOT, 'agent2_server.py')],
+        cwd=workdir, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    try:
+        first = status = None
+        while time.perf_counter() - started < timeout:
+            if first is None:
+                status = get_status(base_url + path)
+                if status is not None:
+                    first = time.perf_counter() - started
+            if first is not None:
+                ready_status = get_status(base_url + '/readyz')
+                if ready_status == 200:
+                    return first, status, time.perf_counter() - started
+                if ready_status == 404:
+                    return first, status, None
+            time.sleep(0.01)
+        raise TimeoutError(f'server was not ready within {timeout}s')
+    finally:
+        process.terminate()
+        process.wait()
+
+def summarize(samples):
+    if not samples:
+        return None
+    return {
+        'median': round(statistics.median(samples), 4),
+        'min': round(min(samples), 4),
+        'max': round(max(samples), 4)
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure web server cold start")
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--path', default='/healthz', help="endpoint polled for the first response")
+    args = parser.parse_args()
+    
+    # Each run starts from an empty working directory (fresh database and caches)
+    env = dict(os.environ, PYTHONPATH=ROOT, REFRESH_SCHEDULER='off', PYTHONDONTWRITEBYTECODE='1')
+    import_times = []
+    response_times = []
+    ready_times = []
+    statuses = set()
+    for _ in range(args.runs):
+        workdir = tempfile.mkdtemp(prefix='startup-bench-')
+        try:
+            import_times.append(measure_import(workdir, env))
+            shutil.rmtree(workdir)
+            os.mkdir(workdir)
+            first, status, ready = measure_server(workdir, env, args.path)
+            response_times.append(first)
+            statuses.add(status)
+            if ready is not None:
+                ready_times.append(ready)
+        finally:
+            shutil.rmtree(workdir, ignore_errors=True)
+    
+    print(json.dumps({
+        'runs': args.runs,
+        'path': args.path,
+        'statuses': sorted(statuses),
+        'import_seconds': summarize(import_times),
+        'first_response_seconds': summarize(response_times),
+        'ready_seconds': summarize(ready_times)
+    }, indent=2))
+
+if __name__ == "__main__":
+    main()
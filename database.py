@@ -3,37 +3,238 @@ Database Management System for News Analyzer
 Handles all SQLite database operations
 """
 
+import json
 import sqlite3
-from datetime import datetime
+import threading
+import time
+import weakref
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from dedup import (WINDOW_DAYS, SignatureIndex, normalize_link, signature, signature_from_blob,
+                   signature_to_blob, title_hash)
+from instrumentation import connection_factory, get_logger
+from symbols import DEFAULT_SYMBOLS, name_key
 
-class NewsDatabase:
-    def __init__(self, db_name='news_analyzer.db'):
+log = get_logger('database')
+
+# Callbacks run after a write to a company's data commits: callback(company_id),
+# where company_id is None when a write touched every company
+_write_listeners = []
+
+def on_company_write(callback):
+    """Register a callback to run after company data writes commit"""
+    _write_listeners.append(callback)
+
+def notify_company_write(company_id):
+    """Run write listeners; a failing listener never breaks the write path"""
+    for callback in list(_write_listeners):
+        try:
+            callback(company_id)
+        except Exception as e:
+            log.warning(f"⚠️ Write listener failed: {e}", exc_info=True)
+
+# Every open pool, so a request can hand back all of its connections at once
+_pools = weakref.WeakSet()
+
+def release_connections():
+    """Return this thread's connections to their pools, e.g. when a web request ends"""
+    for pool in list(_pools):
+        pool.release()
+
+class ConnectionPool:
+    """Pool of reusable SQLite connections, one checked out per thread
+    
+    A thread keeps its connection until it calls release() (web requests do
+    on teardown) or exits. Returned connections wait, up to max_idle, for the
+    next thread, so short-lived request threads don't each open a connection
+    and re-apply the pragmas.
+    """
+    
+    # Applied once to every new connection
+    PRAGMAS = {
+        # Only takes effect on new files (or after a full VACUUM); see retention.py
+        'auto_vacuum': 'INCREMENTAL',
+        'journal_mode': 'WAL',
+        'synchronous': 'NORMAL',
+        'cache_size': -16000,        # ~16 MB page cache
+        'mmap_size': 134217728,      # 128 MB memory-mapped I/O
+        'busy_timeout': 5000,        # wait up to 5s for a lock
+        'temp_store': 'MEMORY',
+        'foreign_keys': 'ON'
+    }
+    
+    def __init__(self, db_name, pragmas=None, max_idle=8):
         self.db_name = db_name
-        self.init_db()
+        self.pragmas = dict(self.PRAGMAS)
+        if pragmas:
+            self.pragmas.update(pragmas)
+        self.max_idle = max_idle
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._connections = []
+        self._idle = []
+        _pools.add(self)
     
-    def get_connection(self):
-        """Get database connection"""
-        return sqlite3.connect(self.db_name)
+    def connect(self):
+        """Open a standalone connection (caller closes it), e.g. for long streaming reads"""
+        return self._connect()
     
-    def init_db(self):
-        """Initialize database with required tables"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
+    def _connect(self):
+        """Open a new connection and apply pragmas"""
+        # isolation_level=None lets transaction() issue BEGIN/COMMIT itself
+        conn = sqlite3.connect(
+            self.db_name,
+            timeout=self.pragmas['busy_timeout'] / 1000.0,
+            isolation_level=None,
+            check_same_thread=False,
+            factory=connection_factory()
+        )
+        for name, value in self.pragmas.items():
+            conn.execute(f'PRAGMA {name} = {value}')
+        return conn
+    
+    def get(self):
+        """Get this thread's connection, checking out an idle one (or opening one) on first use"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            with self._lock:
+                self._prune()
+                conn = self._idle.pop() if self._idle else None
+            if conn is None:
+                conn = self._connect()
+            self._local.conn = conn
+            self._local.depth = 0
+            self._local.after_commit = []
+            with self._lock:
+                self._connections.append((weakref.ref(threading.current_thread()), conn))
+        return conn
+    
+    def release(self):
+        """Return this thread's connection to the idle list (no-op inside a transaction)"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.depth:
+            return
+        self._local.conn = None
+        with self._lock:
+            self._connections = [(thread_ref, owned) for thread_ref, owned in self._connections
+                                 if owned is not conn]
+            self._keep_idle(conn)
+    
+    def _keep_idle(self, conn):
+        """Park a connection for reuse, or close it when the idle list is full (caller holds the lock)"""
+        if conn.in_transaction or len(self._idle) >= self.max_idle:
+            conn.close()
+        else:
+            self._idle.append(conn)
+    
+    def _prune(self):
+        """Reclaim connections owned by threads that have exited (caller holds the lock)"""
+        alive = []
+        for thread_ref, conn in self._connections:
+            thread = thread_ref()
+            if thread is None or not thread.is_alive():
+                self._keep_idle(conn)
+            else:
+                alive.append((thread_ref, conn))
+        self._connections = alive
+    
+    @contextmanager
+    def transaction(self):
+        """Run a block in one write transaction; nested calls join the outer one"""
+        conn = self.get()
+        if self._local.depth:
+            self._local.depth += 1
+            try:
+                yield conn
+            finally:
+                self._local.depth -= 1
+            return
         
-        # Create companies table
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS companies (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                name TEXT NOT NULL UNIQUE,
+        # IMMEDIATE takes the write lock up front so busy_timeout applies
+        conn.execute('BEGIN IMMEDIATE')
+        self._local.depth = 1
+        try:
+            yield conn
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+        else:
+            try:
+                conn.execute('COMMIT')
+            except BaseException:
+                # A failed COMMIT (SQLITE_BUSY, I/O error) leaves the transaction open
+                if conn.in_transaction:
+                    try:
+                        conn.execute('ROLLBACK')
+                    except sqlite3.Error:
+                        log.warning("⚠️ Rollback after a failed commit failed", exc_info=True)
+                raise
+            for callback in self._local.after_commit:
+                callback()
+        finally:
+            self._local.depth = 0
+            self._local.after_commit = []
+    
+    def after_commit(self, callback):
+        """Run callback once the current transaction commits (now, if none is open)"""
+        self.get()
+        if self._local.depth:
+            self._local.after_commit.append(callback)
+        else:
+            callback()
+    
+    def close_all(self):
+        """Close every pooled connection"""
+        with self._lock:
+            for _, conn in self._connections:
+                conn.close()
+            for conn in self._idle:
+                conn.close()
+            self._connections = []
+            self._idle = []
+        self._local = threading.local()
+
+class NewsDatabase:
+    # Schema migrations applied in order; PRAGMA user_version records the last one
+    MIGRATIONS = [
+        (1, [
+            'CREATE INDEX IF NOT EXISTS idx_news_company_fetched ON news_articles (company_id, fetched_at)',
+            'CREATE INDEX IF NOT EXISTS idx_stock_company_fetched ON stock_data (company_id, fetched_at)'
+        ]),
+        (2, [
+            '''CREATE TABLE IF NOT EXISTS jobs (
+                id TEXT PRIMARY KEY,
+                kind TEXT NOT NULL,
+                company_name TEXT,
+                state TEXT NOT NULL DEFAULT 'queued',
+                message TEXT,
+                error TEXT,
+                duration REAL,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                started_at TIMESTAMP,
+                finished_at TIMESTAMP
+            )''',
+            'CREATE INDEX IF NOT EXISTS idx_jobs_company_created ON jobs (company_name, created_at)'
+        ]),
+        (3, [
+            '''CREATE TABLE IF NOT EXISTS sentiment_cache (
+                text_hash TEXT NOT NULL,
+                version TEXT NOT NULL,
+                score REAL NOT NULL,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                PRIMARY KEY (text_hash, version)
+            ) WITHOUT ROWID'''
+        ]),
+        (4, [
+            '''CREATE TABLE IF NOT EXISTS news_sources (
+                pattern TEXT PRIMARY KEY,
+                policy TEXT NOT NULL DEFAULT 'allow' CHECK (policy IN ('allow', 'deny')),
                 created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        ''')
-        
-        # Create stock_data table
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS stock_data (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                company_id INTEGER NOT NULL,
+            )'''
+        ]),
+        (5, [
+            '''CREATE TABLE IF NOT EXISTS company_snapshot (
+                company_id INTEGER PRIMARY KEY,
                 symbol TEXT,
                 price REAL,
                 change REAL,
@@ -41,61 +242,269 @@ class NewsDatabase:
                 day_high REAL,
                 day_low REAL,
                 market_cap TEXT,
-                fetched_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                FOREIGN KEY (company_id) REFERENCES companies (id)
-            )
-        ''')
-        
-        # Create news_articles table
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS news_articles (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                company_id INTEGER NOT NULL,
-                title TEXT NOT NULL,
-                link TEXT,
-                snippet TEXT,
-                source TEXT,
-                sentiment_score REAL,
-                sentiment_category TEXT,
-                fetched_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                FOREIGN KEY (company_id) REFERENCES companies (id)
-            )
-        ''')
-        
-        # Create analysis_history table
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS analysis_history (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                company_id INTEGER NOT NULL,
+                stock_fetched_at TIMESTAMP,
                 total_articles INTEGER,
                 positive_count INTEGER,
                 negative_count INTEGER,
                 neutral_count INTEGER,
                 avg_sentiment REAL,
-                analyzed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                article_ids TEXT,
+                top_positive_ids TEXT,
+                top_negative_ids TEXT,
+                refreshed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
                 FOREIGN KEY (company_id) REFERENCES companies (id)
-            )
-        ''')
+            )''',
+            'CREATE INDEX IF NOT EXISTS idx_snapshot_refreshed ON company_snapshot (refreshed_at)',
+            lambda db, conn: db.rebuild_company_snapshots(conn)
+        ]),
+        (6, [
+            'CREATE INDEX IF NOT EXISTS idx_history_company_analyzed ON analysis_history (company_id, analyzed_at)'
+        ]),
+        (7, [
+            '''CREATE TABLE IF NOT EXISTS company_views (
+                company_id INTEGER PRIMARY KEY,
+                views REAL NOT NULL,
+                viewed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                FOREIGN KEY (company_id) REFERENCES companies (id)
+            )'''
+        ]),
+        (8, [
+            # Daily OHLC rollups of stock_data rows past retention; price_sum and
+            # samples (rather than an average) let partial days merge exactly
+            '''CREATE TABLE IF NOT EXISTS stock_daily (
+                company_id INTEGER NOT NULL,
+                day TEXT NOT NULL,
+                symbol TEXT,
+                open REAL,
+                high REAL,
+                low REAL,
+                close REAL,
+                price_sum REAL NOT NULL DEFAULT 0,
+                samples INTEGER NOT NULL DEFAULT 0,
+                day_high REAL,
+                day_low REAL,
+                change_percent REAL,
+                market_cap TEXT,
+                first_at TIMESTAMP,
+                last_at TIMESTAMP,
+                PRIMARY KEY (company_id, day),
+                FOREIGN KEY (company_id) REFERENCES companies (id)
+            ) WITHOUT ROWID''',
+            'CREATE INDEX IF NOT EXISTS idx_news_company_link ON news_articles (company_id, link)'
+        ]),
+        (9, [
+            # Existing rows are indexed by `python search.py backfill`, not here
+            lambda db, conn: db.create_search_index(conn)
+        ]),
+        (10, [
+            # Story identity: one row per normalized link; syndicated copies of a
+            # story point at its first row through cluster_id
+            'ALTER TABLE news_articles ADD COLUMN link_key TEXT',
+            'ALTER TABLE news_articles ADD COLUMN title_hash TEXT',
+            'ALTER TABLE news_articles ADD COLUMN cluster_id INTEGER',
+            'ALTER TABLE news_articles ADD COLUMN signature BLOB',
+            'ALTER TABLE news_articles ADD COLUMN last_seen_at TIMESTAMP',
+            'UPDATE news_articles SET last_seen_at = fetched_at',
+            lambda db, conn: db.backfill_article_keys(conn),
+            'CREATE UNIQUE INDEX IF NOT EXISTS idx_news_company_link_key ON news_articles (company_id, link_key)',
+            'CREATE INDEX IF NOT EXISTS idx_news_company_title_hash ON news_articles (company_id, title_hash)'
+        ]),
+        (11, [
+            # Company name -> ticker; a NULL symbol records a name with no ticker
+            '''CREATE TABLE IF NOT EXISTS symbols (
+                name_key TEXT PRIMARY KEY,
+                name TEXT NOT NULL,
+                symbol TEXT,
+                source TEXT NOT NULL,
+                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )''',
+            lambda db, conn: db._save_symbols(conn, DEFAULT_SYMBOLS.items(), 'seed')
+        ]),
+        (12, [
+            # One row per company being (or last) collected; owner is NULL once
+            # the run finished. Times are Unix seconds
+            '''CREATE TABLE IF NOT EXISTS collection_locks (
+                company_key TEXT PRIMARY KEY,
+                owner TEXT,
+                acquired_at REAL,
+                expires_at REAL,
+                finished_at REAL,
+                succeeded INTEGER,
+                message TEXT
+            )'''
+        ]),
+        (13, [
+            # Consecutive failed runs, for the refresh scheduler's backoff
+            'ALTER TABLE collection_locks ADD COLUMN failures INTEGER NOT NULL DEFAULT 0'
+        ]),
+        (14, [
+            # Cluster members by story, to promote one when retention deletes the story's row
+            'CREATE INDEX IF NOT EXISTS idx_news_cluster ON news_articles (cluster_id) WHERE cluster_id IS NOT NULL'
+        ]),
+        (15, [
+            # Bumped by every write to a company's data; the API's ETags and Last-Modified
+            'ALTER TABLE companies ADD COLUMN data_version INTEGER NOT NULL DEFAULT 0',
+            'ALTER TABLE companies ADD COLUMN data_modified_at TIMESTAMP',
+            'UPDATE companies SET data_modified_at = CURRENT_TIMESTAMP'
+        ])
+    ]
+    
+    # Full-text index over article titles and snippets, kept in sync by triggers.
+    # It stores its own copy of the text, so deleting a row that was never
+    # indexed (before the backfill reaches it) is harmless.
+    SEARCH_SCHEMA = [
+        '''CREATE VIRTUAL TABLE IF NOT EXISTS news_search USING fts5(
+            title, snippet, tokenize = 'porter unicode61'
+        )''',
+        '''CREATE TRIGGER IF NOT EXISTS news_search_insert AFTER INSERT ON news_articles BEGIN
+            INSERT INTO news_search (rowid, title, snippet) VALUES (new.id, new.title, new.snippet);
+        END''',
+        '''CREATE TRIGGER IF NOT EXISTS news_search_delete AFTER DELETE ON news_articles BEGIN
+            DELETE FROM news_search WHERE rowid = old.id;
+        END''',
+        '''CREATE TRIGGER IF NOT EXISTS news_search_update AFTER UPDATE OF title, snippet ON news_articles BEGIN
+            INSERT OR REPLACE INTO news_search (rowid, title, snippet) VALUES (new.id, new.title, new.snippet);
+        END'''
+    ]
+    
+    # Marks around matched terms in search highlights and snippets
+    HIGHLIGHT_START = '\x02'
+    HIGHLIGHT_END = '\x03'
+    
+    # strftime formats that truncate a timestamp to the start of its bucket
+    TIMESERIES_BUCKETS = {
+        'minute': '%Y-%m-%d %H:%M:00',
+        'hour': '%Y-%m-%d %H:00:00',
+        'day': '%Y-%m-%d 00:00:00'
+    }
+    
+    # Stock columns mirrored into company_snapshot
+    SNAPSHOT_STOCK_FIELDS = ['symbol', 'price', 'change', 'change_percent', 'day_high', 'day_low', 'market_cap']
+    
+    # Max bound parameters per IN (...) query, below SQLite's oldest default limit
+    MAX_VARIABLES = 500
+    
+    def __init__(self, db_name='news_analyzer.db'):
+        self.db_name = db_name
+        self.pool = ConnectionPool(db_name)
+        self.init_db()
+    
+    def get_connection(self):
+        """Get this thread's pooled database connection (do not close it)"""
+        return self.pool.get()
+    
+    def transaction(self):
+        """Context manager grouping several writes into one commit"""
+        return self.pool.transaction()
+    
+    def close(self):
+        """Close all pooled connections"""
+        self.pool.close_all()
+    
+    def _notify_write(self, company_id):
+        """Bump a company's data version and tell write listeners once it is committed
         
-        conn.commit()
-        conn.close()
+        Called inside the writing transaction by every method that changes a
+        company's articles, quotes or snapshot.
+        """
+        self.get_connection().execute('''
+            UPDATE companies SET data_version = data_version + 1, data_modified_at = CURRENT_TIMESTAMP
+            WHERE id = ?
+        ''', (company_id,))
+        self.pool.after_commit(lambda: notify_company_write(company_id))
+    
+    def init_db(self):
+        """Initialize database with required tables"""
+        with self.transaction() as conn:
+            cursor = conn.cursor()
+            
+            # Create companies table
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS companies (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    name TEXT NOT NULL UNIQUE,
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                )
+            ''')
+            
+            # Create stock_data table
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS stock_data (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    company_id INTEGER NOT NULL,
+                    symbol TEXT,
+                    price REAL,
+                    change REAL,
+                    change_percent REAL,
+                    day_high REAL,
+                    day_low REAL,
+                    market_cap TEXT,
+                    fetched_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    FOREIGN KEY (company_id) REFERENCES companies (id)
+                )
+            ''')
+            
+            # Create news_articles table
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS news_articles (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    company_id INTEGER NOT NULL,
+                    title TEXT NOT NULL,
+                    link TEXT,
+                    snippet TEXT,
+                    source TEXT,
+                    sentiment_score REAL,
+                    sentiment_category TEXT,
+                    fetched_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    FOREIGN KEY (company_id) REFERENCES companies (id)
+                )
+            ''')
+            
+            # Create analysis_history table
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS analysis_history (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    company_id INTEGER NOT NULL,
+                    total_articles INTEGER,
+                    positive_count INTEGER,
+                    negative_count INTEGER,
+                    neutral_count INTEGER,
+                    avg_sentiment REAL,
+                    analyzed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    FOREIGN KEY (company_id) REFERENCES companies (id)
+                )
+            ''')
+            
+            self.migrate(conn)
+    
+    def migrate(self, conn):
+        """Apply schema migrations newer than the database's user_version"""
+        version = conn.execute('PRAGMA user_version').fetchone()[0]
+        for target, statements in self.MIGRATIONS:
+            if target <= version:
+                continue
+            for statement in statements:
+                # Data migrations are callables taking (db, conn)
+                if callable(statement):
+                    statement(self, conn)
+                else:
+                    conn.execute(statement)
+            conn.execute(f'PRAGMA user_version = {target}')
     
     def insert_company(self, company_name):
         """Insert company and return its ID"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        
-        cursor.execute('SELECT id FROM companies WHERE name = ?', (company_name,))
-        result = cursor.fetchone()
-        
-        if result:
-            company_id = result[0]
-        else:
-            cursor.execute('INSERT INTO companies (name) VALUES (?)', (company_name,))
-            company_id = cursor.lastrowid
-            conn.commit()
+        with self.transaction() as conn:
+            cursor = conn.cursor()
+            
+            cursor.execute('SELECT id FROM companies WHERE name = ?', (company_name,))
+            result = cursor.fetchone()
+            
+            if result:
+                company_id = result[0]
+            else:
+                cursor.execute('INSERT INTO companies (name) VALUES (?)', (company_name,))
+                company_id = cursor.lastrowid
         
-        conn.close()
         return company_id
     
     def insert_stock_data(self, company_id, stock_data):
@@ -103,83 +512,240 @@ class NewsDatabase:
         if not stock_data:
             return None
         
-        conn = self.get_connection()
-        cursor = conn.cursor()
+        with self.transaction() as conn:
+            cursor = conn.cursor()
+            
+            cursor.execute('''
+                INSERT INTO stock_data 
+                (company_id, symbol, price, change, change_percent, day_high, day_low, market_cap)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            ''', (
+                company_id,
+                stock_data.get('symbol'),
+                stock_data.get('price'),
+                stock_data.get('change'),
+                stock_data.get('change_percent'),
+                stock_data.get('day_high'),
+                stock_data.get('day_low'),
+                str(stock_data.get('market_cap'))
+            ))
+            
+            stock_id = cursor.lastrowid
+            self._notify_write(company_id)
         
-        cursor.execute('''
-            INSERT INTO stock_data 
-            (company_id, symbol, price, change, change_percent, day_high, day_low, market_cap)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-        ''', (
-            company_id,
-            stock_data.get('symbol'),
-            stock_data.get('price'),
-            stock_data.get('change'),
-            stock_data.get('change_percent'),
-            stock_data.get('day_high'),
-            stock_data.get('day_low'),
-            str(stock_data.get('market_cap'))
-        ))
-        
-        stock_id = cursor.lastrowid
-        conn.commit()
-        conn.close()
         return stock_id
     
     def insert_news_articles(self, company_id, articles):
-        """Insert multiple news articles"""
+        """Store a collection's articles, one row per story; returns each article's story ID
+        
+        Upserts on the normalized link: an article already stored only has its
+        last_seen_at bumped. A new link whose title, or title and snippet by
+        MinHash similarity, matches a story first seen within
+        dedup.WINDOW_DAYS joins that story's cluster and is stored without its
+        snippet. The story ID is the cluster's first row.
+        """
         if not articles:
             return []
         
+        link_keys = [normalize_link(article.get('link')) for article in articles]
+        title_hashes = [title_hash(article.get('title')) for article in articles]
+        since = (datetime.utcnow() - timedelta(days=WINDOW_DAYS)).strftime('%Y-%m-%d %H:%M:%S')
+        
+        with self.transaction() as conn:
+            known_links = self._story_ids(conn, company_id, 'link_key', link_keys)
+            recent_titles = self._story_ids(conn, company_id, 'title_hash', title_hashes, since)
+            # Signatures of recent stories, loaded only if a new title needs them
+            index = None
+            
+            # Stories new in this batch are referenced as -(position + 1) in
+            # new_stories until their rows (and IDs) exist
+            new_stories = []
+            members = []
+            refs = []
+            seen_links = []
+            for article, link_key, title_key in zip(articles, link_keys, title_hashes):
+                ref = known_links.get(link_key)
+                if ref is not None:
+                    if ref > 0:
+                        seen_links.append(link_key)
+                    refs.append(ref)
+                    continue
+                
+                ref = recent_titles.get(title_key)
+                values = None
+                if ref is None:
+                    values = signature(f"{article.get('title') or ''} {article.get('snippet') or ''}")
+                    if index is None:
+                        index = self._recent_signatures(conn, company_id, since)
+                    ref = index.find(values)
+                
+                row = [company_id, article.get('title'), article.get('link'), article.get('snippet'),
+                       article.get('source'), article.get('sentiment_score'),
+                       article.get('sentiment_category'), link_key, title_key, None, signature_to_blob(values)]
+                if ref is None:
+                    new_stories.append(row)
+                    ref = -len(new_stories)
+                    index.add(ref, values)
+                else:
+                    members.append((row, ref))
+                if link_key:
+                    known_links[link_key] = ref
+                if title_key:
+                    recent_titles.setdefault(title_key, ref)
+                refs.append(ref)
+            
+            insert = '''
+                INSERT INTO news_articles
+                (company_id, title, link, snippet, source, sentiment_score, sentiment_category,
+                 link_key, title_hash, cluster_id, signature, last_seen_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, CURRENT_TIMESTAMP)
+            '''
+            first_id = 0
+            if new_stories:
+                conn.executemany(insert, new_stories)
+                # Inside one write transaction the new rows get consecutive IDs
+                first_id = conn.execute('SELECT last_insert_rowid()').fetchone()[0] - len(new_stories) + 1
+            
+            def story_id(ref):
+                return ref if ref > 0 else first_id - ref - 1
+            
+            if members:
+                # Members keep their own title and link; the story's row holds the body
+                for row, ref in members:
+                    row[3] = None
+                    row[9] = story_id(ref)
+                    row[10] = None
+                conn.executemany(insert, [row for row, _ in members])
+            
+            for start in range(0, len(seen_links), self.MAX_VARIABLES):
+                chunk = seen_links[start:start + self.MAX_VARIABLES]
+                conn.execute(f'''
+                    UPDATE news_articles SET last_seen_at = CURRENT_TIMESTAMP
+                    WHERE company_id = ? AND link_key IN ({','.join('?' * len(chunk))})
+                ''', [company_id] + chunk)
+            # A story seen again through any of its links (or a new copy) stays
+            # current too, since retention ages stories by their own row
+            seen_stories = list({ref for ref in refs if ref > 0})
+            for start in range(0, len(seen_stories), self.MAX_VARIABLES):
+                chunk = seen_stories[start:start + self.MAX_VARIABLES]
+                conn.execute(f'''
+                    UPDATE news_articles SET last_seen_at = CURRENT_TIMESTAMP
+                    WHERE id IN ({','.join('?' * len(chunk))})
+                ''', chunk)
+            self._notify_write(company_id)
+        
+        return [story_id(ref) for ref in refs]
+    
+    def _story_ids(self, conn, company_id, column, keys, since=None):
+        """Map link_key or title_hash values to the story ID of a stored article"""
+        keys = list({key for key in keys if key})
+        window = 'AND fetched_at >= ?' if since else ''
+        found = {}
+        for start in range(0, len(keys), self.MAX_VARIABLES):
+            chunk = keys[start:start + self.MAX_VARIABLES]
+            cursor = conn.execute(f'''
+                SELECT {column}, COALESCE(cluster_id, id) FROM news_articles
+                WHERE company_id = ? AND {column} IN ({','.join('?' * len(chunk))}) {window}
+                ORDER BY id
+            ''', [company_id] + chunk + ([since] if since else []))
+            for key, story_id in cursor.fetchall():
+                found.setdefault(key, story_id)
+        return found
+    
+    def _recent_signatures(self, conn, company_id, since):
+        """SignatureIndex over the company's stories first seen since a timestamp"""
+        index = SignatureIndex()
+        cursor = conn.execute('''
+            SELECT id, signature FROM news_articles
+            WHERE company_id = ? AND fetched_at >= ? AND cluster_id IS NULL AND signature IS NOT NULL
+        ''', (company_id, since))
+        for story_id, blob in cursor.fetchall():
+            index.add(story_id, signature_from_blob(blob))
+        return index
+    
+    def get_known_sentiments(self, company_name, articles):
+        """Stored (score, category) of each article's story, by link or recent title; None if new"""
+        link_keys = [normalize_link(article.get('link')) for article in articles]
+        title_hashes = [title_hash(article.get('title')) for article in articles]
+        since = (datetime.utcnow() - timedelta(days=WINDOW_DAYS)).strftime('%Y-%m-%d %H:%M:%S')
+        
         conn = self.get_connection()
-        cursor = conn.cursor()
+        row = conn.execute('SELECT id FROM companies WHERE name = ?', (company_name,)).fetchone()
+        if row is None:
+            return [None] * len(articles)
         
-        article_ids = []
-        for article in articles:
-            cursor.execute('''
-                INSERT INTO news_articles 
-                (company_id, title, link, snippet, source, sentiment_score, sentiment_category)
-                VALUES (?, ?, ?, ?, ?, ?, ?)
-            ''', (
-                company_id,
-                article.get('title'),
-                article.get('link'),
-                article.get('snippet'),
-                article.get('source'),
-                article.get('sentiment_score'),
-                article.get('sentiment_category')
-            ))
-            article_ids.append(cursor.lastrowid)
+        by_key = {}
+        for column, keys, window in (('link_key', link_keys, None), ('title_hash', title_hashes, since)):
+            story_ids = self._story_ids(conn, row[0], column, keys, window)
+            if not story_ids:
+                continue
+            scores = {article['id']: (article['sentiment_score'], article['sentiment_category'])
+                      for article in self.get_articles_by_ids(list(set(story_ids.values())))}
+            by_key[column] = {key: scores.get(story_id) for key, story_id in story_ids.items()}
+        
+        return [
+            by_key.get('link_key', {}).get(link_key) or by_key.get('title_hash', {}).get(title_key)
+            for link_key, title_key in zip(link_keys, title_hashes)
+        ]
+    
+    def backfill_article_keys(self, conn):
+        """Give stored articles link keys and title hashes (migration 10)
+        
+        Only the newest row per company and link gets keys, so older repeats
+        from before deduplication can't break the unique index; retention
+        collapses them later. Recent stories also get signatures.
+        """
+        since = (datetime.utcnow() - timedelta(days=WINDOW_DAYS)).strftime('%Y-%m-%d %H:%M:%S')
+        cursor = conn.execute('''
+            SELECT id, company_id, title, link, snippet, fetched_at FROM news_articles ORDER BY id DESC
+        ''')
+        seen = set()
+        updates = []
+        while True:
+            rows = cursor.fetchmany(5000)
+            if not rows:
+                break
+            for article_id, company_id, title, link, snippet, fetched_at in rows:
+                link_key = normalize_link(link)
+                if link_key is None or (company_id, link_key) in seen:
+                    continue
+                seen.add((company_id, link_key))
+                values = signature(f"{title or ''} {snippet or ''}") if (fetched_at or '') >= since else None
+                updates.append((link_key, title_hash(title), signature_to_blob(values), article_id))
         
-        conn.commit()
-        conn.close()
-        return article_ids
+        conn.executemany(
+            'UPDATE news_articles SET link_key = ?, title_hash = ?, signature = ? WHERE id = ?', updates
+        )
     
     def insert_analysis_summary(self, company_id, summary):
         """Insert analysis summary"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-            INSERT INTO analysis_history 
-            (company_id, total_articles, positive_count, negative_count, neutral_count, avg_sentiment)
-            VALUES (?, ?, ?, ?, ?, ?)
-        ''', (
-            company_id,
-            summary.get('total_articles'),
-            summary.get('positive_count'),
-            summary.get('negative_count'),
-            summary.get('neutral_count'),
-            summary.get('avg_sentiment')
-        ))
-        
-        conn.commit()
-        conn.close()
+        with self.transaction() as conn:
+            conn.execute('''
+                INSERT INTO analysis_history 
+                (company_id, total_articles, positive_count, negative_count, neutral_count, avg_sentiment)
+                VALUES (?, ?, ?, ?, ?, ?)
+            ''', (
+                company_id,
+                summary.get('total_articles'),
+                summary.get('positive_count'),
+                summary.get('negative_count'),
+                summary.get('neutral_count'),
+                summary.get('avg_sentiment')
+            ))
+    
+    @staticmethod
+    def _parse_market_cap(market_cap):
+        """Market cap is stored as text; return a float or 'N/A'"""
+        try:
+            if market_cap and market_cap != 'N/A':
+                market_cap = float(market_cap)
+        except (ValueError, TypeError):
+            market_cap = 'N/A'
+        return market_cap
     
     def get_latest_stock_data(self, company_name):
         """Get latest stock data for a company"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
+        cursor = self.get_connection().cursor()
         
         cursor.execute('''
             SELECT s.symbol, s.price, s.change, s.change_percent, 
@@ -187,20 +753,14 @@ class NewsDatabase:
             FROM stock_data s
             JOIN companies c ON s.company_id = c.id
             WHERE c.name = ?
-            ORDER BY s.fetched_at DESC
+            ORDER BY s.fetched_at DESC, s.id DESC
             LIMIT 1
         ''', (company_name,))
         
         result = cursor.fetchone()
-        conn.close()
         
         if result:
-            market_cap = result[6]
-            try:
-                if market_cap and market_cap != 'N/A':
-                    market_cap = float(market_cap)
-            except (ValueError, TypeError):
-                market_cap = 'N/A'
+            market_cap = self._parse_market_cap(result[6])
             
             return {
                 'symbol': result[0],
@@ -215,27 +775,37 @@ class NewsDatabase:
             }
         return None
     
-    def get_latest_news(self, company_name, limit=50):
-        """Get latest news articles for a company"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
+    def get_latest_news(self, company_name, limit=50, before=None):
+        """Get latest news articles for a company, newest first
         
-        cursor.execute('''
+        Pass the id of the last article of a page as `before` to fetch the
+        next page (keyset pagination on fetched_at, id).
+        """
+        cursor = self.get_connection().cursor()
+        
+        params = [company_name]
+        keyset = ''
+        if before is not None:
+            keyset = 'AND (n.fetched_at, n.id) < (SELECT fetched_at, id FROM news_articles WHERE id = ?)'
+            params.append(before)
+        params.append(limit)
+        
+        cursor.execute(f'''
             SELECT n.title, n.link, n.snippet, n.source, 
-                   n.sentiment_score, n.sentiment_category, n.fetched_at
+                   n.sentiment_score, n.sentiment_category, n.fetched_at, n.id
             FROM news_articles n
             JOIN companies c ON n.company_id = c.id
-            WHERE c.name = ?
-            ORDER BY n.fetched_at DESC
+            WHERE c.name = ? AND n.cluster_id IS NULL {keyset}
+            ORDER BY n.fetched_at DESC, n.id DESC
             LIMIT ?
-        ''', (company_name, limit))
+        ''', params)
         
         results = cursor.fetchall()
-        conn.close()
         
         articles = []
         for row in results:
             articles.append({
+                'id': row[7],
                 'title': row[0],
                 'link': row[1],
                 'snippet': row[2],
@@ -247,13 +817,1098 @@ class NewsDatabase:
         
         return articles
     
+    def get_data_version(self, company_name):
+        """A company's data version and last write time, or None if it is not tracked
+        
+        The version changes with every write to the company's articles, quotes
+        or snapshot (inserts, rescoring, retention deletes), so checking whether
+        a client's copy is current reads a single companies row.
+        """
+        row = self.get_connection().execute(
+            'SELECT id, data_version, data_modified_at FROM companies WHERE name = ?', (company_name,)
+        ).fetchone()
+        if not row:
+            return None
+        return {'company_id': row[0], 'version': row[1], 'modified': row[2]}
+    
+    def get_companies_version(self):
+        """(version tuple, last modified timestamp) of the company list and snapshots"""
+        row = self.get_connection().execute('''
+            SELECT COUNT(*), MAX(id), SUM(data_version), MAX(data_modified_at) FROM companies
+        ''').fetchone()
+        return tuple(row), row[3]
+    
+    def get_stock_history(self, company_name, limit=50, before=None):
+        """Get stock data rows for a company, newest first (keyset-paginated like news)"""
+        cursor = self.get_connection().cursor()
+        
+        params = [company_name]
+        keyset = ''
+        if before is not None:
+            keyset = 'AND (s.fetched_at, s.id) < (SELECT fetched_at, id FROM stock_data WHERE id = ?)'
+            params.append(before)
+        params.append(limit)
+        
+        cursor.execute(f'''
+            SELECT s.id, s.symbol, s.price, s.change, s.change_percent,
+                   s.day_high, s.day_low, s.market_cap, s.fetched_at
+            FROM stock_data s
+            JOIN companies c ON s.company_id = c.id
+            WHERE c.name = ? {keyset}
+            ORDER BY s.fetched_at DESC, s.id DESC
+            LIMIT ?
+        ''', params)
+        
+        return [{
+            'id': row[0],
+            'symbol': row[1],
+            'price': row[2],
+            'change': row[3],
+            'change_percent': row[4],
+            'day_high': row[5],
+            'day_low': row[6],
+            'market_cap': row[7],
+            'fetched_at': row[8]
+        } for row in cursor.fetchall()]
+    
+    @staticmethod
+    def summarize_articles(articles, article_ids):
+        """Counts, average sentiment and top-3 positive/negative IDs for a set of articles"""
+        scored = [(article.get('sentiment_score') or 0, article_id)
+                  for article, article_id in zip(articles, article_ids)]
+        positive = sorted((item for item in scored if item[0] > 0.05), reverse=True)
+        negative = sorted(item for item in scored if item[0] < -0.05)
+        
+        return {
+            'total_articles': len(scored),
+            'positive_count': len(positive),
+            'negative_count': len(negative),
+            'neutral_count': len(scored) - len(positive) - len(negative),
+            'avg_sentiment': sum(score for score, _ in scored) / len(scored) if scored else None,
+            'article_ids': json.dumps(list(article_ids)),
+            'top_positive_ids': json.dumps([article_id for _, article_id in positive[:3]]),
+            'top_negative_ids': json.dumps([article_id for _, article_id in negative[:3]])
+        }
+    
+    def update_company_snapshot(self, company_id, stock_data=None, articles=None, article_ids=None):
+        """Fold a collection's stock quote and/or articles into company_snapshot
+        
+        Call inside the collection's write transaction so the snapshot never
+        disagrees with the rows it summarizes.
+        """
+        fields = {}
+        if stock_data:
+            for field in self.SNAPSHOT_STOCK_FIELDS:
+                fields[field] = stock_data.get(field)
+            fields['market_cap'] = str(stock_data.get('market_cap'))
+            fields['stock_fetched_at'] = datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S')
+        if articles:
+            fields.update(self.summarize_articles(articles, article_ids))
+        if not fields:
+            return
+        
+        columns = ['company_id'] + list(fields)
+        updates = ', '.join(f'{column} = excluded.{column}' for column in fields)
+        with self.transaction() as conn:
+            conn.execute(f'''
+                INSERT INTO company_snapshot ({', '.join(columns)}, refreshed_at)
+                VALUES ({', '.join('?' * len(columns))}, CURRENT_TIMESTAMP)
+                ON CONFLICT (company_id) DO UPDATE SET {updates}, refreshed_at = CURRENT_TIMESTAMP
+            ''', [company_id] + list(fields.values()))
+            self._notify_write(company_id)
+    
+    def rebuild_company_snapshots(self, conn):
+        """Backfill company_snapshot from the latest stock row and 50 latest articles per company"""
+        company_ids = [row[0] for row in conn.execute('SELECT id FROM companies')]
+        for company_id in company_ids:
+            stock = conn.execute('''
+                SELECT symbol, price, change, change_percent, day_high, day_low, market_cap, fetched_at
+                FROM stock_data WHERE company_id = ?
+                ORDER BY fetched_at DESC, id DESC LIMIT 1
+            ''', (company_id,)).fetchone()
+            rows = conn.execute('''
+                SELECT id, sentiment_score, fetched_at FROM news_articles WHERE company_id = ?
+                ORDER BY fetched_at DESC, id DESC LIMIT 50
+            ''', (company_id,)).fetchall()
+            if not stock and not rows:
+                continue
+            
+            fields = {}
+            if stock:
+                fields.update(zip(self.SNAPSHOT_STOCK_FIELDS + ['stock_fetched_at'], stock))
+            if rows:
+                fields.update(self.summarize_articles(
+                    [{'sentiment_score': row[1]} for row in rows], [row[0] for row in rows]
+                ))
+            refreshed_at = max(value for value in (stock and stock[7], rows and rows[0][2]) if value)
+            
+            columns = ['company_id', 'refreshed_at'] + list(fields)
+            conn.execute(
+                f"INSERT OR REPLACE INTO company_snapshot ({', '.join(columns)}) "
+                f"VALUES ({', '.join('?' * len(columns))})",
+                [company_id, refreshed_at] + list(fields.values())
+            )
+    
+    def get_company_snapshot(self, company_name):
+        """Get a company's snapshot row as a dict, or None"""
+        cursor = self.get_connection().cursor()
+        
+        cursor.execute('''
+            SELECT c.id, c.name, s.symbol, s.price, s.change, s.change_percent,
+                   s.day_high, s.day_low, s.market_cap, s.stock_fetched_at,
+                   s.total_articles, s.positive_count, s.negative_count, s.neutral_count,
+                   s.avg_sentiment, s.article_ids, s.top_positive_ids, s.top_negative_ids,
+                   s.refreshed_at
+            FROM companies c
+            JOIN company_snapshot s ON s.company_id = c.id
+            WHERE c.name = ?
+        ''', (company_name,))
+        
+        row = cursor.fetchone()
+        if not row:
+            return None
+        
+        return {
+            'company_id': row[0],
+            'name': row[1],
+            'symbol': row[2],
+            'price': row[3],
+            'change': row[4],
+            'change_percent': row[5],
+            'day_high': row[6],
+            'day_low': row[7],
+            'market_cap': self._parse_market_cap(row[8]),
+            'stock_fetched_at': row[9],
+            'total_articles': row[10] or 0,
+            'positive_count': row[11] or 0,
+            'negative_count': row[12] or 0,
+            'neutral_count': row[13] or 0,
+            'avg_sentiment': row[14],
+            'article_ids': json.loads(row[15] or '[]'),
+            'top_positive_ids': json.loads(row[16] or '[]'),
+            'top_negative_ids': json.loads(row[17] or '[]'),
+            'refreshed_at': row[18]
+        }
+    
+    def get_articles_by_ids(self, article_ids):
+        """Get articles by ID, newest first"""
+        if not article_ids:
+            return []
+        
+        cursor = self.get_connection().cursor()
+        placeholders = ','.join('?' * len(article_ids))
+        cursor.execute(f'''
+            SELECT id, title, link, snippet, source, sentiment_score, sentiment_category, fetched_at
+            FROM news_articles
+            WHERE id IN ({placeholders})
+            ORDER BY fetched_at DESC, id DESC
+        ''', list(article_ids))
+        
+        return [{
+            'id': row[0],
+            'title': row[1],
+            'link': row[2],
+            'snippet': row[3],
+            'source': row[4],
+            'sentiment_score': row[5],
+            'sentiment_category': row[6],
+            'fetched_at': row[7]
+        } for row in cursor.fetchall()]
+    
+    def find_company_name(self, company_name):
+        """Stored spelling of a company name, matched ignoring case, or None"""
+        row = self.get_connection().execute(
+            'SELECT name FROM companies WHERE name = ? COLLATE NOCASE ORDER BY id LIMIT 1', (company_name,)
+        ).fetchone()
+        return row[0] if row else None
+    
+    def get_company_id(self, company_name):
+        """Get a company's ID, or None if it is not tracked"""
+        row = self.get_connection().execute(
+            'SELECT id FROM companies WHERE name = ?', (company_name,)
+        ).fetchone()
+        return row[0] if row else None
+    
     def get_all_companies(self):
-        """Get all companies in database"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
+        """Get all companies in database with their snapshot"""
+        cursor = self.get_connection().cursor()
         
-        cursor.execute('SELECT name, created_at FROM companies ORDER BY created_at DESC')
+        cursor.execute('''
+            SELECT c.name, c.created_at, s.symbol, s.price, s.change, s.change_percent,
+                   s.total_articles, s.positive_count, s.negative_count, s.neutral_count,
+                   s.avg_sentiment, s.refreshed_at
+            FROM companies c
+            LEFT JOIN company_snapshot s ON s.company_id = c.id
+            ORDER BY c.created_at DESC
+        ''')
         results = cursor.fetchall()
-        conn.close()
         
-        return [{'name': row[0], 'created_at': row[1]} for row in results]
\ No newline at end of file
+        return [{
+            'name': row[0],
+            'created_at': row[1],
+            'symbol': row[2],
+            'price': row[3],
+            'change': row[4],
+            'change_percent': row[5],
+            'total_articles': row[6],
+            'positive_count': row[7],
+            'negative_count': row[8],
+            'neutral_count': row[9],
+            'avg_sentiment': row[10],
+            'refreshed_at': row[11]
+        } for row in results]
+    
+    def record_company_views(self, counts, half_life):
+        """Add page views given as {company_id: count} to each company's decayed view score
+        
+        Scores halve every `half_life` seconds, so they track recent interest.
+        """
+        if not counts:
+            return
+        
+        company_ids = list(counts)
+        with self.transaction() as conn:
+            current = {}
+            for start in range(0, len(company_ids), self.MAX_VARIABLES):
+                chunk = company_ids[start:start + self.MAX_VARIABLES]
+                placeholders = ','.join('?' * len(chunk))
+                cursor = conn.execute(f'''
+                    SELECT company_id, views, (julianday('now') - julianday(viewed_at)) * 86400
+                    FROM company_views WHERE company_id IN ({placeholders})
+                ''', chunk)
+                for company_id, views, age in cursor.fetchall():
+                    current[company_id] = views * 0.5 ** (max(age, 0) / half_life)
+            conn.executemany(
+                'INSERT OR REPLACE INTO company_views (company_id, views, viewed_at) VALUES (?, ?, CURRENT_TIMESTAMP)',
+                [(company_id, current.get(company_id, 0.0) + count) for company_id, count in counts.items()]
+            )
+    
+    def get_refresh_candidates(self):
+        """Every company with its data age, view score and failed attempts, for the refresh scheduler
+        
+        Ages are in seconds; `age` is None for companies never collected.
+        `failures` counts consecutive failed or empty collections, the last
+        one `attempt_age` seconds ago.
+        """
+        cursor = self.get_connection().cursor()
+        
+        cursor.execute('''
+            SELECT c.id, c.name,
+                   (julianday('now') - julianday(s.refreshed_at)) * 86400,
+                   v.views,
+                   (julianday('now') - julianday(v.viewed_at)) * 86400,
+                   l.failures, l.finished_at
+            FROM companies c
+            LEFT JOIN company_snapshot s ON s.company_id = c.id
+            LEFT JOIN company_views v ON v.company_id = c.id
+            LEFT JOIN collection_locks l ON l.company_key = c.name
+        ''')
+        
+        now = time.time()
+        return [{
+            'id': row[0],
+            'name': row[1],
+            'age': row[2],
+            'views': row[3] or 0.0,
+            'views_age': row[4] or 0.0,
+            'failures': row[5] or 0,
+            'attempt_age': now - row[6] if row[6] is not None else None
+        } for row in cursor.fetchall()]
+    
+    def create_job(self, job_id, kind, company_name):
+        """Record a newly queued background job"""
+        with self.transaction() as conn:
+            conn.execute(
+                'INSERT INTO jobs (id, kind, company_name) VALUES (?, ?, ?)',
+                (job_id, kind, company_name)
+            )
+    
+    def start_job(self, job_id):
+        """Mark a job as running"""
+        with self.transaction() as conn:
+            conn.execute(
+                "UPDATE jobs SET state = 'running', started_at = CURRENT_TIMESTAMP WHERE id = ?",
+                (job_id,)
+            )
+    
+    def finish_job(self, job_id, state, message=None, error=None, duration=None):
+        """Mark a job as succeeded or failed"""
+        with self.transaction() as conn:
+            conn.execute('''
+                UPDATE jobs
+                SET state = ?, message = ?, error = ?, duration = ?, finished_at = CURRENT_TIMESTAMP
+                WHERE id = ?
+            ''', (state, message, error, duration, job_id))
+    
+    def find_shared_job(self, company_name, kinds, window, stale_after):
+        """ID of a job a new request for the company can share, or None
+        
+        That is a queued or running job created within stale_after seconds
+        (older ones were orphaned by a stopped process), or one that
+        succeeded within the last `window` seconds.
+        """
+        placeholders = ','.join('?' * len(kinds))
+        row = self.get_connection().execute(f'''
+            SELECT id FROM jobs
+            WHERE company_name = ? AND kind IN ({placeholders})
+              AND ((state IN ('queued', 'running') AND created_at >= datetime('now', ?))
+                   OR (state = 'succeeded' AND finished_at >= datetime('now', ?)))
+            ORDER BY created_at DESC
+            LIMIT 1
+        ''', [company_name] + list(kinds) + [f'-{int(stale_after)} seconds', f'-{int(window)} seconds']).fetchone()
+        return row[0] if row else None
+    
+    def get_job(self, job_id):
+        """Get a job's status"""
+        cursor = self.get_connection().cursor()
+        
+        cursor.execute('''
+            SELECT id, kind, company_name, state, message, error, duration,
+                   created_at, started_at, finished_at
+            FROM jobs
+            WHERE id = ?
+        ''', (job_id,))
+        
+        row = cursor.fetchone()
+        if not row:
+            return None
+        
+        return {
+            'id': row[0],
+            'kind': row[1],
+            'company_name': row[2],
+            'state': row[3],
+            'message': row[4],
+            'error': row[5],
+            'duration': row[6],
+            'created_at': row[7],
+            'started_at': row[8],
+            'finished_at': row[9]
+        }
+    
+    def get_cached_sentiments(self, text_hashes, version):
+        """Get cached sentiment scores as {text_hash: score}"""
+        cursor = self.get_connection().cursor()
+        text_hashes = list(text_hashes)
+        
+        found = {}
+        for start in range(0, len(text_hashes), self.MAX_VARIABLES):
+            chunk = text_hashes[start:start + self.MAX_VARIABLES]
+            placeholders = ','.join('?' * len(chunk))
+            cursor.execute(f'''
+                SELECT text_hash, score FROM sentiment_cache
+                WHERE version = ? AND text_hash IN ({placeholders})
+            ''', [version] + chunk)
+            found.update(cursor.fetchall())
+        
+        return found
+    
+    def put_cached_sentiments(self, scores, version):
+        """Store sentiment scores given as {text_hash: score}"""
+        with self.transaction() as conn:
+            conn.executemany(
+                'INSERT OR REPLACE INTO sentiment_cache (text_hash, version, score) VALUES (?, ?, ?)',
+                [(text_hash, version, score) for text_hash, score in scores.items()]
+            )
+    
+    def get_article_texts(self, after_id=0, limit=1000):
+        """Get (id, title, snippet) rows with id > after_id, in id order"""
+        cursor = self.get_connection().cursor()
+        
+        cursor.execute('''
+            SELECT id, title, snippet FROM news_articles
+            WHERE id > ?
+            ORDER BY id
+            LIMIT ?
+        ''', (after_id, limit))
+        
+        return cursor.fetchall()
+    
+    def update_article_sentiments(self, rows):
+        """Bulk update sentiment from (article_id, score, category) rows
+        
+        Snapshots of the companies owning these articles are re-summarized in
+        the same transaction, so counts and top articles follow the new scores.
+        """
+        article_ids = [row[0] for row in rows]
+        with self.transaction() as conn:
+            conn.executemany(
+                'UPDATE news_articles SET sentiment_score = ?, sentiment_category = ? WHERE id = ?',
+                [(score, category, article_id) for article_id, score, category in rows]
+            )
+            company_ids = set()
+            for start in range(0, len(article_ids), self.MAX_VARIABLES):
+                chunk = article_ids[start:start + self.MAX_VARIABLES]
+                placeholders = ','.join('?' * len(chunk))
+                company_ids.update(row[0] for row in conn.execute(
+                    f'SELECT DISTINCT company_id FROM news_articles WHERE id IN ({placeholders})', chunk))
+            self.resummarize_company_snapshots(conn, company_ids)
+            for company_id in company_ids:
+                self._notify_write(company_id)
+    
+    def resummarize_company_snapshots(self, conn, company_ids):
+        """Recompute snapshot counts and top articles from their articles' current scores
+        
+        The snapshot keeps its article set (the latest collection's stories);
+        only the sentiment summary of those articles is refreshed.
+        """
+        for company_id in company_ids:
+            row = conn.execute('SELECT article_ids FROM company_snapshot WHERE company_id = ?',
+                               (company_id,)).fetchone()
+            article_ids = json.loads(row[0] or '[]') if row else []
+            if not article_ids:
+                continue
+            scores = {}
+            for start in range(0, len(article_ids), self.MAX_VARIABLES):
+                chunk = article_ids[start:start + self.MAX_VARIABLES]
+                placeholders = ','.join('?' * len(chunk))
+                scores.update(conn.execute(
+                    f'SELECT id, sentiment_score FROM news_articles WHERE id IN ({placeholders})', chunk))
+            present = [article_id for article_id in article_ids if article_id in scores]
+            fields = self.summarize_articles([{'sentiment_score': scores[i]} for i in present], present)
+            assignments = ', '.join(f'{column} = ?' for column in fields)
+            conn.execute(f'UPDATE company_snapshot SET {assignments} WHERE company_id = ?',
+                         list(fields.values()) + [company_id])
+    
+    def get_news_sources(self):
+        """Get configured source patterns as (allow, deny) lists"""
+        cursor = self.get_connection().cursor()
+        cursor.execute('SELECT pattern, policy FROM news_sources')
+        
+        allow, deny = [], []
+        for pattern, policy in cursor.fetchall():
+            (deny if policy == 'deny' else allow).append(pattern)
+        return allow, deny
+    
+    def set_news_sources(self, patterns, policy='allow'):
+        """Add or update source patterns with an allow/deny policy"""
+        with self.transaction() as conn:
+            conn.executemany(
+                'INSERT OR REPLACE INTO news_sources (pattern, policy) VALUES (?, ?)',
+                [(pattern, policy) for pattern in patterns]
+            )
+    
+    def _collection_lock(self, row):
+        if row is None:
+            return None
+        return dict(zip(('owner', 'acquired_at', 'expires_at', 'finished_at', 'succeeded', 'message'), row))
+    
+    def get_collection_lock(self, company_key):
+        """A company's collection lock row as a dict, or None"""
+        return self._collection_lock(self.get_connection().execute('''
+            SELECT owner, acquired_at, expires_at, finished_at, succeeded, message
+            FROM collection_locks WHERE company_key = ?
+        ''', (company_key,)).fetchone())
+    
+    def claim_collection(self, company_key, owner, lease, cooldown):
+        """Try to take a company's collection lock; returns (state, lock)
+        
+        state is 'claimed' (the caller collects), 'busy' (another owner holds
+        an unexpired lock) or 'cooldown' (the last run succeeded less than
+        `cooldown` seconds ago).
+        """
+        now = time.time()
+        with self.transaction() as conn:
+            lock = self._collection_lock(conn.execute('''
+                SELECT owner, acquired_at, expires_at, finished_at, succeeded, message
+                FROM collection_locks WHERE company_key = ?
+            ''', (company_key,)).fetchone())
+            if lock is not None:
+                if lock['owner'] is not None and lock['expires_at'] > now:
+                    return 'busy', lock
+                if lock['owner'] is None and lock['succeeded'] and now - lock['finished_at'] < cooldown:
+                    return 'cooldown', lock
+            
+            conn.execute('''
+                INSERT INTO collection_locks (company_key, owner, acquired_at, expires_at)
+                VALUES (?, ?, ?, ?)
+                ON CONFLICT(company_key) DO UPDATE SET
+                    owner = excluded.owner,
+                    acquired_at = excluded.acquired_at,
+                    expires_at = excluded.expires_at
+            ''', (company_key, owner, now, now + lease))
+        return 'claimed', self.get_collection_lock(company_key)
+    
+    def finish_collection(self, company_key, owner, succeeded, message=None):
+        """Release a collection lock held by owner, recording the run's outcome"""
+        succeeded = int(bool(succeeded))
+        with self.transaction() as conn:
+            conn.execute('''
+                UPDATE collection_locks
+                SET owner = NULL, finished_at = ?, succeeded = ?, message = ?,
+                    failures = CASE WHEN ? THEN 0 ELSE failures + 1 END
+                WHERE company_key = ? AND owner = ?
+            ''', (time.time(), succeeded, message, succeeded, company_key, owner))
+    
+    def get_symbols(self, miss_days):
+        """(name, symbol) rows of the symbols table; misses only if checked within miss_days"""
+        cursor = self.get_connection().cursor()
+        cursor.execute('''
+            SELECT name, symbol FROM symbols
+            WHERE symbol IS NOT NULL OR updated_at >= datetime('now', ?)
+        ''', (f'-{miss_days} days',))
+        return cursor.fetchall()
+    
+    def save_symbols(self, pairs, source):
+        """Store (name, symbol) pairs, symbol None for a name with no ticker; returns rows written
+        
+        A name's first ticker is kept; only a recorded miss is replaced (or
+        re-dated when the name still has no ticker).
+        """
+        with self.transaction() as conn:
+            return self._save_symbols(conn, pairs, source)
+    
+    def _save_symbols(self, conn, pairs, source):
+        rows = [(name_key(name), name.strip(), symbol.strip().upper() if symbol else None, source)
+                for name, symbol in pairs if name and name_key(name)]
+        before = conn.total_changes
+        conn.executemany('''
+            INSERT INTO symbols (name_key, name, symbol, source) VALUES (?, ?, ?, ?)
+            ON CONFLICT(name_key) DO UPDATE SET
+                name = excluded.name,
+                symbol = excluded.symbol,
+                source = excluded.source,
+                updated_at = CURRENT_TIMESTAMP
+            WHERE symbols.symbol IS NULL
+        ''', rows)
+        return conn.total_changes - before
+    
+    # Exportable datasets: columns and the table/alias they are read from
+    EXPORTS = {
+        'articles': {
+            'table': 'news_articles',
+            'columns': ['id', 'company', 'title', 'link', 'snippet', 'source',
+                        'sentiment_score', 'sentiment_category', 'fetched_at'],
+            'select': 'n.id, c.name, n.title, n.link, n.snippet, n.source, '
+                      'n.sentiment_score, n.sentiment_category, n.fetched_at'
+        },
+        'quotes': {
+            'table': 'stock_data',
+            'columns': ['id', 'company', 'symbol', 'price', 'change', 'change_percent',
+                        'day_high', 'day_low', 'market_cap', 'fetched_at'],
+            'select': 'n.id, c.name, n.symbol, n.price, n.change, n.change_percent, '
+                      'n.day_high, n.day_low, n.market_cap, n.fetched_at'
+        }
+    }
+    
+    def iter_export(self, dataset, company_names=None, start=None, end=None, chunk_size=1000):
+        """Stream a dataset as lists of row tuples (fetchmany chunks)
+        
+        Uses its own connection so a slow consumer never ties up the pooled
+        one; memory stays at one chunk regardless of table size.
+        """
+        spec = self.EXPORTS[dataset]
+        conditions = []
+        params = []
+        if start:
+            conditions.append('n.fetched_at >= ?')
+            params.append(start)
+        if end:
+            conditions.append('n.fetched_at < ?')
+            params.append(end)
+        
+        if company_names:
+            # One (company_id, fetched_at) index range per company: no sort step
+            company_ids = self.get_company_ids(company_names)
+            scans = [
+                (['n.company_id = ?'] + conditions, [company_ids[name]] + params, 'n.fetched_at, n.id')
+                for name in company_names if name in company_ids
+            ]
+        else:
+            scans = [(conditions, params, 'n.id')]
+        
+        conn = self.pool.connect()
+        try:
+            for scan_conditions, scan_params, order in scans:
+                where = ('WHERE ' + ' AND '.join(scan_conditions)) if scan_conditions else ''
+                cursor = conn.execute(f'''
+                    SELECT {spec['select']}
+                    FROM {spec['table']} n
+                    JOIN companies c ON n.company_id = c.id
+                    {where}
+                    ORDER BY {order}
+                ''', scan_params)
+                while True:
+                    rows = cursor.fetchmany(chunk_size)
+                    if not rows:
+                        break
+                    yield rows
+        finally:
+            conn.close()
+    
+    def get_company_ids(self, company_names):
+        """Map company names to IDs; unknown names are left out"""
+        if not company_names:
+            return {}
+        
+        cursor = self.get_connection().cursor()
+        placeholders = ','.join('?' * len(company_names))
+        cursor.execute(f'SELECT name, id FROM companies WHERE name IN ({placeholders})', list(company_names))
+        return dict(cursor.fetchall())
+    
+    def get_price_series(self, company_ids, bucket, start, end):
+        """Bucketed price aggregates per company as {company_id: [point, ...]}
+        
+        Days rolled up by retention contribute one daily sample set, so buckets
+        finer than a day show them at midnight.
+        """
+        bucket_format = self.TIMESERIES_BUCKETS[bucket]
+        placeholders = ','.join('?' * len(company_ids))
+        cursor = self.get_connection().cursor()
+        
+        # Raw rows plus the daily rollups retention left behind for older days
+        cursor.execute(f'''
+            SELECT company_id, bucket, SUM(price_sum) / SUM(samples), MIN(low), MAX(high), SUM(samples)
+            FROM (
+                SELECT company_id, strftime('{bucket_format}', fetched_at) AS bucket,
+                       SUM(price) AS price_sum, MIN(price) AS low, MAX(price) AS high, COUNT(price) AS samples
+                FROM stock_data
+                WHERE company_id IN ({placeholders}) AND fetched_at >= ? AND fetched_at < ?
+                GROUP BY company_id, bucket
+                UNION ALL
+                SELECT company_id, strftime('{bucket_format}', day), price_sum, low, high, samples
+                FROM stock_daily
+                WHERE company_id IN ({placeholders}) AND day || ' 00:00:00' >= ? AND day || ' 00:00:00' < ?
+            )
+            GROUP BY company_id, bucket
+            HAVING SUM(samples) > 0
+            ORDER BY company_id, bucket
+        ''', (list(company_ids) + [start, end]) * 2)
+        
+        series = {company_id: [] for company_id in company_ids}
+        for company_id, bucket_start, avg, low, high, samples in cursor.fetchall():
+            series[company_id].append({
+                't': bucket_start,
+                'avg': avg,
+                'min': low,
+                'max': high,
+                'samples': samples
+            })
+        return series
+    
+    def get_sentiment_series(self, company_ids, bucket, start, end):
+        """Bucketed analysis_history aggregates per company as {company_id: [point, ...]}"""
+        bucket_format = self.TIMESERIES_BUCKETS[bucket]
+        placeholders = ','.join('?' * len(company_ids))
+        cursor = self.get_connection().cursor()
+        
+        cursor.execute(f'''
+            SELECT company_id, strftime('{bucket_format}', analyzed_at) AS bucket,
+                   AVG(avg_sentiment), SUM(total_articles), SUM(positive_count),
+                   SUM(negative_count), SUM(neutral_count), COUNT(*)
+            FROM analysis_history
+            WHERE company_id IN ({placeholders}) AND analyzed_at >= ? AND analyzed_at < ?
+            GROUP BY company_id, bucket
+            ORDER BY company_id, bucket
+        ''', list(company_ids) + [start, end])
+        
+        series = {company_id: [] for company_id in company_ids}
+        for company_id, bucket_start, avg, total, positive, negative, neutral, runs in cursor.fetchall():
+            series[company_id].append({
+                't': bucket_start,
+                'avg': avg,
+                'articles': total,
+                'positive': positive,
+                'negative': negative,
+                'neutral': neutral,
+                'runs': runs
+            })
+        return series
+    
+    def create_search_index(self, conn):
+        """Create the news_search table and triggers; False if SQLite lacks FTS5"""
+        try:
+            for statement in self.SEARCH_SCHEMA:
+                conn.execute(statement)
+        except sqlite3.OperationalError as e:
+            if 'fts5' not in str(e):
+                raise
+            log.warning(f"⚠️ SQLite was built without FTS5, article search is disabled: {e}")
+            return False
+        return True
+    
+    def search_available(self):
+        """Whether the news_search index exists"""
+        row = self.get_connection().execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'news_search'"
+        ).fetchone()
+        return row is not None
+    
+    def backfill_search_index(self, after_id=0, batch_size=1000):
+        """Index articles with after_id < id <= after_id + batch_size that are missing from news_search
+        
+        Returns (rows indexed, last id covered, or None once past the newest article).
+        """
+        with self.transaction() as conn:
+            last_id = min(after_id + batch_size, conn.execute(
+                'SELECT COALESCE(MAX(id), 0) FROM news_articles').fetchone()[0])
+            if last_id <= after_id:
+                return 0, None
+            indexed = conn.execute('''
+                INSERT INTO news_search (rowid, title, snippet)
+                SELECT n.id, n.title, n.snippet FROM news_articles n
+                WHERE n.id > ? AND n.id <= ?
+                  AND NOT EXISTS (SELECT 1 FROM news_search s WHERE s.rowid = n.id)
+            ''', (after_id, last_id)).rowcount
+        return indexed, last_id
+    
+    def search_articles(self, match, company_ids=None, sentiment=None, start=None, end=None,
+                        limit=20, offset=0):
+        """Articles matching an FTS5 query, best BM25 score first
+        
+        Titles weigh four times as much as snippets. `title_highlight` and
+        `snippet_highlight` wrap matched terms in HIGHLIGHT_START/HIGHLIGHT_END.
+        """
+        if company_ids is not None and not company_ids:
+            return []
+        
+        # Syndicated copies (cluster members) are represented by their story
+        conditions = ['news_search MATCH ?', 'n.cluster_id IS NULL']
+        params = [self.HIGHLIGHT_START, self.HIGHLIGHT_END, self.HIGHLIGHT_START, self.HIGHLIGHT_END, match]
+        if company_ids is not None:
+            conditions.append(f"n.company_id IN ({','.join('?' * len(company_ids))})")
+            params.extend(company_ids)
+        if sentiment:
+            conditions.append('n.sentiment_category = ?')
+            params.append(sentiment)
+        if start:
+            conditions.append('n.fetched_at >= ?')
+            params.append(start)
+        if end:
+            conditions.append('n.fetched_at < ?')
+            params.append(end)
+        params.extend([limit, offset])
+        
+        cursor = self.get_connection().cursor()
+        cursor.execute(f'''
+            SELECT n.id, c.name, n.title, n.link, n.source, n.sentiment_score, n.sentiment_category,
+                   n.fetched_at, highlight(news_search, 0, ?, ?),
+                   snippet(news_search, 1, ?, ?, '…', 32), bm25(news_search, 4.0, 1.0) AS score
+            FROM news_search
+            JOIN news_articles n ON n.id = news_search.rowid
+            JOIN companies c ON c.id = n.company_id
+            WHERE {' AND '.join(conditions)}
+            ORDER BY score
+            LIMIT ? OFFSET ?
+        ''', params)
+        
+        return [{
+            'id': row[0],
+            'company': row[1],
+            'title': row[2],
+            'link': row[3],
+            'source': row[4],
+            'sentiment_score': row[5],
+            'sentiment_category': row[6],
+            'fetched_at': row[7],
+            'title_highlight': row[8],
+            'snippet_highlight': row[9],
+            'score': -row[10]
+        } for row in cursor.fetchall()]
+    
+    def get_snapshot_article_ids(self):
+        """IDs of every article a company snapshot points at (retention keeps these)"""
+        cursor = self.get_connection().cursor()
+        cursor.execute('SELECT article_ids, top_positive_ids, top_negative_ids FROM company_snapshot')
+        
+        referenced = set()
+        for row in cursor.fetchall():
+            for ids in row:
+                referenced.update(json.loads(ids or '[]'))
+        return referenced
+    
+    def get_stock_rows_before(self, cutoff, limit=500):
+        """Oldest stock_data rows fetched before cutoff, as (company_id, quotes export row) tuples
+        
+        Each company's latest quote is never returned, however old, so
+        get_latest_stock_data keeps answering for companies no longer refreshed.
+        """
+        cursor = self.get_connection().cursor()
+        
+        cursor.execute(f'''
+            SELECT n.company_id, {self.EXPORTS['quotes']['select']}
+            FROM stock_data n
+            JOIN companies c ON n.company_id = c.id
+            WHERE n.fetched_at < ?
+              AND EXISTS (
+                  SELECT 1 FROM stock_data m
+                  WHERE m.company_id = n.company_id
+                    AND (m.fetched_at > n.fetched_at OR (m.fetched_at = n.fetched_at AND m.id > n.id))
+              )
+            ORDER BY n.id
+            LIMIT ?
+        ''', (cutoff, limit))
+        
+        return [(row[0], row[1:]) for row in cursor.fetchall()]
+    
+    def rollup_stock_rows(self, rows):
+        """Fold stock rows (from get_stock_rows_before) into stock_daily and delete them
+        
+        Rows are merged into any existing day, so a day may be rolled up across
+        several batches. Returns the number of raw rows removed.
+        """
+        columns = ['symbol', 'open', 'high', 'low', 'close', 'price_sum', 'samples',
+                   'day_high', 'day_low', 'change_percent', 'market_cap', 'first_at', 'last_at']
+        with self.transaction() as conn:
+            # Only fold rows still present, so a concurrent pass can't count a row twice
+            present = set()
+            ids = [row[0] for _, row in rows]
+            for start in range(0, len(ids), self.MAX_VARIABLES):
+                chunk = ids[start:start + self.MAX_VARIABLES]
+                placeholders = ','.join('?' * len(chunk))
+                present.update(row[0] for row in conn.execute(
+                    f'SELECT id FROM stock_data WHERE id IN ({placeholders})', chunk))
+            rows = [(company_id, row) for company_id, row in rows if row[0] in present]
+            days = self._daily_rollups(rows)
+            
+            # SET expressions see the existing row's values; excluded.* is the new batch
+            conn.executemany(f'''
+                INSERT INTO stock_daily (company_id, day, {', '.join(columns)})
+                VALUES (?, ?, {', '.join('?' * len(columns))})
+                ON CONFLICT (company_id, day) DO UPDATE SET
+                    symbol = COALESCE(excluded.symbol, symbol),
+                    open = CASE WHEN excluded.first_at < first_at OR open IS NULL
+                                THEN COALESCE(excluded.open, open) ELSE open END,
+                    close = CASE WHEN excluded.last_at >= last_at OR close IS NULL
+                                 THEN COALESCE(excluded.close, close) ELSE close END,
+                    high = MAX(COALESCE(high, excluded.high), COALESCE(excluded.high, high)),
+                    low = MIN(COALESCE(low, excluded.low), COALESCE(excluded.low, low)),
+                    price_sum = price_sum + excluded.price_sum,
+                    samples = samples + excluded.samples,
+                    day_high = MAX(COALESCE(day_high, excluded.day_high), COALESCE(excluded.day_high, day_high)),
+                    day_low = MIN(COALESCE(day_low, excluded.day_low), COALESCE(excluded.day_low, day_low)),
+                    change_percent = CASE WHEN excluded.last_at >= last_at
+                                          THEN excluded.change_percent ELSE change_percent END,
+                    market_cap = CASE WHEN excluded.last_at >= last_at
+                                      THEN excluded.market_cap ELSE market_cap END,
+                    first_at = MIN(first_at, excluded.first_at),
+                    last_at = MAX(last_at, excluded.last_at)
+            ''', [
+                [company_id, day] + [values[column] for column in columns]
+                for (company_id, day), values in days.items()
+            ])
+            deleted = self._delete_rows(conn, 'stock_data', [row[0] for _, row in rows])
+            for company_id in {company_id for company_id, _ in rows}:
+                self._notify_write(company_id)
+        return deleted
+    
+    @staticmethod
+    def _daily_rollups(rows):
+        """Aggregate (company_id, quotes export row) tuples into {(company_id, day): values}"""
+        days = {}
+        for company_id, row in sorted(rows, key=lambda item: (item[1][-1], item[1][0])):
+            _, _, symbol, price, _, change_percent, day_high, day_low, market_cap, fetched_at = row
+            day = days.setdefault((company_id, fetched_at[:10]), {
+                'symbol': None, 'open': None, 'high': None, 'low': None, 'close': None,
+                'price_sum': 0.0, 'samples': 0, 'day_high': None, 'day_low': None,
+                'change_percent': None, 'market_cap': None, 'first_at': fetched_at, 'last_at': fetched_at
+            })
+            day['symbol'] = symbol or day['symbol']
+            day['change_percent'] = change_percent
+            day['market_cap'] = market_cap
+            day['last_at'] = fetched_at
+            if price is not None:
+                if day['open'] is None:
+                    day['open'] = price
+                day['close'] = price
+                day['high'] = price if day['high'] is None else max(day['high'], price)
+                day['low'] = price if day['low'] is None else min(day['low'], price)
+                day['price_sum'] += price
+                day['samples'] += 1
+            if day_high is not None:
+                day['day_high'] = day_high if day['day_high'] is None else max(day['day_high'], day_high)
+            if day_low is not None:
+                day['day_low'] = day_low if day['day_low'] is None else min(day['day_low'], day_low)
+        return days
+    
+    def find_duplicate_articles(self, cutoff, after_id=0, limit=500):
+        """(id, company_id) of articles last seen before cutoff whose link reappears in a newer row
+        
+        Scans in id order from after_id, so callers can page through the table.
+        """
+        cursor = self.get_connection().cursor()
+        
+        cursor.execute('''
+            SELECT n.id, n.company_id FROM news_articles n
+            WHERE n.id > ? AND COALESCE(n.last_seen_at, n.fetched_at) < ? AND n.link IS NOT NULL
+              AND EXISTS (
+                  SELECT 1 FROM news_articles m
+                  WHERE m.company_id = n.company_id AND m.link = n.link AND m.id > n.id
+              )
+            ORDER BY n.id
+            LIMIT ?
+        ''', (after_id, cutoff, limit))
+        
+        return cursor.fetchall()
+    
+    def delete_duplicate_articles(self, rows):
+        """Delete (id, company_id) rows from find_duplicate_articles; returns the count"""
+        if not rows:
+            return 0
+        
+        with self.transaction() as conn:
+            ids = []
+            candidates = [article_id for article_id, _ in rows]
+            for start in range(0, len(candidates), self.MAX_VARIABLES):
+                chunk = candidates[start:start + self.MAX_VARIABLES]
+                placeholders = ','.join('?' * len(chunk))
+                # Re-check that a newer copy still exists, in case it changed since the scan
+                ids.extend(row[0] for row in conn.execute(f'''
+                    SELECT n.id FROM news_articles n
+                    WHERE n.id IN ({placeholders}) AND EXISTS (
+                        SELECT 1 FROM news_articles m
+                        WHERE m.company_id = n.company_id AND m.link = n.link AND m.id > n.id
+                    )
+                ''', chunk))
+            self._promote_cluster_members(conn, ids)
+            deleted = self._delete_rows(conn, 'news_articles', ids)
+            for company_id in {company_id for _, company_id in rows}:
+                self._notify_write(company_id)
+        return deleted
+    
+    def get_articles_before(self, cutoff, after_id=0, limit=500):
+        """Articles last seen before cutoff with id > after_id, as (company_id, articles export row) tuples"""
+        cursor = self.get_connection().cursor()
+        
+        cursor.execute(f'''
+            SELECT n.company_id, {self.EXPORTS['articles']['select']}
+            FROM news_articles n
+            JOIN companies c ON n.company_id = c.id
+            WHERE n.id > ? AND COALESCE(n.last_seen_at, n.fetched_at) < ?
+            ORDER BY n.id
+            LIMIT ?
+        ''', (after_id, cutoff, limit))
+        
+        return [(row[0], row[1:]) for row in cursor.fetchall()]
+    
+    def delete_articles(self, rows):
+        """Delete (company_id, export row) articles from get_articles_before; returns the count"""
+        ids = [row[0] for _, row in rows]
+        with self.transaction() as conn:
+            self._promote_cluster_members(conn, ids)
+            deleted = self._delete_rows(conn, 'news_articles', ids)
+            for company_id in {company_id for company_id, _ in rows}:
+                self._notify_write(company_id)
+        return deleted
+    
+    def _promote_cluster_members(self, conn, ids):
+        """Before deleting story rows, make each story's oldest surviving member its new row
+        
+        The new row takes over the story's snippet and signature (members are
+        stored without them) and the other members are repointed to it, so no
+        member is left pointing at a deleted cluster_id.
+        """
+        doomed = set(ids)
+        heirs = {}
+        for start in range(0, len(ids), self.MAX_VARIABLES):
+            chunk = ids[start:start + self.MAX_VARIABLES]
+            cursor = conn.execute(f'''
+                SELECT id, cluster_id FROM news_articles
+                WHERE cluster_id IN ({','.join('?' * len(chunk))})
+                ORDER BY id
+            ''', chunk)
+            for member_id, story_id in cursor.fetchall():
+                if member_id not in doomed:
+                    heirs.setdefault(story_id, member_id)
+        
+        for story_id, heir_id in heirs.items():
+            conn.execute('''
+                UPDATE news_articles
+                SET cluster_id = NULL,
+                    snippet = COALESCE(snippet, (SELECT snippet FROM news_articles WHERE id = ?)),
+                    signature = COALESCE(signature, (SELECT signature FROM news_articles WHERE id = ?))
+                WHERE id = ?
+            ''', (story_id, story_id, heir_id))
+            conn.execute(
+                'UPDATE news_articles SET cluster_id = ? WHERE cluster_id = ?', (heir_id, story_id))
+    
+    def expire_cached_sentiments(self, cutoff, version=None, after=None, limit=500):
+        """Delete cached scores created before cutoff, or by an analyzer version other than `version`
+        
+        Checks `limit` rows in key order after the (text_hash, version) key
+        `after`; returns (rows deleted, last key checked, or None at the end).
+        """
+        with self.transaction() as conn:
+            text_hash, key_version = after or ('', '')
+            rows = conn.execute('''
+                SELECT text_hash, version, created_at FROM sentiment_cache
+                WHERE text_hash > ? OR (text_hash = ? AND version > ?)
+                ORDER BY text_hash, version
+                LIMIT ?
+            ''', (text_hash, text_hash, key_version, limit)).fetchall()
+            if not rows:
+                return 0, None
+            expired = [(row[0], row[1]) for row in rows
+                       if (row[2] or '') < cutoff or (version is not None and row[1] != version)]
+            deleted = 0
+            for key in expired:
+                deleted += conn.execute(
+                    'DELETE FROM sentiment_cache WHERE text_hash = ? AND version = ?', key).rowcount
+        return deleted, (rows[-1][0], rows[-1][1])
+    
+    def delete_finished_jobs(self, cutoff, limit=500):
+        """Delete up to `limit` jobs that finished before cutoff; returns the count"""
+        with self.transaction() as conn:
+            return conn.execute('''
+                DELETE FROM jobs WHERE id IN (
+                    SELECT id FROM jobs WHERE finished_at < ? LIMIT ?
+                )
+            ''', (cutoff, limit)).rowcount
+    
+    def _delete_rows(self, conn, table, ids):
+        """Delete rows by id in chunks of MAX_VARIABLES; returns the count"""
+        deleted = 0
+        for start in range(0, len(ids), self.MAX_VARIABLES):
+            chunk = ids[start:start + self.MAX_VARIABLES]
+            placeholders = ','.join('?' * len(chunk))
+            deleted += conn.execute(f'DELETE FROM {table} WHERE id IN ({placeholders})', chunk).rowcount
+        return deleted
+    
+    def get_storage_stats(self):
+        """Page counts and the auto_vacuum mode (0 none, 1 full, 2 incremental)"""
+        conn = self.get_connection()
+        return {
+            'page_size': conn.execute('PRAGMA page_size').fetchone()[0],
+            'page_count': conn.execute('PRAGMA page_count').fetchone()[0],
+            'freelist_count': conn.execute('PRAGMA freelist_count').fetchone()[0],
+            'auto_vacuum': conn.execute('PRAGMA auto_vacuum').fetchone()[0]
+        }
+    
+    def incremental_vacuum(self, pages):
+        """Return up to `pages` free pages to the filesystem in one short write transaction"""
+        with self.transaction() as conn:
+            before = conn.execute('PRAGMA freelist_count').fetchone()[0]
+            # The pragma frees one page per step, but sqlite3 only steps a
+            # statement without result columns once, so run it once per page
+            for _ in range(min(int(pages), before)):
+                conn.execute('PRAGMA incremental_vacuum(1)')
+            return before - conn.execute('PRAGMA freelist_count').fetchone()[0]
+    
+    def enable_incremental_vacuum(self):
+        """Switch an existing file to auto_vacuum=INCREMENTAL with a one-off full VACUUM
+        
+        Rewrites the whole database and holds the write lock while it runs, so
+        do it in a maintenance window. New databases start out incremental.
+        """
+        conn = self.pool.connect()
+        try:
+            conn.execute('PRAGMA auto_vacuum = INCREMENTAL')
+            conn.execute('VACUUM')
+            return conn.execute('PRAGMA auto_vacuum').fetchone()[0]
+        finally:
+            conn.close()
+
+# One NewsDatabase per file per process, so every module shares a pool and migrates once
+_databases = {}
+_databases_lock = threading.Lock()
+
+def get_database(db_name='news_analyzer.db'):
+    """Get the process-wide NewsDatabase for a file, opening it on first use"""
+    database = _databases.get(db_name)
+    if database is None:
+        with _databases_lock:
+            database = _databases.get(db_name)
+            if database is None:
+                database = NewsDatabase(db_name)
+                _databases[db_name] = database
+    return database
\ No newline at end of file
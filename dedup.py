@@ -0,0 +1,158 @@
+"""
+Article Deduplication for News Analyzer
+Normalized link keys, title hashes and MinHash signatures for clustering
+near-duplicate (syndicated) stories
+"""
+
+import hashlib
+import operator
+import os
+import re
+import struct
+import unicodedata
+import zlib
+from urllib.parse import parse_qsl, urlencode, urlsplit
+
+# Estimated Jaccard similarity of word bigrams above which two stories are one
+SIMILARITY_THRESHOLD = float(os.environ.get('DEDUP_THRESHOLD', 0.5))
+# Only stories first seen this recently are matched by title or similarity
+WINDOW_DAYS = float(os.environ.get('DEDUP_WINDOW_DAYS', 3))
+
+# Query parameters that only track the click, never select the article
+TRACKING_PARAMS = {'fbclid', 'gclid', 'ocid', 'cmpid', 'guccounter', 'guce_referrer',
+                   'guce_referrer_sig', 'ref', 'referrer', 'rss', 'feedtype', 'mod', 'taid', 'yptr'}
+HOST_PREFIXES = ('www.', 'm.', 'amp.', 'mobile.')
+
+# One-permutation MinHash with NUM_PERM bins, split into LSH bands of BAND_ROWS rows
+NUM_PERM = 64
+BAND_ROWS = 4
+_MAX_HASH = (1 << 32) - 1
+_MASK64 = (1 << 64) - 1
+_MIX = 0x9E3779B97F4A7C15
+_BIN_SHIFT = 64 - (NUM_PERM.bit_length() - 1)
+# Added per bin of distance when an empty bin borrows a neighbour's value
+_BORROW_OFFSET = 0x9E3779B1
+_SIGNATURE_FORMAT = f'<{NUM_PERM}I'
+
+_WORD = re.compile(r'\w+', re.UNICODE)
+
+def normalize_text(text):
+    """Lowercased words of a text, with Unicode compatibility forms folded"""
+    return _WORD.findall(unicodedata.normalize('NFKC', text or '').lower())
+
+def normalize_link(link):
+    """Key identifying an article URL regardless of scheme, mobile/AMP host, tracking params or fragment"""
+    if not link:
+        return None
+    parts = urlsplit(link.strip())
+    if not parts.netloc:
+        return link.strip().lower() or None
+    
+    host = parts.netloc.lower().split('@')[-1]
+    if host.endswith(':80') or host.endswith(':443'):
+        host = host.rsplit(':', 1)[0]
+    for prefix in HOST_PREFIXES:
+        if host.startswith(prefix):
+            host = host[len(prefix):]
+            break
+    
+    path = parts.path.rstrip('/')
+    if path.endswith('/amp'):
+        path = path[:-len('/amp')]
+    query = sorted(
+        (key, value) for key, value in parse_qsl(parts.query, keep_blank_values=True)
+        if not key.lower().startswith('utm_') and key.lower() not in TRACKING_PARAMS
+        and not (key.lower() in ('outputtype', 'output') and value.lower() == 'amp')
+    )
+    return host + (path or '/') + ('?' + urlencode(query) if query else '')
+
+def title_hash(title):
+    """Hash of a title's words, equal for titles differing only in case, punctuation or spacing"""
+    words = normalize_text(title)
+    if not words:
+        return None
+    return hashlib.sha1(' '.join(words).encode('utf-8')).hexdigest()[:16]
+
+def _shingle_hashes(text):
+    """64-bit hashes of a text's word bigrams (of its single word, if that is all it has)"""
+    words = [zlib.crc32(word.encode('utf-8')) for word in normalize_text(text)]
+    if len(words) == 1:
+        words.append(0)
+    # Multiplicative mixing of the two word hashes; the high bits are well spread
+    return {((first << 32 | second) * _MIX) & _MASK64 for first, second in zip(words, words[1:])}
+
+def signature(text):
+    """MinHash signature (NUM_PERM ints) of a text's word bigrams, or None for empty text
+    
+    One-permutation hashing: each bigram is hashed once and only counts
+    towards the bin its hash falls in, so a signature costs one hash per
+    bigram instead of NUM_PERM. Empty bins borrow the next filled bin's
+    value (densification), keeping signatures comparable bin by bin.
+    """
+    values = [None] * NUM_PERM
+    for hashed in _shingle_hashes(text):
+        bin_index, value = hashed >> _BIN_SHIFT, (hashed >> 16) & _MAX_HASH
+        if values[bin_index] is None or value < values[bin_index]:
+            values[bin_index] = value
+    
+    dense = list(values)
+    nearest = None
+    # Walk the ring backwards twice so every empty bin has seen its next filled one
+    for position in range(2 * NUM_PERM - 1, -1, -1):
+        index = position % NUM_PERM
+        if values[index] is not None:
+            nearest = position
+        elif position < NUM_PERM and nearest is not None:
+            dense[index] = (values[nearest % NUM_PERM] + (nearest - position) * _BORROW_OFFSET) & _MAX_HASH
+    return tuple(dense) if nearest is not None else None
+
+def similarity(first, second):
+    """Estimated Jaccard similarity of two signatures"""
+    return sum(map(operator.eq, first, second)) / NUM_PERM
+
+def signature_to_blob(values):
+    return struct.pack(_SIGNATURE_FORMAT, *values) if values else None
+
+def signature_from_blob(blob):
+    return struct.unpack(_SIGNATURE_FORMAT, blob) if blob else None
+
+class SignatureIndex:
+    """Locality-sensitive hashing over MinHash signatures
+    
+    Signatures are split into bands; stories sharing any band are compared,
+    so lookups stay cheap however many stories are indexed.
+    """
+    
+    def __init__(self, threshold=SIMILARITY_THRESHOLD):
+        self.threshold = threshold
+        self._signatures = {}
+        self._buckets = {}
+    
+    def __len__(self):
+        return len(self._signatures)
+    
+    def _bands(self, values):
+        for start in range(0, NUM_PERM, BAND_ROWS):
+            yield start, values[start:start + BAND_ROWS]
+    
+    def add(self, key, values):
+        if not values:
+            return
+        self._signatures[key] = values
+        for band in self._bands(values):
+            self._buckets.setdefault(band, []).append(key)
+    
+    def find(self, values):
+        """Key of the most similar indexed signature at or above the threshold, or None"""
+        if not values:
+            return None
+        candidates = set()
+        for band in self._bands(values):
+            candidates.update(self._buckets.get(band, ()))
+        
+        best, best_similarity = None, self.threshold
+        for key in candidates:
+            score = similarity(values, self._signatures[key])
+            if score >= best_similarity:
+                best, best_similarity = key, score
+        return best
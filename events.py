@@ -0,0 +1,149 @@
+"""
+Collection Events for News Analyzer
+In-process publish/subscribe of live collection progress (stock quote, scored
+articles, summary), with bounded per-subscriber buffers for streaming to clients
+"""
+
+import itertools
+import json
+import os
+import threading
+from collections import deque
+from instrumentation import counter
+from singleflight import company_key
+
+EVENTS_DROPPED = counter(
+    'news_analyzer_stream_events_dropped_total', 'Events dropped because a subscriber fell behind')
+
+# Events buffered per subscriber (and replayed per running collection)
+BUFFER_SIZE = int(os.environ.get('STREAM_BUFFER', 256))
+# Concurrent subscribers across all companies
+MAX_SUBSCRIBERS = int(os.environ.get('STREAM_MAX_SUBSCRIBERS', 100))
+
+class TooManySubscribersError(Exception):
+    """Raised when every stream slot is taken"""
+
+def format_event(event_id, event, data):
+    """One Server-Sent Events message"""
+    lines = [f'id: {event_id}'] if event_id is not None else []
+    lines.append(f'event: {event}')
+    lines.extend(f'data: {line}' for line in json.dumps(data, default=str).split('\n'))
+    return '\n'.join(lines) + '\n\n'
+
+class Subscription:
+    """A subscriber's bounded buffer of (id, event, data) tuples
+    
+    When the subscriber falls behind, the oldest events are dropped and
+    counted in `dropped`, so a slow client never holds more than `size`
+    events in memory.
+    """
+    
+    def __init__(self, bus, topic, size):
+        self.bus = bus
+        self.topic = topic
+        self.dropped = 0
+        self.closed = False
+        self._events = deque()
+        self._size = size
+        self._ready = threading.Condition(threading.Lock())
+    
+    def push(self, item):
+        with self._ready:
+            if len(self._events) >= self._size:
+                self._events.popleft()
+                self.dropped += 1
+                EVENTS_DROPPED.inc()
+            self._events.append(item)
+            self._ready.notify()
+    
+    def get(self, timeout=None):
+        """Buffered events, waiting up to `timeout` seconds for one; [] on timeout"""
+        with self._ready:
+            if not self._events and not self.closed:
+                self._ready.wait(timeout)
+            events = list(self._events)
+            self._events.clear()
+            return events
+    
+    def close(self):
+        self.bus.unsubscribe(self)
+        with self._ready:
+            self.closed = True
+            self._ready.notify()
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *exc):
+        self.close()
+
+class EventBus:
+    """Per-company topics of collection events
+    
+    Events of a collection in progress (between begin() and end()) are kept,
+    up to the buffer size, so a client subscribing mid-collection, or
+    reconnecting with its last event ID, catches up on what it missed.
+    """
+    
+    def __init__(self, buffer_size=BUFFER_SIZE, max_subscribers=MAX_SUBSCRIBERS):
+        self.buffer_size = buffer_size
+        self.max_subscribers = max_subscribers
+        self._subscribers = {}
+        self._subscriber_count = 0
+        self._running = {}
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+    
+    def subscribe(self, company_name, after=None):
+        """Subscribe to a company; replays the running collection's events after ID `after`"""
+        topic = company_key(company_name)
+        subscription = Subscription(self, topic, self.buffer_size)
+        with self._lock:
+            if self._subscriber_count >= self.max_subscribers:
+                raise TooManySubscribersError('Too many live streams open, try again shortly')
+            self._subscribers.setdefault(topic, set()).add(subscription)
+            self._subscriber_count += 1
+            for item in self._running.get(topic, ()):
+                if after is None or item[0] > after:
+                    subscription.push(item)
+        return subscription
+    
+    def unsubscribe(self, subscription):
+        with self._lock:
+            subscribers = self._subscribers.get(subscription.topic)
+            if subscribers and subscription in subscribers:
+                subscribers.discard(subscription)
+                self._subscriber_count -= 1
+                if not subscribers:
+                    del self._subscribers[subscription.topic]
+    
+    def subscriber_count(self):
+        return self._subscriber_count
+    
+    def publish(self, company_name, event, data=None):
+        """Send an event to the company's subscribers; a no-op when nobody listens to it"""
+        topic = company_key(company_name)
+        if topic not in self._subscribers and topic not in self._running:
+            return
+        with self._lock:
+            item = (next(self._ids), event, data)
+            if topic in self._running:
+                self._running[topic].append(item)
+            subscribers = list(self._subscribers.get(topic, ()))
+        for subscription in subscribers:
+            subscription.push(item)
+    
+    def begin(self, company_name):
+        """Start keeping a collection's events for late subscribers, and announce it"""
+        with self._lock:
+            self._running[company_key(company_name)] = deque(maxlen=self.buffer_size)
+        self.publish(company_name, 'started', {'company_name': company_name})
+    
+    def end(self, company_name, success, message):
+        """Announce a collection's outcome and stop keeping its events"""
+        self.publish(company_name, 'done', {'success': bool(success), 'message': message})
+        with self._lock:
+            self._running.pop(company_key(company_name), None)
+
+# Shared by the collector (publisher) and the web server (subscribers)
+collection_events = EventBus()
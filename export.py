@@ -0,0 +1,136 @@
+"""
+Bulk Export for News Analyzer
+Streams articles and quotes as NDJSON, CSV or Parquet (when pyarrow is installed)
+"""
+
+import csv
+import importlib.util
+import io
+import json
+
+# pyarrow is optional and slow to import, so only check that it is installed here
+PARQUET_AVAILABLE = importlib.util.find_spec('pyarrow') is not None
+
+FORMATS = {
+    'ndjson': {'mimetype': 'application/x-ndjson', 'extension': 'ndjson'},
+    'csv': {'mimetype': 'text/csv', 'extension': 'csv'},
+    'parquet': {'mimetype': 'application/vnd.apache.parquet', 'extension': 'parquet'}
+}
+
+# Parquet column types; anything not listed is stored as a string
+PARQUET_INTEGER_COLUMNS = {'id'}
+PARQUET_FLOAT_COLUMNS = {'sentiment_score', 'price', 'change', 'change_percent', 'day_high', 'day_low'}
+
+def available_formats():
+    """Formats usable in this environment"""
+    return [name for name in FORMATS if name != 'parquet' or PARQUET_AVAILABLE]
+
+def ndjson_chunks(columns, row_chunks):
+    """Yield one NDJSON text block per row chunk"""
+    for rows in row_chunks:
+        yield ''.join(json.dumps(dict(zip(columns, row)), default=str) + '\n' for row in rows)
+
+def csv_chunks(columns, row_chunks):
+    """Yield a header, then one CSV text block per row chunk"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(columns)
+    for rows in row_chunks:
+        writer.writerows(rows)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
+
+class _ByteSink(io.RawIOBase):
+    """Write-only file that hands out what was written since the last drain"""
+    
+    def __init__(self):
+        self._parts = []
+        self._position = 0
+    
+    def writable(self):
+        return True
+    
+    def write(self, data):
+        self._parts.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+    
+    def tell(self):
+        return self._position
+    
+    def drain(self):
+        data = b''.join(self._parts)
+        self._parts = []
+        return data
+
+def parquet_chunks(columns, row_chunks):
+    """Yield Parquet bytes, one row group per row chunk"""
+    if not PARQUET_AVAILABLE:
+        raise RuntimeError("Parquet export needs pyarrow (pip install pyarrow)")
+    import pyarrow
+    import pyarrow.parquet
+    
+    schema = pyarrow.schema([
+        (column, pyarrow.int64() if column in PARQUET_INTEGER_COLUMNS
+         else pyarrow.float64() if column in PARQUET_FLOAT_COLUMNS
+         else pyarrow.string())
+        for column in columns
+    ])
+    sink = _ByteSink()
+    writer = pyarrow.parquet.ParquetWriter(sink, schema)
+    for rows in row_chunks:
+        table = pyarrow.table({
+            column: [row[i] for row in rows] for i, column in enumerate(columns)
+        }, schema=schema)
+        writer.write_table(table)
+        data = sink.drain()
+        if data:
+            yield data
+    
+    writer.close()
+    yield sink.drain()
+
+def export_chunks(db, dataset, fmt, company_names=None, start=None, end=None, chunk_size=1000):
+    """Stream a dataset in the given format as str (ndjson/csv) or bytes (parquet) chunks"""
+    columns = db.EXPORTS[dataset]['columns']
+    row_chunks = db.iter_export(dataset, company_names, start, end, chunk_size)
+    formatter = {'ndjson': ndjson_chunks, 'csv': csv_chunks, 'parquet': parquet_chunks}[fmt]
+    return formatter(columns, row_chunks)
+
+if __name__ == "__main__":
+    import argparse
+    import sys
+    from database import NewsDatabase
+    from timeseries import resolve_range
+    
+    parser = argparse.ArgumentParser(description="Export articles or quotes from news_analyzer.db")
+    parser.add_argument('dataset', choices=list(NewsDatabase.EXPORTS))
+    parser.add_argument('--format', default='ndjson', choices=list(FORMATS))
+    parser.add_argument('--company', action='append', help="company to include (repeatable)")
+    parser.add_argument('--start', help="ISO date/time, UTC (inclusive)")
+    parser.add_argument('--end', help="ISO date/time, UTC (exclusive)")
+    parser.add_argument('--output', help="output file (default: stdout)")
+    parser.add_argument('--db', default='news_analyzer.db', help="database file")
+    args = parser.parse_args()
+    
+    start = end = None
+    if args.start or args.end:
+        start, end = resolve_range(args.start, args.end, default_days=36500)
+    
+    chunks = export_chunks(NewsDatabase(args.db), args.dataset, args.format,
+                           args.company, start, end)
+    binary = args.format == 'parquet'
+    if args.output:
+        out = open(args.output, 'wb' if binary else 'w', newline='' if not binary else None)
+    else:
+        out = sys.stdout.buffer if binary else sys.stdout
+    
+    try:
+        for chunk in chunks:
+            out.write(chunk)
+    finally:
+        if args.output:
+            out.close()
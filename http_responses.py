@@ -0,0 +1,106 @@
+"""
+HTTP Responses for News Analyzer
+Version-based ETag/Last-Modified validators, gzip/brotli compression of large
+JSON responses and a faster JSON serializer (when orjson is installed)
+"""
+
+import gzip
+import hashlib
+import os
+from datetime import datetime, timedelta, timezone
+from flask.json.provider import DefaultJSONProvider
+
+# Both are optional; without them responses use the standard library
+try:
+    import orjson
+except ImportError:
+    orjson = None
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Responses smaller than this (bytes) are sent uncompressed
+COMPRESS_MIN_BYTES = int(os.environ.get('COMPRESS_MIN_BYTES', 1024))
+COMPRESSIBLE_TYPES = ('application/json',)
+# Fast settings: API payloads are compressed on every request, not once
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 4
+
+if orjson is not None:
+    # Sorted keys match Flask's own output; dates and dataclasses go through Flask's default()
+    ORJSON_OPTIONS = (orjson.OPT_SORT_KEYS | orjson.OPT_NON_STR_KEYS
+                      | orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_PASSTHROUGH_DATACLASS)
+
+class FastJSONProvider(DefaultJSONProvider):
+    """Flask's JSON provider, serializing responses with orjson when it is installed"""
+    
+    def response(self, *args, **kwargs):
+        pretty = (self.compact is None and self._app.debug) or self.compact is False
+        if orjson is None or pretty:
+            return super().response(*args, **kwargs)
+        obj = self._prepare_response_obj(args, kwargs)
+        try:
+            body = orjson.dumps(obj, default=self.default, option=ORJSON_OPTIONS)
+        except TypeError:
+            # e.g. integers beyond 64 bits
+            return super().response(*args, **kwargs)
+        return self._app.response_class(body + b'\n', mimetype=self.mimetype)
+
+def json_backend():
+    return 'orjson' if orjson is not None else 'json'
+
+def encodings():
+    """Content encodings this process can produce, preferred first"""
+    return ['br', 'gzip'] if brotli is not None else ['gzip']
+
+def make_etag(*parts):
+    """Opaque ETag value for a response identified by `parts` (path, data version, ...)"""
+    return hashlib.sha1(repr(parts).encode('utf-8')).hexdigest()[:24]
+
+def parse_timestamp(value):
+    """Timezone-aware UTC datetime from a database timestamp ('YYYY-MM-DD HH:MM:SS'), or None"""
+    if not value:
+        return None
+    try:
+        return datetime.fromisoformat(str(value)[:19]).replace(tzinfo=timezone.utc)
+    except ValueError:
+        return None
+
+def last_modified_header(modified, now=None):
+    """Last-Modified to send, or None when it is too recent to be a safe validator
+    
+    Timestamps have one-second resolution, so a write later in the same
+    second would keep the same value (RFC 7232, section 2.2.2).
+    """
+    now = now or datetime.now(timezone.utc)
+    if modified is None or modified > now - timedelta(seconds=1):
+        return None
+    return modified
+
+def is_fresh(request, etag, modified):
+    """True when the client's cached copy (If-None-Match, else If-Modified-Since) is current"""
+    if request.if_none_match:
+        return request.if_none_match.contains_weak(etag)
+    since = request.if_modified_since
+    return modified is not None and since is not None and modified <= since
+
+def compress_response(response, accept_encodings):
+    """Compress a large JSON response in place with the best encoding the client accepts"""
+    if (response.direct_passthrough or response.is_streamed or response.status_code in (204, 304)
+            or response.mimetype not in COMPRESSIBLE_TYPES or 'Content-Encoding' in response.headers):
+        return response
+    response.vary.add('Accept-Encoding')
+    body = response.get_data()
+    if len(body) < COMPRESS_MIN_BYTES:
+        return response
+    
+    encoding = accept_encodings.best_match(encodings())
+    if encoding == 'br':
+        response.set_data(brotli.compress(body, quality=BROTLI_QUALITY))
+    elif encoding == 'gzip':
+        response.set_data(gzip.compress(body, GZIP_LEVEL))
+    else:
+        return response
+    response.headers['Content-Encoding'] = encoding
+    return response
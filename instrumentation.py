@@ -0,0 +1,317 @@
+"""
+Instrumentation for News Analyzer
+Prometheus-format metrics (counters, gauges, latency histograms) and structured logging
+"""
+
+import bisect
+import json
+import logging
+import os
+import re
+import sqlite3
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from functools import lru_cache
+
+# Upper bounds in seconds; wide enough for both SQLite queries and upstream calls
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def _format_labels(names, values):
+    if not names:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in zip(names, values)) + '}'
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+class Metric:
+    """Base for metric families; values are keyed by label-value tuples"""
+    
+    kind = 'untyped'
+    
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+    
+    def _key(self, labels):
+        return tuple(str(labels.get(name, '')) for name in self.labelnames)
+    
+    def samples(self):
+        """(suffix, label names, label values, value) tuples for rendering"""
+        with self._lock:
+            return [('', self.labelnames, key, value) for key, value in self._values.items()]
+    
+    def render(self):
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} {self.kind}']
+        for suffix, names, values, value in self.samples():
+            lines.append(f'{self.name}{suffix}{_format_labels(names, values)} {_format_value(value)}')
+        return '\n'.join(lines)
+
+class Counter(Metric):
+    """Monotonically increasing count"""
+    
+    kind = 'counter'
+    
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+class Gauge(Metric):
+    """Value that can go up and down"""
+    
+    kind = 'gauge'
+    
+    def set(self, value, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+class Histogram(Metric):
+    """Distribution of observations (e.g. latencies) over fixed buckets"""
+    
+    kind = 'histogram'
+    
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+    
+    def observe(self, value, **labels):
+        self.observe_key(self._key(labels), value)
+    
+    def observe_key(self, key, value):
+        """observe() with a precomputed label-value tuple, for hot paths"""
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                # Per-bucket counts (not cumulative), sum, count
+                state = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            state[0][index] += 1
+            state[1] += value
+            state[2] += 1
+    
+    @contextmanager
+    def time(self, **labels):
+        """Observe the wall time of a with-block, even when it raises"""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+    
+    def samples(self):
+        with self._lock:
+            items = [(key, list(state[0]), state[1], state[2]) for key, state in self._values.items()]
+        
+        bucket_names = self.labelnames + ('le',)
+        samples = []
+        for key, counts, total, count in items:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += bucket_count
+                samples.append(('_bucket', bucket_names, key + (_format_value(bound),), cumulative))
+            samples.append(('_sum', self.labelnames, key, total))
+            samples.append(('_count', self.labelnames, key, count))
+        return samples
+
+class CallbackMetric(Metric):
+    """Metric read at scrape time from callback() -> {label values tuple: value}"""
+    
+    def __init__(self, name, documentation, kind, labelnames, callback):
+        super().__init__(name, documentation, labelnames)
+        self.kind = kind
+        self.callback = callback
+    
+    def samples(self):
+        try:
+            values = self.callback()
+        except Exception as e:
+            logging.getLogger('news_analyzer.metrics').warning(f"⚠️ Metric {self.name} failed: {e}")
+            return []
+        return [('', self.labelnames, tuple(str(part) for part in key), value) for key, value in values.items()]
+
+class Registry:
+    """All metric families exposed at /metrics"""
+    
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+    
+    def register(self, metric):
+        with self._lock:
+            # Re-registering a name replaces it (e.g. when a module is reloaded)
+            self._metrics[metric.name] = metric
+        return metric
+    
+    def render(self):
+        """Prometheus text exposition format 0.0.4"""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        return '\n'.join(metric.render() for metric in metrics) + '\n'
+
+REGISTRY = Registry()
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+def counter(name, documentation, labelnames=()):
+    return REGISTRY.register(Counter(name, documentation, labelnames))
+
+def gauge(name, documentation, labelnames=()):
+    return REGISTRY.register(Gauge(name, documentation, labelnames))
+
+def histogram(name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+    return REGISTRY.register(Histogram(name, documentation, labelnames, buckets))
+
+def register_callback(name, documentation, kind, labelnames, callback):
+    return REGISTRY.register(CallbackMetric(name, documentation, kind, labelnames, callback))
+
+def render_metrics():
+    return REGISTRY.render()
+
+# Shared metric families
+STAGE_SECONDS = histogram(
+    'news_analyzer_stage_seconds', 'Latency of collection stages', ['stage'])
+DB_QUERY_SECONDS = histogram(
+    'news_analyzer_db_query_seconds', 'SQLite statement latency by statement type and table',
+    ['statement', 'table'])
+HTTP_REQUEST_SECONDS = histogram(
+    'news_analyzer_http_request_seconds', 'Flask request latency by route', ['route', 'method', 'status'])
+UPSTREAM_REQUESTS = counter(
+    'news_analyzer_upstream_requests_total', 'Upstream API responses by status', ['host', 'status'])
+UPSTREAM_ERRORS = counter(
+    'news_analyzer_upstream_errors_total', 'Failed upstream calls (errors and retryable statuses)',
+    ['host', 'reason'])
+NEWS_ARTICLES = counter(
+    'news_analyzer_news_articles_total', 'News results seen, by source trust', ['trust'])
+COLLECTIONS = counter(
+    'news_analyzer_collections_total', 'Company collections by outcome', ['outcome'])
+
+def stage(name):
+    """Time a collection stage: `with stage('news_fetch'): ...`"""
+    return STAGE_SECONDS.time(stage=name)
+
+_TABLE = re.compile(r'\b(?:FROM|INTO|TABLE|ON)\s+(?:IF\s+(?:NOT\s+)?EXISTS\s+)?["\[]?(\w+)', re.IGNORECASE)
+
+@lru_cache(maxsize=1024)
+def statement_labels(sql):
+    """(statement, table) labels for a SQL string, e.g. ('SELECT', 'news_articles')"""
+    words = sql.split(None, 2)
+    if not words:
+        return '', ''
+    verb = words[0].upper()
+    if verb == 'UPDATE' and len(words) > 1:
+        return verb, words[1]
+    if verb in ('PRAGMA', 'BEGIN', 'COMMIT', 'ROLLBACK', 'SAVEPOINT', 'RELEASE', 'VACUUM'):
+        return verb, ''
+    match = _TABLE.search(sql)
+    return verb, match.group(1) if match else ''
+
+def _observe_query(sql, started):
+    DB_QUERY_SECONDS.observe_key(statement_labels(sql), time.perf_counter() - started)
+
+class TimedCursor(sqlite3.Cursor):
+    """Cursor that records every statement in DB_QUERY_SECONDS"""
+    
+    def execute(self, sql, parameters=()):
+        started = time.perf_counter()
+        try:
+            return super().execute(sql, parameters)
+        finally:
+            _observe_query(sql, started)
+    
+    def executemany(self, sql, seq_of_parameters):
+        started = time.perf_counter()
+        try:
+            return super().executemany(sql, seq_of_parameters)
+        finally:
+            _observe_query(sql, started)
+
+class TimedConnection(sqlite3.Connection):
+    """Connection whose statements (direct or via cursors) are timed; pass as factory="""
+    
+    def cursor(self, factory=TimedCursor):
+        return super().cursor(factory)
+    
+    def execute(self, sql, parameters=()):
+        started = time.perf_counter()
+        try:
+            return super().execute(sql, parameters)
+        finally:
+            _observe_query(sql, started)
+    
+    def executemany(self, sql, seq_of_parameters):
+        started = time.perf_counter()
+        try:
+            return super().executemany(sql, seq_of_parameters)
+        finally:
+            _observe_query(sql, started)
+
+def connection_factory():
+    """sqlite3 connection class to use: timed unless DB_QUERY_METRICS=0"""
+    return TimedConnection if os.environ.get('DB_QUERY_METRICS', '1') != '0' else sqlite3.Connection
+
+# Attributes every LogRecord has; anything else was passed via extra= and is a field
+_RECORD_ATTRIBUTES = set(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime'}
+
+def _fields(record):
+    return {key: value for key, value in vars(record).items() if key not in _RECORD_ATTRIBUTES}
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line: time, level, logger, message, extra fields, traceback"""
+    
+    def format(self, record):
+        entry = {
+            'time': self.formatTime(record, '%Y-%m-%dT%H:%M:%S'),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage()
+        }
+        entry.update(_fields(record))
+        if record.exc_info:
+            entry['exception'] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+class TextFormatter(logging.Formatter):
+    """Human-readable line with extra fields appended as key=value"""
+    
+    def __init__(self):
+        super().__init__('%(asctime)s %(levelname)s %(name)s: %(message)s', '%Y-%m-%d %H:%M:%S')
+    
+    def format(self, record):
+        line = super().format(record)
+        fields = _fields(record)
+        if fields:
+            extras = ' '.join(f'{key}={value}' for key, value in fields.items())
+            first, newline, rest = line.partition('\n')
+            line = f'{first} {extras}{newline}{rest}'
+        return line
+
+_logging_configured = False
+
+def configure_logging(level=None, fmt=None):
+    """Send news_analyzer.* logs to stdout (LOG_LEVEL, LOG_FORMAT=text|json); idempotent"""
+    global _logging_configured
+    if _logging_configured:
+        return
+    _logging_configured = True
+    
+    handler = logging.StreamHandler(sys.stdout)
+    fmt = fmt or os.environ.get('LOG_FORMAT', 'text')
+    handler.setFormatter(JsonFormatter() if fmt == 'json' else TextFormatter())
+    logger = logging.getLogger('news_analyzer')
+    logger.addHandler(handler)
+    logger.setLevel((level or os.environ.get('LOG_LEVEL', 'INFO')).upper())
+    logger.propagate = False
+
+def get_logger(name):
+    """Logger under the news_analyzer namespace"""
+    return logging.getLogger(f'news_analyzer.{name}')
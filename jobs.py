@@ -0,0 +1,83 @@
+"""
+Background Job Queue for News Analyzer
+Runs data collection off the request path with a bounded worker pool
+"""
+
+import queue
+import threading
+import time
+import uuid
+from instrumentation import get_logger
+
+log = get_logger('jobs')
+
+class QueueFullError(Exception):
+    """Raised when the job queue has no room for another job"""
+
+class JobQueue:
+    def __init__(self, db, max_workers=4, max_pending=100):
+        self.db = db
+        self.max_workers = max_workers
+        self._queue = queue.Queue(maxsize=max_pending)
+        self._workers = []
+        self._lock = threading.Lock()
+    
+    def start(self):
+        """Start worker threads (idempotent)"""
+        with self._lock:
+            if self._workers:
+                return
+            for i in range(self.max_workers):
+                worker = threading.Thread(target=self._work, name=f'job-worker-{i}', daemon=True)
+                worker.start()
+                self._workers.append(worker)
+    
+    def submit(self, kind, company_name, func, *args):
+        """Queue func(*args) and return the new job ID"""
+        self.start()
+        job_id = uuid.uuid4().hex
+        self.db.create_job(job_id, kind, company_name)
+        try:
+            self._queue.put_nowait((job_id, func, args))
+        except queue.Full:
+            self.db.finish_job(job_id, 'failed', error='Job queue is full')
+            raise QueueFullError('Job queue is full, try again shortly')
+        return job_id
+    
+    def submit_shared(self, kind, company_name, func, *args, kinds=None, window=0, stale_after=600):
+        """Like submit(), but reuse a job for the same company that is still
+        queued or running, or that succeeded within `window` seconds, from any
+        process; returns (job ID, True if a new job was queued)"""
+        job_id = self.db.find_shared_job(company_name, kinds or (kind,), window, stale_after)
+        if job_id is not None:
+            log.info(f"🔗 Sharing job {job_id} for '{company_name}'",
+                     extra={'job_id': job_id, 'company': company_name})
+            return job_id, False
+        return self.submit(kind, company_name, func, *args), True
+    
+    def _work(self):
+        """Worker loop: run queued jobs and record their outcome"""
+        while True:
+            job_id, func, args = self._queue.get()
+            started = time.monotonic()
+            try:
+                self.db.start_job(job_id)
+                result = func(*args)
+                # Collector functions return (success, message)
+                if isinstance(result, tuple) and len(result) == 2 and not result[0]:
+                    self.db.finish_job(job_id, 'failed', error=result[1],
+                                       duration=time.monotonic() - started)
+                else:
+                    message = result[1] if isinstance(result, tuple) else None
+                    self.db.finish_job(job_id, 'succeeded', message=message,
+                                       duration=time.monotonic() - started)
+            except Exception as e:
+                log.exception(f"❌ Job {job_id} failed: {e}", extra={'job_id': job_id})
+                self.db.finish_job(job_id, 'failed', error=f'{type(e).__name__}: {e}',
+                                   duration=time.monotonic() - started)
+            finally:
+                self._queue.task_done()
+    
+    def pending(self):
+        """Number of jobs waiting for a worker"""
+        return self._queue.qsize()
@@ -0,0 +1,49 @@
+"""
+Rate Limiting for News Analyzer
+Token-bucket limiter shared by threads calling the same upstream API
+"""
+
+import threading
+import time
+
+class TokenBucket:
+    def __init__(self, rate_per_minute, burst=1):
+        self.rate = rate_per_minute / 60.0
+        self.capacity = max(1, burst)
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+    
+    def _refill(self):
+        """Add tokens earned since the last update"""
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+    
+    def acquire(self, tokens=1):
+        """Block until `tokens` are available, then take them; returns seconds waited"""
+        waited = 0.0
+        while True:
+            with self._lock:
+                self._refill()
+                if self.tokens >= tokens:
+                    self.tokens -= tokens
+                    return waited
+                delay = (tokens - self.tokens) / self.rate
+            time.sleep(delay)
+            waited += delay
+    
+    def available(self):
+        """Tokens that could be taken right now"""
+        with self._lock:
+            self._refill()
+            return self.tokens
+    
+    def try_acquire(self, tokens=1):
+        """Take `tokens` if available right now; returns True on success"""
+        with self._lock:
+            self._refill()
+            if self.tokens >= tokens:
+                self.tokens -= tokens
+                return True
+            return False
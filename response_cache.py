@@ -0,0 +1,162 @@
+"""
+Upstream Response Cache for News Analyzer
+Disk-backed TTL cache for SerpAPI and Finnhub responses with
+stale-while-revalidate and size-bounded LRU eviction
+"""
+
+import hashlib
+import json
+import threading
+import time
+from database import ConnectionPool
+from instrumentation import get_logger
+
+log = get_logger('response_cache')
+
+# Per-source freshness: serve from cache for `ttl` seconds, then serve the
+# stale copy for up to `stale` more seconds while refreshing in the background
+DEFAULT_POLICIES = {
+    'finnhub:quote': {'ttl': 15, 'stale': 45},
+    'finnhub:stock/profile2': {'ttl': 86400, 'stale': 6 * 86400},
+    'serpapi:news': {'ttl': 300, 'stale': 900}
+}
+
+class ResponseCache:
+    def __init__(self, path='upstream_cache.db', max_bytes=64 * 1024 * 1024,
+                 policies=None, executor=None):
+        self.pool = ConnectionPool(path)
+        self.max_bytes = max_bytes
+        self.policies = dict(DEFAULT_POLICIES)
+        if policies:
+            self.policies.update(policies)
+        self.executor = executor
+        self._lock = threading.Lock()
+        self._refreshing = set()
+        self._puts_since_check = 0
+        self.counters = {'hits': 0, 'stale_hits': 0, 'misses': 0, 'revalidations': 0, 'errors': 0}
+        
+        with self.pool.transaction() as conn:
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS responses (
+                    key TEXT PRIMARY KEY,
+                    source TEXT NOT NULL,
+                    payload TEXT NOT NULL,
+                    size INTEGER NOT NULL,
+                    fetched_at REAL NOT NULL,
+                    accessed_at REAL NOT NULL
+                )
+            ''')
+            conn.execute('CREATE INDEX IF NOT EXISTS idx_responses_accessed ON responses (accessed_at)')
+    
+    @staticmethod
+    def make_key(source, params):
+        """Cache key from the source name and request params (exclude secrets)"""
+        raw = source + '|' + json.dumps(params, sort_keys=True, default=str)
+        return hashlib.sha1(raw.encode('utf-8')).hexdigest()
+    
+    @staticmethod
+    def is_cacheable(payload):
+        """Don't cache empty or error payloads"""
+        return bool(payload) and not (isinstance(payload, dict) and payload.get('error'))
+    
+    def _count(self, name):
+        with self._lock:
+            self.counters[name] += 1
+    
+    def get_or_fetch(self, source, params, fetch):
+        """Return a cached payload for (source, params), calling fetch() when needed"""
+        policy = self.policies.get(source)
+        if not policy:
+            return fetch()
+        
+        key = self.make_key(source, params)
+        conn = self.pool.get()
+        row = conn.execute('SELECT payload, fetched_at FROM responses WHERE key = ?', (key,)).fetchone()
+        
+        if row:
+            age = time.time() - row[1]
+            if age < policy['ttl'] + policy['stale']:
+                conn.execute('UPDATE responses SET accessed_at = ? WHERE key = ?', (time.time(), key))
+                if age < policy['ttl']:
+                    self._count('hits')
+                else:
+                    self._count('stale_hits')
+                    self._revalidate(source, key, fetch)
+                return json.loads(row[0])
+        
+        self._count('misses')
+        payload = fetch()
+        self._store(source, key, payload)
+        return payload
+    
+    def _revalidate(self, source, key, fetch):
+        """Refresh a stale entry in the background, at most once at a time per key"""
+        with self._lock:
+            if key in self._refreshing:
+                return
+            self._refreshing.add(key)
+        
+        def refresh():
+            try:
+                self._store(source, key, fetch())
+                self._count('revalidations')
+            except Exception as e:
+                self._count('errors')
+                log.warning(f"⚠️ Cache revalidation failed for {source}: {e}", exc_info=True,
+                            extra={'source': source})
+            finally:
+                with self._lock:
+                    self._refreshing.discard(key)
+        
+        if self.executor:
+            self.executor.submit(refresh)
+        else:
+            threading.Thread(target=refresh, daemon=True).start()
+    
+    def _store(self, source, key, payload):
+        """Write a payload and evict old entries when over the size cap"""
+        if not self.is_cacheable(payload):
+            return
+        
+        text = json.dumps(payload)
+        now = time.time()
+        with self.pool.transaction() as conn:
+            conn.execute('''
+                INSERT OR REPLACE INTO responses (key, source, payload, size, fetched_at, accessed_at)
+                VALUES (?, ?, ?, ?, ?, ?)
+            ''', (key, source, text, len(text), now, now))
+        
+        with self._lock:
+            self._puts_since_check += 1
+            check = self._puts_since_check >= 50
+            if check:
+                self._puts_since_check = 0
+        if check:
+            self.evict()
+    
+    def evict(self):
+        """Drop least recently used entries until the cache is under 90% of max_bytes"""
+        with self.pool.transaction() as conn:
+            total = conn.execute('SELECT COALESCE(SUM(size), 0) FROM responses').fetchone()[0]
+            if total <= self.max_bytes:
+                return 0
+            
+            target = self.max_bytes * 0.9
+            removed = 0
+            for key, size in conn.execute('SELECT key, size FROM responses ORDER BY accessed_at').fetchall():
+                if total <= target:
+                    break
+                conn.execute('DELETE FROM responses WHERE key = ?', (key,))
+                total -= size
+                removed += 1
+            return removed
+    
+    def stats(self):
+        """Hit/miss counters; hits + stale_hits are upstream calls avoided"""
+        with self._lock:
+            counters = dict(self.counters)
+        row = self.pool.get().execute('SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses').fetchone()
+        counters['upstream_calls_avoided'] = counters['hits'] + counters['stale_hits']
+        counters['entries'] = row[0]
+        counters['bytes'] = row[1]
+        return counters
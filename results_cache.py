@@ -0,0 +1,139 @@
+"""
+Results Cache for News Analyzer
+Per-company cache of the results view model and rendered HTML,
+invalidated when new data for the company is written (by this process, or by
+any process through the company's data version)
+"""
+
+import itertools
+import json
+import threading
+import time
+from collections import OrderedDict
+
+class ResultsCache:
+    def __init__(self, max_bytes=32 * 1024 * 1024, ttl=300):
+        # ttl bounds staleness when callers don't pass the company's data version
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._names_by_id = {}
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        # Bumped on every invalidation so a view built from pre-write data is not cached
+        self.generation = 0
+        self._tokens = itertools.count(1)
+    
+    @staticmethod
+    def _size(view, html):
+        return len(json.dumps(view, default=str)) + len(html or '')
+    
+    def get(self, company_name, data_version=None):
+        """Get the cached entry dict ({'view', 'html', ...}) or None
+        
+        Pass the company's current data version to drop an entry built before
+        a write made by another process (the refresh worker, the CLI).
+        """
+        with self._lock:
+            entry = self._entries.get(company_name)
+            if entry and data_version is not None and entry['data_version'] != data_version:
+                self._remove(company_name)
+                self.invalidations += 1
+                entry = None
+            if entry and time.monotonic() - entry['cached_at'] > self.ttl:
+                self._remove(company_name)
+                entry = None
+            if entry:
+                self._entries.move_to_end(company_name)
+                self.hits += 1
+            else:
+                self.misses += 1
+            return entry
+    
+    def put(self, company_name, company_id, view, html=None, generation=None, data_version=None):
+        """Cache a view model (and optionally its rendered HTML); returns the entry's token
+        
+        Pass the `generation` and `data_version` read before querying the
+        database; the entry is dropped (and None returned) if an invalidation
+        happened in between, and outdated by the next get() if another
+        process wrote in between.
+        """
+        entry = {
+            'token': next(self._tokens),
+            'company_id': company_id,
+            'data_version': data_version,
+            'view': view,
+            'html': html,
+            'size': self._size(view, html),
+            'cached_at': time.monotonic()
+        }
+        if entry['size'] > self.max_bytes:
+            return None
+        
+        with self._lock:
+            if generation is not None and generation != self.generation:
+                return None
+            self._remove(company_name)
+            self._entries[company_name] = entry
+            self._names_by_id[company_id] = company_name
+            self._bytes += entry['size']
+            while self._bytes > self.max_bytes:
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+            return entry['token']
+    
+    def set_html(self, company_name, html, token):
+        """Attach HTML rendered from the entry with this token (from put() or get())
+        
+        Does nothing when the entry was replaced since, so HTML rendered from
+        a view that was invalidated never lands on a newer entry.
+        """
+        with self._lock:
+            entry = self._entries.get(company_name)
+            if not entry or entry['token'] != token or entry['html'] is not None:
+                return
+            extra = len(html)
+            if self._bytes + extra > self.max_bytes:
+                return
+            entry['html'] = html
+            entry['size'] += extra
+            self._bytes += extra
+    
+    def _remove(self, company_name):
+        """Drop one entry (caller holds the lock)"""
+        entry = self._entries.pop(company_name, None)
+        if entry:
+            self._bytes -= entry['size']
+            if self._names_by_id.get(entry['company_id']) == company_name:
+                del self._names_by_id[entry['company_id']]
+    
+    def invalidate_company(self, company_id):
+        """Write listener: drop the company's entry (all entries when company_id is None)"""
+        with self._lock:
+            # Bumped even with nothing to evict: a view of this company may be
+            # being built right now, from data read before the write
+            self.invalidations += 1
+            self.generation += 1
+            if company_id is None:
+                self._entries.clear()
+                self._names_by_id.clear()
+                self._bytes = 0
+                return
+            company_name = self._names_by_id.get(company_id)
+            if company_name is not None:
+                self._remove(company_name)
+    
+    def stats(self):
+        """Hit/miss counters and memory use"""
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'bytes': self._bytes,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'invalidations': self.invalidations
+            }
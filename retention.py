@@ -0,0 +1,344 @@
+"""
+Retention for News Analyzer
+Rolls old quotes up into daily OHLC rows, collapses duplicate articles, archives
+cold rows to compressed files and reclaims space with incremental VACUUM
+
+Run a pass with: python retention.py run
+Query archived rows offline with: python retention.py query articles --company Apple
+"""
+
+import glob
+import gzip
+import json
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+from export import ndjson_chunks
+from instrumentation import configure_logging, counter, get_logger
+from timeseries import DB_TIME_FORMAT
+
+log = get_logger('retention')
+
+RETENTION_ROWS = counter(
+    'news_analyzer_retention_rows_total', 'Rows removed by retention, by action', ['action'])
+RETENTION_PAGES = counter(
+    'news_analyzer_retention_freed_pages_total', 'Database pages returned to the filesystem')
+
+# Delay before the background thread's first pass, so it stays clear of startup
+STARTUP_DELAY = 60
+
+class Retention:
+    """Applies retention policies to the history tables in small batches
+    
+    Each policy is an age in days; 0 disables it:
+      stock_days      stock_data rows from older days are archived, then folded
+                      into one stock_daily OHLC row per company and day
+      duplicate_days  older articles whose link reappears in a newer row are deleted
+      article_days    older articles are archived, then deleted (needs archive_dir)
+      job_days        finished jobs older than this are deleted
+      sentiment_days  cached sentiment scores older than this are deleted, as
+                      are scores from analyzer versions other than the one
+                      sentiment_version() returns (when given)
+    
+    Articles a company snapshot points at are always kept. Every batch is its
+    own short write transaction, with `pause` seconds between batches so the
+    web server's writers get the lock in between.
+    """
+    
+    def __init__(self, db, stock_days=7, duplicate_days=2, article_days=180, job_days=7,
+                 sentiment_days=30, sentiment_version=None, archive_dir='archive', batch_size=500,
+                 vacuum_pages=256, pause=0.05, interval=24 * 3600):
+        self.db = db
+        self.stock_days = stock_days
+        self.duplicate_days = duplicate_days
+        self.article_days = article_days
+        self.job_days = job_days
+        self.sentiment_days = sentiment_days
+        self.sentiment_version = sentiment_version
+        self.archive_dir = archive_dir
+        self.batch_size = batch_size
+        self.vacuum_pages = vacuum_pages
+        self.pause = pause
+        self.interval = interval
+        self._run_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+    
+    def _cutoff(self, now, days):
+        return (now - timedelta(days=days)).strftime(DB_TIME_FORMAT)
+    
+    def _rest(self):
+        """Sleep between batches; False once stop() was called"""
+        return not self._stop.wait(self.pause)
+    
+    def archive(self, dataset, rows):
+        """Append export rows to gzip NDJSON files, one per dataset and month
+        
+        Each call adds a gzip member, which gzip readers treat as one stream.
+        The data is fsynced before returning, so callers may delete the rows.
+        """
+        columns = self.db.EXPORTS[dataset]['columns']
+        fetched_at = columns.index('fetched_at')
+        by_month = {}
+        for row in rows:
+            by_month.setdefault(row[fetched_at][:7], []).append(row)
+        
+        for month, month_rows in by_month.items():
+            path = os.path.join(self.archive_dir, dataset, f'{month}.ndjson.gz')
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, 'ab') as f:
+                with gzip.GzipFile(fileobj=f, mode='ab') as archive:
+                    for text in ndjson_chunks(columns, [month_rows]):
+                        archive.write(text.encode('utf-8'))
+                f.flush()
+                os.fsync(f.fileno())
+    
+    def rollup_stock(self, now):
+        """Archive stock_data rows from before the cutoff day and fold them into stock_daily"""
+        if not self.stock_days:
+            return 0
+        
+        # Whole days only, so a day is rolled up in one pass; each company's latest
+        # quote stays raw and is merged into its day once a newer one replaces it
+        cutoff = (now - timedelta(days=self.stock_days)).strftime('%Y-%m-%d')
+        total = 0
+        while True:
+            rows = self.db.get_stock_rows_before(cutoff, self.batch_size)
+            if not rows:
+                break
+            if self.archive_dir:
+                self.archive('quotes', [row for _, row in rows])
+            total += self.db.rollup_stock_rows(rows)
+            if not self._rest():
+                break
+        
+        RETENTION_ROWS.inc(total, action='rolled_up')
+        return total
+    
+    def collapse_duplicates(self, now):
+        """Delete old articles that a newer row for the same company and link supersedes"""
+        if not self.duplicate_days:
+            return 0
+        
+        cutoff = self._cutoff(now, self.duplicate_days)
+        keep = self.db.get_snapshot_article_ids()
+        after_id = 0
+        total = 0
+        while True:
+            rows = self.db.find_duplicate_articles(cutoff, after_id, self.batch_size)
+            if not rows:
+                break
+            after_id = rows[-1][0]
+            total += self.db.delete_duplicate_articles([row for row in rows if row[0] not in keep])
+            if not self._rest():
+                break
+        
+        RETENTION_ROWS.inc(total, action='collapsed')
+        return total
+    
+    def archive_articles(self, now):
+        """Archive articles older than article_days, then delete them"""
+        if not self.article_days or not self.archive_dir:
+            return 0
+        
+        cutoff = self._cutoff(now, self.article_days)
+        keep = self.db.get_snapshot_article_ids()
+        after_id = 0
+        total = 0
+        while True:
+            rows = self.db.get_articles_before(cutoff, after_id, self.batch_size)
+            if not rows:
+                break
+            after_id = rows[-1][1][0]
+            rows = [(company_id, row) for company_id, row in rows if row[0] not in keep]
+            if rows:
+                self.archive('articles', [row for _, row in rows])
+                total += self.db.delete_articles(rows)
+            if not self._rest():
+                break
+        
+        RETENTION_ROWS.inc(total, action='archived')
+        return total
+    
+    def expire_jobs(self, now):
+        """Delete finished jobs older than job_days"""
+        if not self.job_days:
+            return 0
+        
+        cutoff = self._cutoff(now, self.job_days)
+        total = 0
+        while True:
+            deleted = self.db.delete_finished_jobs(cutoff, self.batch_size)
+            total += deleted
+            if deleted < self.batch_size or not self._rest():
+                break
+        
+        RETENTION_ROWS.inc(total, action='expired_jobs')
+        return total
+    
+    def expire_sentiments(self, now):
+        """Delete cached sentiment scores older than sentiment_days or from other analyzer versions"""
+        if not self.sentiment_days:
+            return 0
+        
+        cutoff = self._cutoff(now, self.sentiment_days)
+        version = None
+        if self.sentiment_version is not None:
+            try:
+                version = self.sentiment_version()
+            except Exception as e:
+                log.warning(f"⚠️ Sentiment analyzer version unavailable, expiring cached scores by age only: {e}")
+        after = None
+        total = 0
+        while True:
+            deleted, after = self.db.expire_cached_sentiments(cutoff, version, after, self.batch_size)
+            total += deleted
+            if after is None or not self._rest():
+                break
+        
+        RETENTION_ROWS.inc(total, action='expired_sentiments')
+        return total
+    
+    def vacuum(self):
+        """Return free pages to the filesystem, vacuum_pages per transaction"""
+        stats = self.db.get_storage_stats()
+        if stats['auto_vacuum'] != 2:
+            if stats['freelist_count']:
+                log.info(f"💡 {stats['freelist_count']} free pages can't be reclaimed incrementally; "
+                         f"run `python retention.py enable-vacuum` once to convert the database")
+            return 0
+        
+        freed = 0
+        while True:
+            pages = self.db.incremental_vacuum(self.vacuum_pages)
+            freed += pages
+            if not pages or not self._rest():
+                break
+        
+        RETENTION_PAGES.inc(freed)
+        return freed
+    
+    def run(self, now=None):
+        """Apply every policy once; returns what each step removed"""
+        now = now or datetime.utcnow()
+        started = time.perf_counter()
+        with self._run_lock:
+            stats = {
+                'rolled_up': self.rollup_stock(now),
+                'collapsed': self.collapse_duplicates(now),
+                'archived': self.archive_articles(now),
+                'expired_jobs': self.expire_jobs(now),
+                'expired_sentiments': self.expire_sentiments(now),
+                'freed_pages': self.vacuum()
+            }
+        log.info(f"🧹 Retention pass finished in {time.perf_counter() - started:.1f}s", extra=stats)
+        return stats
+    
+    def _loop(self):
+        if self._stop.wait(min(STARTUP_DELAY, self.interval)):
+            return
+        while True:
+            try:
+                self.run()
+            except Exception as e:
+                log.exception(f"❌ Retention pass failed: {e}")
+            if self._stop.wait(self.interval):
+                return
+    
+    def start(self):
+        """Run a pass every `interval` seconds on a daemon thread (idempotent)"""
+        if self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._loop, name='retention', daemon=True)
+        self._thread.start()
+    
+    def stop(self):
+        """Stop after the current batch"""
+        self._stop.set()
+
+def retention_from_env(db, sentiment_version=None):
+    """Build a Retention configured by RETENTION_* environment variables"""
+    return Retention(
+        db,
+        stock_days=float(os.environ.get('RETENTION_STOCK_DAYS', 7)),
+        duplicate_days=float(os.environ.get('RETENTION_DUPLICATE_DAYS', 2)),
+        article_days=float(os.environ.get('RETENTION_ARTICLE_DAYS', 180)),
+        job_days=float(os.environ.get('RETENTION_JOB_DAYS', 7)),
+        sentiment_days=float(os.environ.get('RETENTION_SENTIMENT_DAYS', 30)),
+        sentiment_version=sentiment_version,
+        archive_dir=os.environ.get('RETENTION_ARCHIVE_DIR', 'archive'),
+        batch_size=int(os.environ.get('RETENTION_BATCH_SIZE', 500)),
+        vacuum_pages=int(os.environ.get('RETENTION_VACUUM_PAGES', 256)),
+        pause=float(os.environ.get('RETENTION_PAUSE', 0.05)),
+        interval=float(os.environ.get('RETENTION_INTERVAL', 24 * 3600))
+    )
+
+def query_archive(archive_dir, dataset, company_names=None, start=None, end=None):
+    """Yield archived records as dicts, oldest month first
+    
+    start/end are database-formatted UTC bounds (inclusive/exclusive). A batch
+    archived twice (e.g. after a crash before its rows were deleted) is only
+    yielded once.
+    """
+    paths = sorted(glob.glob(os.path.join(archive_dir, dataset, '*.ndjson.gz')))
+    companies = set(company_names or [])
+    for path in paths:
+        month = os.path.basename(path)[:7]
+        if (start and month < start[:7]) or (end and month > end[:7]):
+            continue
+        
+        # Rows land in the file for their month, so duplicates share a file
+        seen = set()
+        with gzip.open(path, 'rt', encoding='utf-8') as f:
+            for line in f:
+                record = json.loads(line)
+                if record['id'] in seen:
+                    continue
+                seen.add(record['id'])
+                if companies and record['company'] not in companies:
+                    continue
+                if (start and record['fetched_at'] < start) or (end and record['fetched_at'] >= end):
+                    continue
+                yield record
+
+if __name__ == "__main__":
+    import argparse
+    import sys
+    from database import NewsDatabase
+    from timeseries import resolve_range
+    
+    parser = argparse.ArgumentParser(description="Retention, archiving and vacuum for news_analyzer.db")
+    parser.add_argument('--db', default='news_analyzer.db', help="database file")
+    commands = parser.add_subparsers(dest='command')
+    commands.add_parser('run', help="apply the RETENTION_* policies once (default)")
+    commands.add_parser('stats', help="show page counts and the auto_vacuum mode")
+    commands.add_parser('enable-vacuum', help="one-off full VACUUM switching to incremental auto_vacuum")
+    query = commands.add_parser('query', help="print archived rows as NDJSON")
+    query.add_argument('dataset', choices=list(NewsDatabase.EXPORTS))
+    query.add_argument('--company', action='append', help="company to include (repeatable)")
+    query.add_argument('--start', help="ISO date/time, UTC (inclusive)")
+    query.add_argument('--end', help="ISO date/time, UTC (exclusive)")
+    query.add_argument('--archive-dir', default=os.environ.get('RETENTION_ARCHIVE_DIR', 'archive'))
+    args = parser.parse_args()
+    
+    if args.command == 'query':
+        # Reads only the archive files, so it works without the database
+        start = end = None
+        if args.start or args.end:
+            start, end = resolve_range(args.start, args.end, default_days=36500)
+        for record in query_archive(args.archive_dir, args.dataset, args.company, start, end):
+            sys.stdout.write(json.dumps(record) + '\n')
+        sys.exit(0)
+    
+    configure_logging()
+    db = NewsDatabase(args.db)
+    if args.command == 'stats':
+        print(json.dumps(db.get_storage_stats(), indent=2))
+    elif args.command == 'enable-vacuum':
+        log.info("🧹 Rewriting the database with auto_vacuum=INCREMENTAL (holds the write lock)...")
+        mode = db.enable_incremental_vacuum()
+        log.info(f"✅ auto_vacuum is now {mode}")
+    else:
+        from agent1_collector import get_sentiment_version
+        print(json.dumps(retention_from_env(db, get_sentiment_version).run(), indent=2))
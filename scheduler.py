@@ -0,0 +1,221 @@
+"""
+Refresh Scheduler for News Analyzer
+Keeps tracked companies fresh in the background, most stale and most viewed first
+"""
+
+import heapq
+import os
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from rate_limit import TokenBucket
+from instrumentation import configure_logging, get_logger
+
+log = get_logger('scheduler')
+
+# Upstream calls one collection makes (news search; quote and profile lookups)
+REFRESH_COST = {'serpapi': 1, 'finnhub': 2}
+
+class ViewCounter:
+    """Counts page views in memory and writes them to the database in batches"""
+    
+    def __init__(self, db, flush_interval=30, half_life=3600):
+        self.db = db
+        self.flush_interval = flush_interval
+        self.half_life = half_life
+        self._counts = {}
+        self._flushed = time.monotonic()
+        self._lock = threading.Lock()
+    
+    def record(self, company_id):
+        """Count one view; flushes when the interval has passed"""
+        with self._lock:
+            self._counts[company_id] = self._counts.get(company_id, 0) + 1
+            due = time.monotonic() - self._flushed >= self.flush_interval
+        if due:
+            self.flush()
+    
+    def flush(self):
+        """Write pending view counts to the database"""
+        with self._lock:
+            counts, self._counts = self._counts, {}
+            self._flushed = time.monotonic()
+        try:
+            self.db.record_company_views(counts, self.half_life)
+        except Exception as e:
+            log.warning(f"⚠️ Could not record page views: {e}", exc_info=True)
+
+class RefreshScheduler:
+    """Refreshes companies whose data is older than their view-weighted interval
+    
+    A company viewed v times recently (decayed by half_life) is due every
+    max(min_interval, max_interval / (1 + v)) seconds, +/- jitter. Due companies
+    are refreshed most-overdue first, at most max_concurrency at a time and
+    within per-upstream call budgets (calls per minute). Pass the web process's
+    ViewCounter as `views` to flush it before each tick.
+    """
+    
+    def __init__(self, db, refresh, max_concurrency=2, min_interval=300,
+                 max_interval=6 * 3600, half_life=3600, jitter=0.1,
+                 tick_interval=30, budgets=None, views=None):
+        self.db = db
+        self.refresh = refresh
+        self.max_concurrency = max_concurrency
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.half_life = half_life
+        self.jitter = jitter
+        self.tick_interval = tick_interval
+        self.views = views
+        self.budgets = {
+            host: TokenBucket(rate_per_minute, burst=max(1, int(rate_per_minute)))
+            for host, rate_per_minute in (budgets or {}).items()
+        }
+        self._executor = ThreadPoolExecutor(max_workers=max_concurrency,
+                                            thread_name_prefix='refresh')
+        self._in_flight = set()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self.stats = {'refreshed': 0, 'failed': 0, 'deferred': 0}
+    
+    def interval(self, views):
+        """Target refresh interval in seconds for a decayed view score"""
+        return max(self.min_interval, self.max_interval / (1.0 + views))
+    
+    def backoff(self, failures):
+        """Seconds to wait before retrying a company after `failures` failed collections in a row"""
+        return min(self.max_interval, self.min_interval * 2 ** (failures - 1))
+    
+    def staleness(self, candidate):
+        """How overdue a company is: >= 1 means due (infinite if never collected)
+        
+        After failed or empty collections (no news, unknown name) a company
+        waits out an exponential backoff instead of being retried every tick.
+        """
+        staleness = float('inf')
+        if candidate['age'] is not None:
+            views = candidate['views'] * 0.5 ** (candidate['views_age'] / self.half_life)
+            interval = self.interval(views) * random.uniform(1 - self.jitter, 1 + self.jitter)
+            staleness = candidate['age'] / interval
+        if candidate.get('failures') and candidate.get('attempt_age') is not None:
+            staleness = min(staleness, candidate['attempt_age'] / self.backoff(candidate['failures']))
+        return staleness
+    
+    def due(self):
+        """Due companies as a heap of (-staleness, name, id)"""
+        with self._lock:
+            in_flight = set(self._in_flight)
+        
+        queue = []
+        for candidate in self.db.get_refresh_candidates():
+            if candidate['id'] in in_flight:
+                continue
+            staleness = self.staleness(candidate)
+            if staleness >= 1:
+                queue.append((-staleness, candidate['name'], candidate['id']))
+        heapq.heapify(queue)
+        return queue
+    
+    def _spend_budget(self):
+        """Take one refresh's worth of upstream calls; False if any budget is spent"""
+        for host, cost in REFRESH_COST.items():
+            bucket = self.budgets.get(host)
+            if bucket is not None and bucket.available() < cost:
+                return False
+        for host, cost in REFRESH_COST.items():
+            bucket = self.budgets.get(host)
+            if bucket is not None:
+                bucket.try_acquire(cost)
+        return True
+    
+    def tick(self):
+        """Start refreshes for the most overdue companies; returns how many started"""
+        if self.views is not None:
+            self.views.flush()
+        queue = self.due()
+        started = 0
+        while queue:
+            with self._lock:
+                if len(self._in_flight) >= self.max_concurrency:
+                    break
+            if not self._spend_budget():
+                self.stats['deferred'] += len(queue)
+                break
+            _, name, company_id = heapq.heappop(queue)
+            with self._lock:
+                self._in_flight.add(company_id)
+            self._executor.submit(self._run, company_id, name)
+            started += 1
+        return started
+    
+    def _run(self, company_id, name):
+        """Refresh one company and release its slot"""
+        try:
+            result = self.refresh(name)
+            outcome = 'failed' if isinstance(result, tuple) and not result[0] else 'refreshed'
+        except Exception as e:
+            log.exception(f"❌ Scheduled refresh of '{name}' failed: {e}", extra={'company': name})
+            outcome = 'failed'
+        with self._lock:
+            self.stats[outcome] += 1
+            self._in_flight.discard(company_id)
+    
+    def run(self):
+        """Tick until stop() is called"""
+        log.info(f"⏱️ Refresh scheduler running (max {self.max_concurrency} concurrent)")
+        while not self._stop.is_set():
+            try:
+                self.tick()
+            except Exception as e:
+                log.exception(f"❌ Scheduler tick failed: {e}")
+            # Jittered sleep so several schedulers don't tick in lockstep
+            self._stop.wait(self.tick_interval * random.uniform(1 - self.jitter, 1 + self.jitter))
+    
+    def start(self):
+        """Run the scheduler on a daemon thread (idempotent)"""
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(target=self.run, name='refresh-scheduler', daemon=True)
+            self._thread.start()
+    
+    def stop(self, wait=True):
+        """Stop ticking; optionally wait for running refreshes"""
+        self._stop.set()
+        self._executor.shutdown(wait=wait)
+
+def scheduler_from_env(db, refresh, views=None):
+    """Build a RefreshScheduler configured by REFRESH_* environment variables"""
+    return RefreshScheduler(
+        db,
+        refresh,
+        views=views,
+        max_concurrency=int(os.environ.get('REFRESH_CONCURRENCY', 2)),
+        min_interval=float(os.environ.get('REFRESH_MIN_INTERVAL', 300)),
+        max_interval=float(os.environ.get('REFRESH_MAX_INTERVAL', 6 * 3600)),
+        half_life=float(os.environ.get('REFRESH_VIEW_HALF_LIFE', 3600)),
+        tick_interval=float(os.environ.get('REFRESH_TICK', 30)),
+        budgets={
+            'serpapi': float(os.environ.get('REFRESH_SERPAPI_PER_MIN', 10)),
+            'finnhub': float(os.environ.get('REFRESH_FINNHUB_PER_MIN', 30))
+        }
+    )
+
+if __name__ == "__main__":
+    # Standalone worker (Procfile `worker:`); the web process leaves REFRESH_SCHEDULER off
+    from agent1_collector import get_db, collect_and_store_data, get_sentiment_version
+    from retention import retention_from_env
+    
+    configure_logging()
+    log.info("⏱️ AGENT 1: Starting refresh worker...")
+    scheduler = scheduler_from_env(get_db(), collect_and_store_data)
+    retention = retention_from_env(get_db(), get_sentiment_version)
+    if os.environ.get('RETENTION', 'on') != 'off':
+        retention.start()
+    try:
+        scheduler.run()
+    except KeyboardInterrupt:
+        retention.stop()
+        scheduler.stop(wait=False)
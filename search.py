@@ -0,0 +1,134 @@
+"""
+Article Search for News Analyzer
+Turns user queries into safe FTS5 expressions and renders highlighted matches
+
+Index existing articles once with: python search.py backfill
+"""
+
+import html
+import re
+import time
+
+# Quoted phrases, words with an optional prefix *, and the OR operator; a
+# leading - excludes the term
+_TERM = re.compile(r'(-?)"([^"]*)"|(-?)([\w][\w\'.&]*)(\*?)', re.UNICODE)
+_WORD = re.compile(r'\w+', re.UNICODE)
+
+SENTIMENTS = ('positive', 'negative', 'neutral')
+
+def _quote(text):
+    return '"' + text.replace('"', '""') + '"'
+
+def build_match_query(text):
+    """FTS5 MATCH expression for a search box query
+    
+    Terms are ANDed; "quoted phrases", prefix* matches, OR and -excluded
+    terms are supported. Everything is quoted, so user input can never be
+    an FTS5 syntax error. Raises ValueError when nothing searchable is left.
+    """
+    included, excluded = [], []
+    pending_or = False
+    for match in _TERM.finditer(text or ''):
+        negate_phrase, phrase, negate_word, word, prefix = match.groups()
+        negate = bool(negate_phrase or negate_word)
+        if word == 'OR' and not negate:
+            pending_or = bool(included)
+            continue
+        
+        # Keep only the characters the tokenizer indexes
+        words = _WORD.findall(phrase if phrase is not None else word)
+        if not words:
+            continue
+        term = _quote(' '.join(words)) + ('*' if prefix and phrase is None else '')
+        if negate:
+            excluded.append(term)
+        elif pending_or:
+            included[-1] = f'{included[-1]} OR {term}'
+            pending_or = False
+        else:
+            included.append(term)
+    
+    if not included:
+        raise ValueError("Search needs at least one word to look for")
+    expression = ' AND '.join(f'({term})' if ' OR ' in term else term for term in included)
+    for term in excluded:
+        expression = f'{expression} NOT {term}'
+    return expression
+
+def render_highlight(text, start_mark, end_mark):
+    """HTML-escape text and turn the index's match marks into <mark> tags"""
+    if text is None:
+        return None
+    return html.escape(text).replace(start_mark, '<mark>').replace(end_mark, '</mark>')
+
+def search(db, query, company_names=None, sentiment=None, start=None, end=None, limit=20, offset=0):
+    """Search articles and return result dicts with HTML highlights"""
+    match = build_match_query(query)
+    company_ids = list(db.get_company_ids(company_names).values()) if company_names else None
+    results = db.search_articles(match, company_ids, sentiment, start, end, limit, offset)
+    for result in results:
+        for key in ('title_highlight', 'snippet_highlight'):
+            result[key] = render_highlight(result[key], db.HIGHLIGHT_START, db.HIGHLIGHT_END)
+    return results
+
+def backfill(db, batch_size=1000, pause=0.01, progress=None):
+    """Index articles stored before the search index existed; returns how many
+    
+    Runs in short transactions over id ranges, so it can run next to the web
+    server and resume from scratch at any time (indexed rows are skipped).
+    """
+    with db.transaction() as conn:
+        if not db.create_search_index(conn):
+            raise RuntimeError("SQLite was built without FTS5")
+    
+    total = 0
+    after_id = 0
+    while after_id is not None:
+        indexed, after_id = db.backfill_search_index(after_id, batch_size)
+        total += indexed
+        if progress and after_id is not None:
+            progress(total, after_id)
+        time.sleep(pause)
+    return total
+
+if __name__ == "__main__":
+    import argparse
+    import json
+    import sys
+    from database import NewsDatabase
+    from instrumentation import configure_logging, get_logger
+    from timeseries import resolve_range
+    
+    parser = argparse.ArgumentParser(description="Full-text search over collected articles")
+    parser.add_argument('--db', default='news_analyzer.db', help="database file")
+    commands = parser.add_subparsers(dest='command', required=True)
+    fill = commands.add_parser('backfill', help="index articles stored before search existed")
+    fill.add_argument('--batch-size', type=int, default=1000)
+    query = commands.add_parser('query', help="print matching articles as NDJSON")
+    query.add_argument('text')
+    query.add_argument('--company', action='append', help="company to include (repeatable)")
+    query.add_argument('--sentiment', choices=SENTIMENTS)
+    query.add_argument('--start', help="ISO date/time, UTC (inclusive)")
+    query.add_argument('--end', help="ISO date/time, UTC (exclusive)")
+    query.add_argument('--limit', type=int, default=20)
+    args = parser.parse_args()
+    
+    configure_logging()
+    log = get_logger('search')
+    db = NewsDatabase(args.db)
+    
+    if args.command == 'backfill':
+        log.info("🔎 Backfilling the article search index...")
+        indexed = backfill(db, args.batch_size,
+                           progress=lambda total, last_id: log.debug(f"Indexed {total} (up to id {last_id})"))
+        log.info(f"✅ Indexed {indexed} articles")
+    else:
+        start = end = None
+        if args.start or args.end:
+            start, end = resolve_range(args.start, args.end, default_days=36500)
+        try:
+            results = search(db, args.text, args.company, args.sentiment, start, end, args.limit)
+        except ValueError as e:
+            parser.error(str(e))
+        for result in results:
+            sys.stdout.write(json.dumps(result) + '\n')
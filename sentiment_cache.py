@@ -0,0 +1,88 @@
+"""
+Sentiment Cache for News Analyzer
+Content-addressed cache of sentiment scores: in-process LRU backed by SQLite
+"""
+
+import hashlib
+import threading
+from collections import OrderedDict
+
+def normalize_text(text):
+    """Collapse whitespace; case is kept because VADER scores capitals differently"""
+    return ' '.join((text or '').split())
+
+def text_hash(text):
+    """Content hash of the normalized text"""
+    return hashlib.blake2b(normalize_text(text).encode('utf-8'), digest_size=16).hexdigest()
+
+class SentimentCache:
+    def __init__(self, db, version, max_size=20000):
+        self.db = db
+        self.version = version
+        self.max_size = max_size
+        self._lru = OrderedDict()
+        self._lock = threading.Lock()
+        self.memory_hits = 0
+        self.db_hits = 0
+        self.misses = 0
+    
+    def _remember(self, key, score):
+        """Add to the LRU tier, evicting the oldest entries (caller holds the lock)"""
+        key = (self.version, key)
+        self._lru[key] = score
+        self._lru.move_to_end(key)
+        while len(self._lru) > self.max_size:
+            self._lru.popitem(last=False)
+    
+    def get_many(self, texts):
+        """Look up scores for texts; returns {hash: score} for hits only"""
+        keys = {text_hash(text) for text in texts}
+        found = {}
+        with self._lock:
+            for key in keys:
+                versioned_key = (self.version, key)
+                if versioned_key in self._lru:
+                    self._lru.move_to_end(versioned_key)
+                    found[key] = self._lru[versioned_key]
+            self.memory_hits += len(found)
+        
+        remaining = [key for key in keys if key not in found]
+        if remaining:
+            stored = self.db.get_cached_sentiments(remaining, self.version)
+            with self._lock:
+                for key, score in stored.items():
+                    self._remember(key, score)
+                self.db_hits += len(stored)
+                self.misses += len(remaining) - len(stored)
+            found.update(stored)
+        return found
+    
+    def put_many(self, scores):
+        """Store {hash: score} in both tiers"""
+        if not scores:
+            return
+        with self._lock:
+            for key, score in scores.items():
+                self._remember(key, score)
+        self.db.put_cached_sentiments(scores, self.version)
+    
+    def get(self, text):
+        """Cached score for one text, or None"""
+        return self.get_many([text]).get(text_hash(text))
+    
+    def put(self, text, score):
+        """Cache the score for one text"""
+        self.put_many({text_hash(text): score})
+    
+    def stats(self):
+        """Hit/miss counters"""
+        with self._lock:
+            lookups = self.memory_hits + self.db_hits + self.misses
+            return {
+                'version': self.version,
+                'size': len(self._lru),
+                'memory_hits': self.memory_hits,
+                'db_hits': self.db_hits,
+                'misses': self.misses,
+                'hit_rate': round((self.memory_hits + self.db_hits) / lookups, 4) if lookups else 0.0
+            }
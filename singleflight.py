@@ -0,0 +1,125 @@
+"""
+Single-Flight Collections for News Analyzer
+Coalesces concurrent collections of the same company, within one process and
+across processes sharing the database, through a lock row per company
+"""
+
+import os
+import socket
+import threading
+import time
+import uuid
+from instrumentation import counter, get_logger
+
+log = get_logger('singleflight')
+
+COALESCED = counter(
+    'news_analyzer_collection_requests_total', 'Collection requests by how they were served', ['outcome'])
+
+# A company collected successfully this recently (seconds) is not collected again
+COOLDOWN = float(os.environ.get('COLLECTION_COOLDOWN', 60))
+# A lock held longer than this (seconds) is assumed dead and can be taken over
+LEASE = float(os.environ.get('COLLECTION_LEASE', 300))
+
+def company_key(company_name):
+    """Lock key for a company name, ignoring surrounding and repeated spaces
+    
+    Case is kept: companies are stored under their exact name, so 'apple'
+    and 'Apple' are different collections (the web server maps input to the
+    stored spelling first).
+    """
+    return ' '.join((company_name or '').split())
+
+class _Flight:
+    """One in-process collection and the callers waiting on it"""
+    
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = (False, "Collection failed")
+
+class SingleFlight:
+    """Runs at most one collection per company at a time, across processes
+    
+    Callers asking for a company that is already being collected wait for
+    that run and get its result: in this process through a shared in-memory
+    flight, in other processes by polling the company's row in
+    collection_locks. A company collected successfully less than `cooldown`
+    seconds ago is not collected again; callers get the last run's result.
+    A lock whose owner died is taken over once its `lease` runs out.
+    """
+    
+    def __init__(self, db, cooldown=COOLDOWN, lease=LEASE, poll_interval=0.25):
+        self.db = db
+        self.cooldown = cooldown
+        self.lease = lease
+        self.poll_interval = poll_interval
+        self.owner = f'{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}'
+        self._flights = {}
+        self._lock = threading.Lock()
+    
+    def run(self, company_name, func):
+        """Return func(company_name)'s (success, message), running it only if nobody else is"""
+        key = company_key(company_name)
+        with self._lock:
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight()
+        
+        if not leader:
+            COALESCED.inc(outcome='joined')
+            flight.done.wait()
+            return flight.result
+        
+        try:
+            flight.result = self._run_once(key, company_name, func)
+            return flight.result
+        finally:
+            with self._lock:
+                del self._flights[key]
+            flight.done.set()
+    
+    def _run_once(self, key, company_name, func):
+        """Claim the company's lock row and collect, or share another process's run"""
+        joined = False
+        while True:
+            state, lock = self.db.claim_collection(key, self.owner, self.lease, self.cooldown)
+            if state == 'claimed':
+                break
+            if state == 'cooldown':
+                COALESCED.inc(outcome='cooldown')
+                log.info(f"💤 '{company_name}' was collected {time.time() - lock['finished_at']:.0f}s ago, "
+                         f"reusing that result", extra={'company': company_name})
+                return True, lock['message'] or "Recently collected"
+            
+            if not joined:
+                joined = True
+                COALESCED.inc(outcome='joined')
+                log.info(f"🔗 '{company_name}' is being collected by {lock['owner']}, waiting for it",
+                         extra={'company': company_name})
+            result = self._wait(key)
+            if result is not None:
+                return result
+            # The other owner's lease ran out: try to take over
+        
+        COALESCED.inc(outcome='collected')
+        result = (False, "Collection failed")
+        try:
+            result = func(company_name)
+            return result
+        finally:
+            success = bool(result[0]) if isinstance(result, tuple) else bool(result)
+            message = result[1] if isinstance(result, tuple) and len(result) > 1 else None
+            self.db.finish_collection(key, self.owner, success, message)
+    
+    def _wait(self, key):
+        """Poll a lock row held elsewhere; the run's (success, message), or None if its lease expired"""
+        while True:
+            time.sleep(self.poll_interval)
+            lock = self.db.get_collection_lock(key)
+            if lock is None:
+                return None
+            if lock['owner'] is None:
+                return bool(lock['succeeded']), lock['message']
+            if lock['expires_at'] <= time.time():
+                return None
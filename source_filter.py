@@ -0,0 +1,130 @@
+"""
+Trusted Source Filter for News Analyzer
+Precompiled allow/deny matcher for article links and source names
+"""
+
+import json
+import os
+import re
+from urllib.parse import urlsplit
+
+# Default list of trusted, high-quality news sources
+DEFAULT_TRUSTED_SOURCES = [
+    'bloomberg.com', 'reuters.com', 'wsj.com', 'ft.com',
+    'cnbc.com', 'forbes.com', 'businessinsider.com',
+    'marketwatch.com', 'theverge.com', 'techcrunch.com',
+    'cnn.com', 'bbc.com', 'theguardian.com', 'nytimes.com',
+    'washingtonpost.com', 'apnews.com', 'fortune.com',
+    'barrons.com', 'economist.com', 'seekingalpha.com',
+    'investopedia.com', 'morningstar.com', 'yahoo.com/finance'
+]
+
+_NON_ALNUM = re.compile(r'[^a-z0-9]')
+
+def source_key(name):
+    """Normalize a publisher name, e.g. 'The Guardian' -> 'theguardian'"""
+    return _NON_ALNUM.sub('', (name or '').lower())
+
+def parse_entry(entry):
+    """Split 'yahoo.com/finance' into ('yahoo.com', '/finance')"""
+    entry = entry.strip().lower()
+    if '://' in entry:
+        entry = entry.split('://', 1)[1]
+    domain, _, path = entry.partition('/')
+    if domain.startswith('www.'):
+        domain = domain[4:]
+    return domain, ('/' + path.rstrip('/')) if path else ''
+
+class SourceMatcher:
+    def __init__(self, allow, deny=()):
+        self.allow = self._compile(allow)
+        self.deny = self._compile(deny)
+        
+        # Publisher names derived from allowed entries ('reuters', 'yahoofinance', ...)
+        denied_names = {self._entry_name(domain, path) for domain, path in self._entries(deny)}
+        self.source_names = {
+            self._entry_name(domain, path) for domain, path in self._entries(allow)
+        } - denied_names
+        self.source_names.update('the' + name for name in list(self.source_names))
+    
+    @staticmethod
+    def _entries(entries):
+        return [parse_entry(entry) for entry in entries if entry and entry.strip()]
+    
+    @staticmethod
+    def _entry_name(domain, path):
+        return source_key(domain.split('.')[0] + path)
+    
+    def _compile(self, entries):
+        """Build {domain: [path prefixes]}; an empty prefix matches the whole domain"""
+        table = {}
+        for domain, path in self._entries(entries):
+            table.setdefault(domain, []).append(path)
+        for domain, prefixes in table.items():
+            table[domain] = [''] if '' in prefixes else sorted(set(prefixes))
+        return table
+    
+    @staticmethod
+    def _lookup(table, host, path):
+        """Match host and its parent domains against a compiled table"""
+        labels = host.split('.')
+        for i in range(len(labels) - 1):
+            prefixes = table.get('.'.join(labels[i:]))
+            if prefixes is None:
+                continue
+            for prefix in prefixes:
+                if not prefix or path == prefix or path.startswith(prefix + '/'):
+                    return True
+        return False
+    
+    def is_trusted(self, link, source=''):
+        """True if the link's domain (or, failing that, the source name) is allowed"""
+        try:
+            parts = urlsplit(link or '')
+            host = (parts.hostname or '').rstrip('.')
+            path = parts.path.lower().rstrip('/')
+        except ValueError:
+            host = path = ''
+        
+        if host:
+            if self._lookup(self.deny, host, path):
+                return False
+            if self._lookup(self.allow, host, path):
+                return True
+        
+        return source_key(source) in self.source_names
+
+def read_sources_file(path):
+    """Read allow/deny entries from a JSON file ({"allow": [...], "deny": [...]})
+    or a text file with one entry per line ('!' prefix denies, '#' comments)"""
+    with open(path) as f:
+        if path.endswith('.json'):
+            config = json.load(f)
+            return config.get('allow', []), config.get('deny', [])
+        
+        allow, deny = [], []
+        for line in f:
+            line = line.split('#', 1)[0].strip()
+            if line.startswith('!'):
+                deny.append(line[1:])
+            elif line:
+                allow.append(line)
+        return allow, deny
+
+def load_source_matcher(db=None, path=None):
+    """Build a matcher from the defaults, an optional config file and the news_sources table"""
+    allow = list(DEFAULT_TRUSTED_SOURCES)
+    deny = []
+    
+    path = path or os.environ.get('TRUSTED_SOURCES_FILE')
+    if path:
+        file_allow, file_deny = read_sources_file(path)
+        allow.extend(file_allow)
+        deny.extend(file_deny)
+    
+    if db is not None:
+        db_allow, db_deny = db.get_news_sources()
+        allow.extend(db_allow)
+        deny.extend(db_deny)
+    
+    return SourceMatcher(allow, deny)
@@ -0,0 +1,265 @@
+"""
+Symbol Resolver for News Analyzer
+In-memory index from company names to ticker symbols: exact names and aliases,
+tickers, then fuzzy trigram matches; backed by the persisted symbols table
+
+Load a bulk symbol list (Finnhub /stock/symbol JSON, or CSV/pipe-separated
+text with symbol and name columns) once with: python symbols.py import symbols.json
+"""
+
+import csv
+import json
+import os
+import re
+import threading
+import unicodedata
+from instrumentation import counter
+
+SYMBOL_LOOKUPS = counter(
+    'news_analyzer_symbol_lookups_total', 'Company name to ticker resolutions, by how they matched', ['match'])
+
+# Minimum Dice similarity of name trigrams for a fuzzy match
+FUZZY_THRESHOLD = float(os.environ.get('SYMBOL_FUZZY_THRESHOLD', 0.7))
+# Names with no known ticker are looked up upstream again after this many days
+MISS_DAYS = float(os.environ.get('SYMBOL_MISS_DAYS', 30))
+# Trigrams shared by more names than this are too common to find candidates by
+COMMON_TRIGRAM = 2000
+# Bound on memoized fuzzy resolutions
+MEMO_SIZE = 10000
+
+# Seed names; the symbols table and bulk lists add to these
+DEFAULT_SYMBOLS = {
+    'apple': 'AAPL', 'microsoft': 'MSFT', 'google': 'GOOGL',
+    'alphabet': 'GOOGL', 'amazon': 'AMZN', 'tesla': 'TSLA',
+    'meta': 'META', 'facebook': 'META', 'nvidia': 'NVDA',
+    'netflix': 'NFLX', 'intel': 'INTC', 'amd': 'AMD',
+    'ibm': 'IBM', 'oracle': 'ORCL', 'salesforce': 'CRM',
+    'adobe': 'ADBE', 'cisco': 'CSCO', 'paypal': 'PYPL',
+    'uber': 'UBER', 'lyft': 'LYFT', 'airbnb': 'ABNB',
+    'spotify': 'SPOT', 'snapchat': 'SNAP', 'snap': 'SNAP',
+    'zoom': 'ZM', 'disney': 'DIS', 'walmart': 'WMT',
+    'starbucks': 'SBUX', 'nike': 'NKE', 'twitter': 'TWTR',
+    'coca cola': 'KO', 'cocacola': 'KO', 'pepsi': 'PEP',
+    'mcdonalds': 'MCD', 'boeing': 'BA', 'ford': 'F',
+    'gm': 'GM', 'general motors': 'GM', 'jp morgan': 'JPM',
+    'bank of america': 'BAC', 'visa': 'V', 'mastercard': 'MA',
+    'costco': 'COST', 'target': 'TGT', 'pfizer': 'PFE'
+}
+
+# Legal-form and listing words that don't tell companies apart ('Apple Inc.' is 'Apple')
+NAME_NOISE = {
+    'the', 'inc', 'incorporated', 'corp', 'corporation', 'co', 'company', 'cos', 'ltd', 'limited',
+    'plc', 'llc', 'lp', 'sa', 'ag', 'nv', 'se', 'holdings', 'holding', 'group', 'class', 'common',
+    'stock', 'shares', 'ordinary', 'adr', 'ads', 'new', 'a', 'b', 'c'
+}
+# Punctuation removed inside words, so "AT&T", "McDonald's" and "J.P." stay one word
+_JOINERS = re.compile(r"[&'’.]")
+_WORD = re.compile(r'[a-z0-9]+')
+_NUMBER = re.compile(r'\d+')
+_TICKER = re.compile(r'^[A-Za-z]{1,5}([.-][A-Za-z]{1,2})?$')
+
+def name_key(name):
+    """Normalized company name used as the lookup key, e.g. 'Johnson & Johnson' -> 'johnson johnson'"""
+    text = _JOINERS.sub('', unicodedata.normalize('NFKC', name or '').lower())
+    words = _WORD.findall(text)
+    meaningful = [word for word in words if word not in NAME_NOISE]
+    return ' '.join(meaningful or words)
+
+def trigrams(key):
+    """Character trigrams of a name key, padded so word starts and ends count"""
+    padded = f'  {key} '
+    return frozenset(padded[i:i + 3] for i in range(len(padded) - 2))
+
+def name_similarity(first, second):
+    """Dice similarity of two names' trigrams (0-1)"""
+    first, second = trigrams(name_key(first)), trigrams(name_key(second))
+    if not first or not second:
+        return 0.0
+    return 2 * len(first & second) / (len(first) + len(second))
+
+class SymbolResolver:
+    """Resolves company names to tickers without touching the database or network
+    
+    Exact name keys and tickers are dict lookups; other names are matched by
+    trigram similarity against every known name, and those results are
+    memoized. Names recorded as having no ticker resolve as misses, so
+    callers never ask upstream about them again.
+    """
+    
+    def __init__(self, entries=(), misses=(), threshold=FUZZY_THRESHOLD):
+        self.threshold = threshold
+        self._names = {}
+        self._symbols = set()
+        self._grams = []
+        self._postings = {}
+        self._misses = set()
+        self._memo = {}
+        self._lock = threading.Lock()
+        for name, symbol in entries:
+            self.add(name, symbol)
+        for name in misses:
+            self.add_miss(name)
+    
+    def __len__(self):
+        return len(self._names)
+    
+    def add(self, name, symbol):
+        """Index a name (or alias) for a ticker; the first ticker seen for a name wins"""
+        key = name_key(name)
+        if not key or not symbol:
+            return
+        symbol = symbol.strip().upper()
+        with self._lock:
+            self._misses.discard(key)
+            self._symbols.add(symbol)
+            if key in self._names:
+                return
+            self._names[key] = symbol
+            position = len(self._grams)
+            grams = trigrams(key)
+            self._grams.append((key, grams))
+            for gram in grams:
+                self._postings.setdefault(gram, []).append(position)
+            # A new name can beat an earlier fuzzy match
+            self._memo.clear()
+    
+    def add_miss(self, name):
+        """Record that a name has no ticker"""
+        key = name_key(name)
+        if key and key not in self._names:
+            with self._lock:
+                self._misses.add(key)
+    
+    def _fuzzy(self, key):
+        # Names differing in a number ('Fund 1', 'Fund 2') are different companies
+        numbers = _NUMBER.findall(key)
+        grams = trigrams(key)
+        postings = [self._postings[gram] for gram in grams if gram in self._postings]
+        rare = [positions for positions in postings if len(positions) <= COMMON_TRIGRAM]
+        candidates = set()
+        for positions in rare or postings:
+            candidates.update(positions)
+        
+        best, best_score = None, self.threshold
+        for position in candidates:
+            other_key, other_grams = self._grams[position]
+            if _NUMBER.findall(other_key) != numbers:
+                continue
+            score = 2 * len(grams & other_grams) / (len(grams) + len(other_grams))
+            if score > best_score or (score == best_score and best is None):
+                best, best_score = other_key, score
+        return self._names[best] if best is not None else None
+    
+    def resolve(self, name):
+        """(symbol, match) for a name; match is 'exact', 'ticker', 'fuzzy', 'miss' or 'unknown'
+        
+        symbol is None for 'miss' (known to have no ticker) and 'unknown'
+        (never seen; worth one upstream lookup).
+        """
+        key = name_key(name)
+        symbol, match = self._names.get(key), 'exact'
+        if symbol is None:
+            text = (name or '').strip()
+            if _TICKER.match(text) and text.upper() in self._symbols:
+                symbol, match = text.upper(), 'ticker'
+            elif key in self._misses:
+                match = 'miss'
+            elif key:
+                if key in self._memo:
+                    symbol = self._memo[key]
+                else:
+                    symbol = self._fuzzy(key)
+                    with self._lock:
+                        if len(self._memo) >= MEMO_SIZE:
+                            self._memo.clear()
+                        self._memo[key] = symbol
+                match = 'fuzzy' if symbol else 'unknown'
+            else:
+                match = 'miss'
+        SYMBOL_LOOKUPS.inc(match=match)
+        return symbol, match
+
+def read_symbols_file(path):
+    """(name, symbol) pairs from a bulk symbol list
+    
+    Accepts Finnhub's /stock/symbol JSON (only common stock and ADRs are
+    kept), a JSON {name: symbol} object, or CSV/pipe-separated text with a
+    header naming symbol and name columns (e.g. NASDAQ's nasdaqlisted.txt).
+    An optional 'aliases' column holds extra names separated by ';'.
+    """
+    with open(path, encoding='utf-8') as f:
+        if path.endswith('.json'):
+            data = json.load(f)
+            if isinstance(data, dict):
+                return list(data.items())
+            return [
+                (row.get('description'), row.get('displaySymbol') or row.get('symbol'))
+                for row in data
+                if row.get('type') in (None, '', 'Common Stock', 'ADR')
+            ]
+        
+        header = f.readline()
+        delimiter = '|' if '|' in header else '\t' if '\t' in header else ','
+        columns = [column.strip().lower() for column in next(csv.reader([header], delimiter=delimiter))]
+        symbol_column = next(i for i, column in enumerate(columns)
+                             if column in ('symbol', 'ticker', 'act symbol'))
+        name_column = next(i for i, column in enumerate(columns)
+                           if column in ('name', 'description', 'security name', 'company name'))
+        alias_column = columns.index('aliases') if 'aliases' in columns else None
+        
+        pairs = []
+        for row in csv.reader(f, delimiter=delimiter):
+            if len(row) <= max(symbol_column, name_column):
+                continue
+            symbol = row[symbol_column].strip()
+            # NASDAQ lists end with a "File Creation Time" line
+            if not symbol or ' ' in symbol:
+                continue
+            pairs.append((row[name_column].split(' - ')[0], symbol))
+            if alias_column is not None and alias_column < len(row):
+                pairs.extend((alias, symbol) for alias in row[alias_column].split(';') if alias.strip())
+        return pairs
+
+def load_symbol_resolver(db=None):
+    """Build a resolver from the defaults and the symbols table"""
+    entries = list(DEFAULT_SYMBOLS.items())
+    misses = []
+    if db is not None:
+        for name, symbol in db.get_symbols(MISS_DAYS):
+            if symbol:
+                entries.append((name, symbol))
+            else:
+                misses.append(name)
+    return SymbolResolver(entries, misses)
+
+if __name__ == "__main__":
+    import argparse
+    import time
+    from database import NewsDatabase
+    from instrumentation import configure_logging, get_logger
+    
+    parser = argparse.ArgumentParser(description="Company name to ticker symbol resolution")
+    parser.add_argument('--db', default='news_analyzer.db', help="database file")
+    commands = parser.add_subparsers(dest='command', required=True)
+    load = commands.add_parser('import', help="add a bulk symbol list to the symbols table")
+    load.add_argument('path')
+    resolve = commands.add_parser('resolve', help="resolve names offline (no upstream calls)")
+    resolve.add_argument('names', nargs='+')
+    args = parser.parse_args()
+    
+    configure_logging()
+    log = get_logger('symbols')
+    db = NewsDatabase(args.db)
+    
+    if args.command == 'import':
+        pairs = read_symbols_file(args.path)
+        log.info(f"📥 Importing {len(pairs)} names from {args.path}...")
+        added = db.save_symbols(pairs, 'file')
+        log.info(f"✅ Added {added} names")
+    else:
+        started = time.perf_counter()
+        resolver = load_symbol_resolver(db)
+        log.info(f"📇 Indexed {len(resolver)} names in {time.perf_counter() - started:.2f}s")
+        for name in args.names:
+            symbol, match = resolver.resolve(name)
+            print(json.dumps({'name': name, 'symbol': symbol, 'match': match}))
@@ -0,0 +1,22 @@
+"""
+Shared fixtures: a fresh, fully migrated database per test
+"""
+
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database import NewsDatabase
+
+@pytest.fixture
+def db(tmp_path):
+    database = NewsDatabase(str(tmp_path / 'news_analyzer.db'))
+    yield database
+    database.close()
+
+@pytest.fixture
+def company_id(db):
+    return db.insert_company('Acme')
@@ -0,0 +1,77 @@
+"""
+Connection pool: reuse across short-lived threads, transactions and a
+failed COMMIT leaving the connection usable
+"""
+
+import sqlite3
+import threading
+
+import pytest
+
+from database import ConnectionPool, release_connections
+
+def run_in_thread(func):
+    result = []
+    thread = threading.Thread(target=lambda: result.append(func()))
+    thread.start()
+    thread.join(5)
+    return result[0]
+
+def test_released_connection_is_reused_by_the_next_thread(tmp_path):
+    pool = ConnectionPool(str(tmp_path / 'pool.db'))
+    
+    def request():
+        conn = pool.get()
+        conn.execute('SELECT 1').fetchone()
+        release_connections()
+        return conn
+    
+    first = run_in_thread(request)
+    assert run_in_thread(request) is first
+    pool.close_all()
+
+def test_idle_connections_are_bounded(tmp_path):
+    pool = ConnectionPool(str(tmp_path / 'pool.db'), max_idle=1)
+    barrier = threading.Barrier(3)
+    
+    def request():
+        pool.get()
+        barrier.wait(5)
+        pool.release()
+    
+    threads = [threading.Thread(target=request) for _ in range(3)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(5)
+    assert len(pool._idle) == 1
+    pool.close_all()
+
+def test_release_inside_a_transaction_keeps_the_connection(tmp_path):
+    pool = ConnectionPool(str(tmp_path / 'pool.db'))
+    with pool.transaction() as conn:
+        conn.execute('CREATE TABLE t (x)')
+        pool.release()
+        assert pool.get() is conn
+        conn.execute('INSERT INTO t VALUES (1)')
+    assert pool.get().execute('SELECT COUNT(*) FROM t').fetchone()[0] == 1
+    pool.close_all()
+
+def test_failed_commit_rolls_back_and_the_connection_stays_usable(tmp_path):
+    pool = ConnectionPool(str(tmp_path / 'pool.db'))
+    with pool.transaction() as conn:
+        conn.execute('CREATE TABLE parent (id INTEGER PRIMARY KEY)')
+        conn.execute('''CREATE TABLE child (
+            parent_id INTEGER REFERENCES parent (id) DEFERRABLE INITIALLY DEFERRED)''')
+    
+    # A deferred foreign key violation only fails at COMMIT
+    with pytest.raises(sqlite3.IntegrityError):
+        with pool.transaction() as conn:
+            conn.execute('INSERT INTO child VALUES (42)')
+    
+    conn = pool.get()
+    assert not conn.in_transaction
+    with pool.transaction() as conn:
+        conn.execute('INSERT INTO parent VALUES (1)')
+    assert conn.execute('SELECT COUNT(*) FROM child').fetchone()[0] == 0
+    pool.close_all()
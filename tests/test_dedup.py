@@ -0,0 +1,91 @@
+"""
+Link/title deduplication, near-duplicate clustering and cluster promotion
+when retention deletes a story's row
+"""
+
+from datetime import datetime
+
+from dedup import SignatureIndex, normalize_link, signature, title_hash
+from retention import Retention
+
+def article(title, link, snippet='Acme reported quarterly results above expectations'):
+    return {'title': title, 'link': link, 'snippet': snippet, 'source': 'Wire',
+            'sentiment_score': 0.2, 'sentiment_category': 'positive'}
+
+def rows(db):
+    return {row[0]: row[1:] for row in db.get_connection().execute(
+        'SELECT link, id, cluster_id, snippet FROM news_articles')}
+
+def test_normalize_link_ignores_tracking_and_mobile_hosts():
+    assert normalize_link('https://www.example.com/a/?utm_source=x&id=3#top') == \
+        normalize_link('http://m.example.com/a?id=3&fbclid=abc')
+    assert normalize_link('https://example.com/a?id=3') != normalize_link('https://example.com/a?id=4')
+
+def test_title_hash_ignores_case_and_punctuation():
+    assert title_hash('Acme Beats Earnings!') == title_hash('acme beats  earnings')
+    assert title_hash('...') is None
+
+def test_signature_index_finds_near_duplicates():
+    index = SignatureIndex()
+    index.add(1, signature('Acme shares jump after the company beats quarterly earnings estimates'))
+    assert index.find(signature('Acme shares jump after company beats quarterly earnings estimates')) == 1
+    assert index.find(signature('Regulators open an inquiry into a rival chipmaker')) is None
+
+def test_same_link_is_stored_once(db, company_id):
+    first = db.insert_news_articles(company_id, [article('Acme beats earnings', 'https://a.com/1')])
+    again = db.insert_news_articles(company_id, [article('Acme beats earnings', 'https://www.a.com/1/?utm_source=x')])
+    assert first == again
+    assert len(rows(db)) == 1
+
+def test_syndicated_copy_joins_the_story_cluster(db, company_id):
+    story_id, = db.insert_news_articles(company_id, [article('Acme beats earnings', 'https://a.com/1')])
+    copy_id, = db.insert_news_articles(company_id, [article('ACME beats earnings.', 'https://b.com/2')])
+    assert copy_id == story_id
+    member = rows(db)['https://b.com/2']
+    assert member[1] == story_id
+    assert member[2] is None
+
+def test_seeing_a_member_again_refreshes_the_story(db, company_id):
+    db.insert_news_articles(company_id, [article('Acme beats earnings', 'https://a.com/1')])
+    db.insert_news_articles(company_id, [article('Acme beats earnings', 'https://b.com/2')])
+    with db.transaction() as conn:
+        conn.execute("UPDATE news_articles SET last_seen_at = '2020-01-01 00:00:00'")
+    db.insert_news_articles(company_id, [article('Acme beats earnings', 'https://b.com/2')])
+    seen = [row[0] for row in db.get_connection().execute('SELECT last_seen_at FROM news_articles')]
+    assert all(value > '2020-01-01 00:00:00' for value in seen)
+
+def test_deleting_a_story_row_promotes_its_oldest_surviving_member(db, company_id, tmp_path):
+    db.insert_news_articles(company_id, [article('Acme beats earnings', 'https://a.com/1')])
+    db.insert_news_articles(company_id, [article('Acme beats earnings', 'https://b.com/2'),
+                                         article('Acme beats earnings', 'https://c.com/3')])
+    with db.transaction() as conn:
+        conn.execute("""
+            UPDATE news_articles SET fetched_at = '2020-01-01 00:00:00', last_seen_at = '2020-01-01 00:00:00'
+            WHERE link = 'https://a.com/1'
+        """)
+    
+    retention = Retention(db, stock_days=0, duplicate_days=0, article_days=180, job_days=0,
+                          sentiment_days=0, archive_dir=str(tmp_path / 'archive'), pause=0)
+    assert retention.archive_articles(datetime.utcnow()) == 1
+    
+    remaining = rows(db)
+    assert 'https://a.com/1' not in remaining
+    heir_id, heir_cluster, heir_snippet = remaining['https://b.com/2']
+    assert heir_cluster is None
+    assert heir_snippet == 'Acme reported quarterly results above expectations'
+    assert remaining['https://c.com/3'][1] == heir_id
+    
+    # New copies of the story now join the promoted row
+    copy_id, = db.insert_news_articles(company_id, [article('Acme beats earnings', 'https://d.com/4')])
+    assert copy_id == heir_id
+
+def test_deleting_a_whole_cluster_leaves_no_members(db, company_id, tmp_path):
+    db.insert_news_articles(company_id, [article('Acme beats earnings', 'https://a.com/1')])
+    db.insert_news_articles(company_id, [article('Acme beats earnings', 'https://b.com/2')])
+    with db.transaction() as conn:
+        conn.execute("UPDATE news_articles SET fetched_at = '2020-01-01 00:00:00', last_seen_at = '2020-01-01 00:00:00'")
+    
+    retention = Retention(db, stock_days=0, duplicate_days=0, article_days=180, job_days=0,
+                          sentiment_days=0, archive_dir=str(tmp_path / 'archive'), pause=0)
+    assert retention.archive_articles(datetime.utcnow()) == 2
+    assert rows(db) == {}
@@ -0,0 +1,60 @@
+"""
+Results cache invalidation: the generation guard against writes racing a
+view build, render tokens and cross-process data versions
+"""
+
+from results_cache import ResultsCache
+
+VIEW = {'company_name': 'Acme', 'total_articles': 3}
+
+def test_write_during_build_of_an_uncached_company_drops_the_view():
+    cache = ResultsCache()
+    generation = cache.generation
+    # A write lands while the view is being built; nothing is cached for it yet
+    cache.invalidate_company(7)
+    assert cache.put('Acme', 7, VIEW, generation=generation) is None
+    assert cache.get('Acme') is None
+
+def test_write_during_build_of_another_company_also_drops_the_view():
+    cache = ResultsCache()
+    cache.put('Other', 8, VIEW)
+    generation = cache.generation
+    cache.invalidate_company(8)
+    assert cache.put('Acme', 7, VIEW, generation=generation) is None
+
+def test_view_built_without_writes_is_cached():
+    cache = ResultsCache()
+    generation = cache.generation
+    token = cache.put('Acme', 7, VIEW, generation=generation)
+    assert token is not None
+    assert cache.get('Acme')['view'] == VIEW
+
+def test_invalidate_drops_the_company_entry():
+    cache = ResultsCache()
+    cache.put('Acme', 7, VIEW)
+    cache.invalidate_company(7)
+    assert cache.get('Acme') is None
+    assert cache.stats()['invalidations'] == 1
+
+def test_html_only_lands_on_the_entry_it_was_rendered_from():
+    cache = ResultsCache()
+    old_token = cache.put('Acme', 7, VIEW)
+    cache.invalidate_company(7)
+    new_token = cache.put('Acme', 7, dict(VIEW, total_articles=4))
+    cache.set_html('Acme', '<old>', old_token)
+    assert cache.get('Acme')['html'] is None
+    cache.set_html('Acme', '<new>', new_token)
+    assert cache.get('Acme')['html'] == '<new>'
+
+def test_entry_from_an_older_data_version_is_dropped():
+    cache = ResultsCache()
+    cache.put('Acme', 7, VIEW, data_version=3)
+    assert cache.get('Acme', data_version=3)['view'] == VIEW
+    # Another process wrote: the company's data version moved on
+    assert cache.get('Acme', data_version=4) is None
+    assert cache.get('Acme') is None
+
+def test_data_version_is_bumped_by_writes(db, company_id):
+    before = db.get_data_version('Acme')['version']
+    db.insert_stock_data(company_id, {'symbol': 'ACME', 'price': 10.0})
+    assert db.get_data_version('Acme')['version'] > before
@@ -0,0 +1,85 @@
+"""
+Stock rollups (keeping each company's latest quote, merging days across
+batches) and sentiment cache expiry
+"""
+
+from datetime import datetime
+
+from retention import Retention
+
+NOW = datetime(2024, 3, 20, 12, 0, 0)
+
+def make_retention(db, **policies):
+    options = dict(stock_days=0, duplicate_days=0, article_days=0, job_days=0, sentiment_days=0,
+                   archive_dir=None, batch_size=500, pause=0)
+    options.update(policies)
+    return Retention(db, **options)
+
+def add_quotes(db, company_id, quotes):
+    with db.transaction() as conn:
+        conn.executemany(
+            "INSERT INTO stock_data (company_id, symbol, price, fetched_at) VALUES (?, 'ACME', ?, ?)",
+            [(company_id, price, fetched_at) for fetched_at, price in quotes])
+
+def daily(db, company_id):
+    return db.get_connection().execute('''
+        SELECT day, open, high, low, close, price_sum, samples, first_at, last_at
+        FROM stock_daily WHERE company_id = ? ORDER BY day
+    ''', (company_id,)).fetchall()
+
+def raw_quotes(db, company_id):
+    return db.get_connection().execute(
+        'SELECT fetched_at, price FROM stock_data WHERE company_id = ? ORDER BY fetched_at', (company_id,)
+    ).fetchall()
+
+def test_rollup_folds_old_days_into_ohlc_rows(db, company_id):
+    add_quotes(db, company_id, [
+        ('2024-03-01 10:00:00', 10.0), ('2024-03-01 12:00:00', 14.0), ('2024-03-01 16:00:00', 12.0),
+        ('2024-03-02 10:00:00', 9.0), ('2024-03-19 10:00:00', 11.0)
+    ])
+    assert make_retention(db, stock_days=7).rollup_stock(NOW) == 4
+    assert daily(db, company_id) == [
+        ('2024-03-01', 10.0, 14.0, 10.0, 12.0, 36.0, 3, '2024-03-01 10:00:00', '2024-03-01 16:00:00'),
+        ('2024-03-02', 9.0, 9.0, 9.0, 9.0, 9.0, 1, '2024-03-02 10:00:00', '2024-03-02 10:00:00')
+    ]
+    assert raw_quotes(db, company_id) == [('2024-03-19 10:00:00', 11.0)]
+
+def test_rollup_keeps_the_latest_quote_of_an_idle_company(db, company_id):
+    add_quotes(db, company_id, [('2024-03-01 10:00:00', 10.0), ('2024-03-02 10:00:00', 12.0)])
+    retention = make_retention(db, stock_days=7)
+    assert retention.rollup_stock(NOW) == 1
+    assert raw_quotes(db, company_id) == [('2024-03-02 10:00:00', 12.0)]
+    assert db.get_latest_stock_data('Acme')['price'] == 12.0
+    # Nothing left to do on the next pass
+    assert retention.rollup_stock(NOW) == 0
+
+def test_rollup_merges_a_day_across_batches_and_passes(db, company_id):
+    add_quotes(db, company_id, [
+        ('2024-03-01 10:00:00', 10.0), ('2024-03-01 11:00:00', 8.0), ('2024-03-01 12:00:00', 15.0)
+    ])
+    retention = make_retention(db, stock_days=7, batch_size=1)
+    # The day's last quote is the company's latest, so it stays raw
+    assert retention.rollup_stock(NOW) == 2
+    assert daily(db, company_id) == [
+        ('2024-03-01', 10.0, 10.0, 8.0, 8.0, 18.0, 2, '2024-03-01 10:00:00', '2024-03-01 11:00:00')
+    ]
+    
+    # Once a newer quote arrives, the held-back one is merged into its day
+    add_quotes(db, company_id, [('2024-03-19 10:00:00', 11.0)])
+    assert retention.rollup_stock(NOW) == 1
+    assert daily(db, company_id) == [
+        ('2024-03-01', 10.0, 15.0, 8.0, 15.0, 33.0, 3, '2024-03-01 10:00:00', '2024-03-01 12:00:00')
+    ]
+
+def test_sentiment_cache_expires_old_and_stale_version_rows(db):
+    db.put_cached_sentiments({f'hash{i}': 0.5 for i in range(6)}, 'v2')
+    db.put_cached_sentiments({'hash0': 0.1, 'hash1': 0.1}, 'v1')
+    with db.transaction() as conn:
+        conn.execute("UPDATE sentiment_cache SET created_at = '2024-01-01 00:00:00' WHERE text_hash = 'hash5'")
+        conn.execute("UPDATE sentiment_cache SET created_at = '2024-03-19 00:00:00' WHERE text_hash != 'hash5'")
+    
+    retention = make_retention(db, sentiment_days=30, sentiment_version=lambda: 'v2', batch_size=3)
+    assert retention.expire_sentiments(NOW) == 3
+    remaining = db.get_connection().execute(
+        'SELECT text_hash, version FROM sentiment_cache ORDER BY text_hash').fetchall()
+    assert remaining == [(f'hash{i}', 'v2') for i in range(5)]
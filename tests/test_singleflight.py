@@ -0,0 +1,89 @@
+"""
+Single-flight collections: in-process coalescing, the cross-process lease
+and the success cooldown
+"""
+
+import threading
+import time
+
+from singleflight import SingleFlight, company_key
+
+def test_company_key_collapses_spaces_but_keeps_case():
+    assert company_key('  Acme   Corp ') == 'Acme Corp'
+    assert company_key('acme') != company_key('Acme')
+
+def test_concurrent_callers_share_one_run(db):
+    flight = SingleFlight(db, cooldown=0, poll_interval=0.01)
+    started = threading.Event()
+    release = threading.Event()
+    calls = []
+    
+    def collect(name):
+        calls.append(name)
+        started.set()
+        release.wait(5)
+        return True, "Collected"
+    
+    results = []
+    leader = threading.Thread(target=lambda: results.append(flight.run('Acme', collect)))
+    leader.start()
+    started.wait(5)
+    follower = threading.Thread(target=lambda: results.append(flight.run(' Acme ', collect)))
+    follower.start()
+    release.set()
+    leader.join(5)
+    follower.join(5)
+    
+    assert calls == ['Acme']
+    assert results == [(True, "Collected"), (True, "Collected")]
+
+def test_success_within_cooldown_reuses_the_last_result(db):
+    flight = SingleFlight(db, cooldown=60)
+    calls = []
+    
+    def collect(name):
+        calls.append(name)
+        return True, "Collected 5 articles"
+    
+    assert flight.run('Acme', collect) == (True, "Collected 5 articles")
+    assert flight.run('Acme', collect) == (True, "Collected 5 articles")
+    assert len(calls) == 1
+
+def test_failure_is_not_covered_by_the_cooldown(db):
+    flight = SingleFlight(db, cooldown=60)
+    calls = []
+    
+    def collect(name):
+        calls.append(name)
+        return False, "No news found"
+    
+    flight.run('Acme', collect)
+    flight.run('Acme', collect)
+    assert len(calls) == 2
+    assert db.get_collection_lock('Acme')['succeeded'] == 0
+
+def test_lock_held_elsewhere_is_busy_until_its_lease_expires(db):
+    state, _ = db.claim_collection('Acme', 'other-process', lease=0.2, cooldown=0)
+    assert state == 'claimed'
+    state, lock = db.claim_collection('Acme', 'this-process', lease=60, cooldown=0)
+    assert state == 'busy'
+    assert lock['owner'] == 'other-process'
+    
+    time.sleep(0.25)
+    state, lock = db.claim_collection('Acme', 'this-process', lease=60, cooldown=0)
+    assert state == 'claimed'
+    assert lock['owner'] == 'this-process'
+
+def test_waiter_takes_over_a_dead_owners_lock(db):
+    db.claim_collection('Acme', 'dead-process', lease=0.1, cooldown=0)
+    flight = SingleFlight(db, cooldown=0, poll_interval=0.02)
+    assert flight.run('Acme', lambda name: (True, "Collected")) == (True, "Collected")
+    lock = db.get_collection_lock('Acme')
+    assert lock['owner'] is None
+    assert lock['succeeded'] == 1
+
+def test_stale_owner_cannot_release_a_taken_over_lock(db):
+    db.claim_collection('Acme', 'old', lease=0, cooldown=0)
+    db.claim_collection('Acme', 'new', lease=60, cooldown=0)
+    db.finish_collection('Acme', 'old', False, "Timed out")
+    assert db.get_collection_lock('Acme')['owner'] == 'new'
@@ -0,0 +1,40 @@
+"""
+LTTB downsampling of time series
+"""
+
+from datetime import datetime, timedelta
+
+from timeseries import DB_TIME_FORMAT, downsample_lttb
+
+START = datetime(2024, 3, 1)
+
+def series(values):
+    return [{'t': (START + timedelta(minutes=i)).strftime(DB_TIME_FORMAT), 'avg': value}
+            for i, value in enumerate(values)]
+
+def test_short_series_is_returned_unchanged():
+    points = series([1.0, 2.0, 3.0])
+    assert downsample_lttb(points, 10) == points
+    assert downsample_lttb(points, 2) == points
+
+def test_downsampled_series_keeps_the_ends_and_the_requested_size():
+    points = series([float(i % 7) for i in range(100)])
+    sampled = downsample_lttb(points, 10)
+    assert len(sampled) == 10
+    assert sampled[0] is points[0]
+    assert sampled[-1] is points[-1]
+    times = [point['t'] for point in sampled]
+    assert times == sorted(times)
+
+def test_spikes_survive_downsampling():
+    values = [1.0] * 100
+    values[37] = 50.0
+    values[81] = -40.0
+    sampled = downsample_lttb(series(values), 8)
+    kept = [point['avg'] for point in sampled]
+    assert 50.0 in kept
+    assert -40.0 in kept
+
+def test_points_without_a_value_are_skipped():
+    points = series([1.0, None, 2.0, None, 3.0])
+    assert [point['avg'] for point in downsample_lttb(points, 10)] == [1.0, 2.0, 3.0]
@@ -0,0 +1,73 @@
+"""
+Time Series Helpers for News Analyzer
+Range parsing and Largest-Triangle-Three-Buckets downsampling
+"""
+
+from datetime import datetime, timedelta, timezone
+
+# Database timestamps are UTC text in this format (SQLite CURRENT_TIMESTAMP)
+DB_TIME_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+def parse_time(value):
+    """Parse '2024-01-31', '2024-01-31T12:00' or '2024-01-31T12:00:00Z' as naive UTC"""
+    value = value.strip()
+    if value.endswith('Z'):
+        value = value[:-1]
+    parsed = datetime.fromisoformat(value.replace(' ', 'T'))
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return parsed
+
+def resolve_range(start=None, end=None, default_days=30):
+    """Turn optional start/end strings into database-formatted bounds"""
+    end_time = parse_time(end) if end else datetime.utcnow() + timedelta(seconds=1)
+    start_time = parse_time(start) if start else end_time - timedelta(days=default_days)
+    if start_time >= end_time:
+        raise ValueError("start must be before end")
+    return start_time.strftime(DB_TIME_FORMAT), end_time.strftime(DB_TIME_FORMAT)
+
+def _epoch(timestamp):
+    return datetime.strptime(timestamp, DB_TIME_FORMAT).timestamp()
+
+def downsample_lttb(points, threshold, value_key='avg', time_key='t'):
+    """Reduce points to `threshold` with Largest-Triangle-Three-Buckets
+    
+    Keeps the first and last points and, from each bucket in between, the
+    point forming the largest triangle with its neighbours, which preserves
+    the visual shape of the series.
+    """
+    points = [point for point in points if point.get(value_key) is not None]
+    if threshold >= len(points) or threshold < 3:
+        return points
+    
+    xs = [_epoch(point[time_key]) for point in points]
+    ys = [point[value_key] for point in points]
+    sampled = [points[0]]
+    bucket_size = (len(points) - 2) / (threshold - 2)
+    a = 0
+    
+    for i in range(threshold - 2):
+        # Average of the next bucket is the triangle's third vertex
+        next_start = int((i + 1) * bucket_size) + 1
+        next_end = min(int((i + 2) * bucket_size) + 1, len(points))
+        if next_start >= next_end:
+            next_start, next_end = len(points) - 1, len(points)
+        span = next_end - next_start
+        avg_x = sum(xs[next_start:next_end]) / span
+        avg_y = sum(ys[next_start:next_end]) / span
+        
+        start = int(i * bucket_size) + 1
+        end = int((i + 1) * bucket_size) + 1
+        best_area = -1
+        best = start
+        for j in range(start, end):
+            area = abs((xs[a] - avg_x) * (ys[j] - ys[a]) - (xs[a] - xs[j]) * (avg_y - ys[a]))
+            if area > best_area:
+                best_area = area
+                best = j
+        
+        sampled.append(points[best])
+        a = best
+    
+    sampled.append(points[-1])
+    return sampled